@@ -2,14 +2,15 @@
 
 from typing import Annotated
 
-from fastapi import Depends, HTTPException
+from fastapi import Depends, Header, HTTPException
 
-from app.services import ConversationService, DocumentStorageService, QdrantService
+from app.config import settings
+from app.services import ConversationStore, DocumentStorageService, QdrantService
 
 # Global service instances (initialized in lifespan)
 _qdrant_service: QdrantService | None = None
 _document_storage_service: DocumentStorageService | None = None
-_conversation_service: ConversationService | None = None
+_conversation_service: ConversationStore | None = None
 
 
 def set_qdrant_service(service: QdrantService) -> None:
@@ -48,13 +49,13 @@ def get_document_storage_service() -> DocumentStorageService:
     return _document_storage_service
 
 
-def set_conversation_service(service: ConversationService) -> None:
+def set_conversation_service(service: ConversationStore) -> None:
     """Set the global conversation service instance."""
     global _conversation_service
     _conversation_service = service
 
 
-def get_conversation_service() -> ConversationService:
+def get_conversation_service() -> ConversationStore:
     """
     Dependency to get the conversation service instance.
 
@@ -66,11 +67,27 @@ def get_conversation_service() -> ConversationService:
     return _conversation_service
 
 
+def get_latency_budget(
+    x_latency_budget_ms: Annotated[
+        float | None,
+        Header(gt=0, description="Latency budget of the request in milliseconds"),
+    ] = None,
+) -> float | None:
+    """
+    Dependency to get the latency budget of a request in milliseconds.
+
+    Taken from the X-Latency-Budget-Ms header, defaulting to the configured
+    budget (None means no budget).
+    """
+    if x_latency_budget_ms is not None:
+        return x_latency_budget_ms
+    return settings.query_latency_budget_ms
+
+
 # Type aliases for cleaner dependency injection
 QdrantServiceDep = Annotated[QdrantService, Depends(get_qdrant_service)]
 DocumentStorageServiceDep = Annotated[
     DocumentStorageService, Depends(get_document_storage_service)
 ]
-ConversationServiceDep = Annotated[
-    ConversationService, Depends(get_conversation_service)
-]
+ConversationServiceDep = Annotated[ConversationStore, Depends(get_conversation_service)]
+LatencyBudgetDep = Annotated[float | None, Depends(get_latency_budget)]
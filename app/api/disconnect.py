@@ -0,0 +1,54 @@
+"""Cancellation of request work when the client disconnects."""
+
+import asyncio
+from collections.abc import Awaitable
+from typing import TypeVar
+
+from fastapi import HTTPException, Request
+
+from app.config import settings
+
+T = TypeVar("T")
+
+# Status nginx uses for requests whose client closed the connection
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def cancel_on_disconnect(request: Request | None, work: Awaitable[T]) -> T:
+    """
+    Await a request's work, cancelling it if the client disconnects first.
+
+    Starlette keeps running an endpoint after its client has gone away, so
+    the connection is checked every ``client_disconnect_poll_seconds`` while
+    the work runs.
+
+    Args:
+        request: The incoming request (None awaits the work unwatched)
+        work: The work answering the request
+
+    Returns:
+        The result of the work
+
+    Raises:
+        HTTPException: 499 if the client disconnected before the work finished
+    """
+    task = asyncio.ensure_future(work)
+    if request is None:
+        return await task
+    try:
+        while True:
+            done, _ = await asyncio.wait(
+                {task}, timeout=settings.client_disconnect_poll_seconds
+            )
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise HTTPException(
+                    status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request"
+                )
+    finally:
+        # The endpoint itself was cancelled
+        if not task.done():
+            task.cancel()
@@ -1,35 +1,102 @@
 """Conversations endpoint router."""
 
+from collections.abc import Awaitable
 from datetime import UTC, datetime
+from typing import Annotated
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
 
-from app.api.deps import ConversationServiceDep, QdrantServiceDep
+from app.api.deps import (
+    ConversationServiceDep,
+    LatencyBudgetDep,
+    QdrantServiceDep,
+)
+from app.api.disconnect import cancel_on_disconnect
+from app.config import settings
 from app.models import (
     Conversation,
+    ConversationChanges,
     ConversationListResponse,
     CreateConversationRequest,
     Message,
+    MessageListResponse,
     SendMessageRequest,
 )
+from app.services import (
+    ConversationBusy,
+    ConversationStore,
+    IdempotencyKeyReused,
+    QdrantService,
+)
 
 router = APIRouter(prefix="/conversations", tags=["conversations"])
 
 
 @router.get("", response_model=ConversationListResponse)
 async def list_conversations(
+    cursor: Annotated[
+        str | None, Query(description="`next_cursor` of the previous page")
+    ] = None,
+    limit: Annotated[int, Query(ge=1, le=200)] = 50,
     conversation_service: ConversationServiceDep = None,
 ) -> ConversationListResponse:
     """
-    Get all conversations sorted by most recently updated.
+    Get one page of conversation summaries sorted by most recently updated.
+
+    Args:
+        cursor: Cursor of the page to fetch, None for the first page
+        limit: Maximum number of conversations in the page
+        conversation_service: Injected conversation service
 
     Returns:
-        ConversationListResponse: List of all conversations
+        ConversationListResponse: Conversation summaries and the next cursor
+
+    Raises:
+        HTTPException: If the cursor is invalid
     """
-    conversations = conversation_service.get_all_conversations()
-    return ConversationListResponse(
-        total=len(conversations), conversations=conversations
-    )
+    try:
+        return await conversation_service.aget_conversation_summaries(
+            limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+
+@router.get("/changes", response_model=ConversationChanges)
+async def get_changes(
+    since: Annotated[
+        str | None, Query(description="`cursor` of the previous changes")
+    ] = None,
+    timeout: Annotated[
+        float, Query(ge=0, description="Seconds to wait for a change")
+    ] = 0.0,
+    conversation_service: ConversationServiceDep = None,
+) -> ConversationChanges:
+    """
+    Get the conversations and messages changed since a cursor.
+
+    With a timeout the request is held open until something changes, so
+    idle clients poll without repeated requests. Without a cursor only the
+    current cursor is returned: clients list the conversations from the
+    paged endpoints, then poll for the changes after it.
+
+    Args:
+        since: Cursor of the previous changes, None for only the current cursor
+        timeout: Longest wait for a change, capped by the server
+        conversation_service: Injected conversation service
+
+    Returns:
+        ConversationChanges: The changes and the cursor to pass next
+
+    Raises:
+        HTTPException: If the cursor is invalid
+    """
+    try:
+        return await conversation_service.wait_for_changes(
+            since, min(timeout, settings.conversation_changes_max_wait_seconds)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
 
 
 @router.post("", response_model=Conversation)
@@ -47,7 +114,7 @@ async def create_conversation(
     Returns:
         Conversation: The newly created conversation
     """
-    conversation = conversation_service.create_conversation(title=request.title)
+    conversation = await conversation_service.acreate_conversation(title=request.title)
     return conversation
 
 
@@ -55,7 +122,7 @@ async def create_conversation(
 async def get_conversation(
     conversation_id: str,
     conversation_service: ConversationServiceDep = None,
-) -> Conversation:
+) -> Response:
     """
     Get a specific conversation by ID.
 
@@ -64,70 +131,210 @@ async def get_conversation(
         conversation_service: Injected conversation service
 
     Returns:
-        Conversation: The requested conversation
+        Response: The requested conversation, as Conversation JSON
 
     Raises:
         HTTPException: If conversation not found
     """
-    conversation = conversation_service.get_conversation(conversation_id)
-    if not conversation:
+    # Assembled from JSON cached per message, without re-validating it
+    content = await conversation_service.aget_conversation_json(conversation_id)
+    if content is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
-    return conversation
+    return Response(content=content, media_type="application/json")
+
+
+@router.get("/{conversation_id}/messages", response_model=MessageListResponse)
+async def list_messages(
+    conversation_id: str,
+    before: Annotated[
+        int | None, Query(ge=0, description="`next_before` of the previous page")
+    ] = None,
+    limit: Annotated[int, Query(ge=1, le=200)] = 50,
+    include_citation_text: bool = True,
+    conversation_service: ConversationServiceDep = None,
+) -> MessageListResponse:
+    """
+    Get one page of a conversation's messages, ending with the latest.
+
+    Args:
+        conversation_id: The conversation ID
+        before: Cursor of the page to fetch, None for the latest messages
+        limit: Maximum number of messages in the page
+        include_citation_text: Whether to return the text of citations
+        conversation_service: Injected conversation service
+
+    Returns:
+        MessageListResponse: Messages (oldest first) and the cursor of older ones
+
+    Raises:
+        HTTPException: If conversation not found
+    """
+    page = await conversation_service.aget_messages(
+        conversation_id,
+        limit,
+        before=before,
+        include_citation_text=include_citation_text,
+    )
+    if page is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return page
 
 
 @router.post("/{conversation_id}/messages", response_model=Message)
 async def send_message(
     conversation_id: str,
     request: SendMessageRequest,
+    idempotency_key: Annotated[
+        str | None,
+        Header(
+            max_length=255,
+            description="Key of the message; a retry with it gets the same answer",
+        ),
+    ] = None,
+    http_request: Request = None,
     conversation_service: ConversationServiceDep = None,
     qdrant_service: QdrantServiceDep = None,
+    latency_budget_ms: LatencyBudgetDep = None,
 ) -> Message:
     """
     Send a message in a conversation and get AI response.
 
+    With an Idempotency-Key header the message is answered once: a retry
+    sent while it is being answered waits for that answer, and a later
+    retry gets the stored answer back. With the SQLite store this holds
+    across workers, except that a retry reaching another worker while the
+    message is being answered gets 409. Without a key, answering is
+    cancelled if the client disconnects (with one, it goes on for the retry).
+
     Args:
         conversation_id: The conversation ID
         request: Request body with message content
+        idempotency_key: Optional key identifying the message across retries
+        http_request: The incoming request, watched for a client disconnect
         conversation_service: Injected conversation service
         qdrant_service: Injected Qdrant service
+        latency_budget_ms: Latency budget of the request
 
     Returns:
         Message: The AI's response message
 
     Raises:
-        HTTPException: If conversation not found
+        HTTPException: If conversation not found, busy answering a previous
+            message or given one by another worker during the turn, or the
+            idempotency key was used for another message
     """
-    # Get the conversation
-    conversation = conversation_service.get_conversation(conversation_id)
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
 
-    # Add user message
-    user_message = Message(
-        role="user",
-        content=request.message,
-        citations=[],
-        timestamp=datetime.now(UTC),
-    )
-    conversation_service.add_message(conversation_id, user_message)
-
-    # Get AI response with conversation history
-    # Pass only the messages before the current user message
-    chat_history = conversation.messages[:-1]  # Exclude the just-added user message
-    result = qdrant_service.query_with_history(request.message, chat_history)
-
-    # Create assistant message with response and citations
-    assistant_message = Message(
-        role="assistant",
-        content=result.response,
-        citations=result.citations,
-        timestamp=datetime.now(UTC),
-    )
-
-    # Add assistant message to conversation
-    conversation_service.add_message(conversation_id, assistant_message)
-
-    return assistant_message
+    def answer() -> Awaitable[Message]:
+        return _answer_message(
+            conversation_id,
+            request.message,
+            conversation_service,
+            qdrant_service,
+            latency_budget_ms,
+            idempotency_key=idempotency_key,
+        )
+
+    if idempotency_key is None:
+        return await cancel_on_disconnect(http_request, answer())
+    try:
+        return await cancel_on_disconnect(
+            http_request,
+            conversation_service.idempotency.run(
+                (conversation_id, idempotency_key), request.message, answer
+            ),
+        )
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    except ConversationBusy as e:
+        # Another worker is answering the message sent with this key
+        raise HTTPException(status_code=409, detail=str(e)) from e
+
+
+async def _answer_message(
+    conversation_id: str,
+    content: str,
+    conversation_service: ConversationStore,
+    qdrant_service: QdrantService,
+    latency_budget_ms: float | None,
+    idempotency_key: str | None = None,
+) -> Message:
+    """Add a user message to a conversation and answer it."""
+    # One turn at a time per conversation, so each sees the full history
+    try:
+        async with conversation_service.turn(
+            conversation_id, wait_seconds=settings.conversation_turn_wait_seconds
+        ):
+            # Read the turn's starting point once earlier turns have finished;
+            # appends expecting it fail if another worker added a message since
+            message_count = await conversation_service.aget_message_count(
+                conversation_id
+            )
+            if message_count is None:
+                raise HTTPException(status_code=404, detail="Conversation not found")
+
+            # Snapshot the incrementally kept history before adding the new message
+            memory = await conversation_service.aget_memory(conversation_id)
+            memory_messages = chat_history = None
+            if memory is not None:
+                memory_messages = memory.get()
+            else:
+                # No kept memory; pass the messages before the current one
+                conversation = await conversation_service.aget_conversation(
+                    conversation_id
+                )
+                if not conversation:
+                    raise HTTPException(
+                        status_code=404, detail="Conversation not found"
+                    )
+                chat_history = list(conversation.messages)
+
+            # Add user message now, or only with its answer so that a turn
+            # cancelled by a client disconnect leaves no trace
+            user_message = Message(
+                role="user",
+                content=content,
+                citations=[],
+                timestamp=datetime.now(UTC),
+            )
+            record_early = settings.conversation_record_cancelled_turns
+            if record_early:
+                await conversation_service.aadd_message(
+                    conversation_id, user_message, expected_count=message_count
+                )
+                message_count += 1
+
+            # Get AI response with conversation history
+            result = await qdrant_service.query_with_history(
+                content,
+                chat_history,
+                budget_ms=latency_budget_ms,
+                memory_messages=memory_messages,
+            )
+            if not record_early:
+                await conversation_service.aadd_message(
+                    conversation_id, user_message, expected_count=message_count
+                )
+                message_count += 1
+
+            # Create assistant message with response and citations
+            assistant_message = Message(
+                role="assistant",
+                content=result.response,
+                citations=result.citations,
+                timestamp=datetime.now(UTC),
+            )
+
+            # Add assistant message to conversation
+            await conversation_service.aadd_message(
+                conversation_id,
+                assistant_message,
+                expected_count=message_count,
+                idempotency_key=idempotency_key,
+            )
+
+            return assistant_message
+    except ConversationBusy as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
 
 
 @router.delete("/{conversation_id}")
@@ -148,7 +355,7 @@ async def delete_conversation(
     Raises:
         HTTPException: If conversation not found
     """
-    success = conversation_service.delete_conversation(conversation_id)
+    success = await conversation_service.adelete_conversation(conversation_id)
     if not success:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return {"message": "Conversation deleted successfully"}
@@ -174,7 +381,7 @@ async def update_conversation_title(
     Raises:
         HTTPException: If conversation not found
     """
-    conversation = conversation_service.update_conversation_title(
+    conversation = await conversation_service.aupdate_conversation_title(
         conversation_id, title
     )
     if not conversation:
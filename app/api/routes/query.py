@@ -1,9 +1,23 @@
 """Query endpoint router."""
 
-from fastapi import APIRouter, Query
+from collections.abc import AsyncIterator
 
-from app.api.deps import QdrantServiceDep
-from app.models import Output
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.api.deps import (
+    DocumentStorageServiceDep,
+    LatencyBudgetDep,
+    QdrantServiceDep,
+)
+from app.api.disconnect import cancel_on_disconnect
+from app.config import settings
+from app.models import (
+    BatchQueryRequest,
+    BatchQueryResult,
+    Output,
+    RetrievalResponse,
+)
 
 router = APIRouter(prefix="", tags=["query"])
 
@@ -11,14 +25,23 @@ router = APIRouter(prefix="", tags=["query"])
 @router.get("/query", response_model=Output)
 async def query_documents(
     q: str = Query(..., description="The query string to search for", min_length=1),
+    request: Request = None,
     qdrant_service: QdrantServiceDep = None,
+    latency_budget_ms: LatencyBudgetDep = None,
 ) -> Output:
     """
     Query endpoint that accepts a query string as a URL parameter.
 
+    If the answer cannot be synthesized within the latency budget (the
+    X-Latency-Budget-Ms header or the configured default), an extractive
+    answer flagged as degraded is returned instead. If the client
+    disconnects first, the pending retrieval and LLM calls are cancelled.
+
     Args:
         q: Query string parameter
+        request: The incoming request, watched for a client disconnect
         qdrant_service: Injected Qdrant service
+        latency_budget_ms: Latency budget of the request
 
     Returns:
         Output: Pydantic model containing query, response, and citations
@@ -26,5 +49,88 @@ async def query_documents(
     Example:
         GET /query?q=what happens if I steal from the Sept?
     """
-    result = qdrant_service.query(q)
+    result = await cancel_on_disconnect(
+        request, qdrant_service.query(q, budget_ms=latency_budget_ms)
+    )
     return result
+
+
+@router.get("/retrieve", response_model=RetrievalResponse)
+async def retrieve_documents(
+    q: str = Query(..., description="The query string to search for", min_length=1),
+    k: int | None = Query(
+        None, description="Number of sections to retrieve", ge=1, le=50
+    ),
+    qdrant_service: QdrantServiceDep = None,
+    storage_service: DocumentStorageServiceDep = None,
+) -> RetrievalResponse:
+    """
+    Retrieval-only endpoint that returns ranked sections without an LLM answer.
+
+    Args:
+        q: Query string parameter
+        k: Optional number of sections to retrieve
+        qdrant_service: Injected Qdrant service
+        storage_service: Injected document storage service
+
+    Returns:
+        RetrievalResponse: Ranked citations with scores and document IDs
+
+    Example:
+        GET /retrieve?q=what happens if I steal from the Sept?&k=5
+    """
+    citations = await qdrant_service.retrieve(q, k=k)
+    for citation in citations:
+        if citation.section_number is not None:
+            citation.document_id = storage_service.get_document_id_by_section(
+                citation.section_number
+            )
+    return RetrievalResponse(query=q, citations=citations)
+
+
+@router.post("/query/batch", response_class=StreamingResponse)
+async def query_documents_batch(
+    request: BatchQueryRequest,
+    qdrant_service: QdrantServiceDep = None,
+) -> StreamingResponse:
+    """
+    Batch query endpoint that answers a list of questions in one call.
+
+    Results are streamed as NDJSON in completion order. Each line is a
+    BatchQueryResult carrying the index of its question in the request and
+    either the Output or an error message.
+
+    Args:
+        request: Request body with the list of questions
+        qdrant_service: Injected Qdrant service
+
+    Returns:
+        StreamingResponse: application/x-ndjson stream of BatchQueryResult lines
+
+    Raises:
+        HTTPException: 422 if the batch exceeds the configured maximum size
+
+    Example:
+        POST /query/batch {"questions": ["what happens if I steal?", "..."]}
+    """
+    if len(request.questions) > settings.query_batch_max_questions:
+        raise HTTPException(
+            status_code=422,
+            detail=(
+                f"Batch size {len(request.questions)} exceeds the maximum of "
+                f"{settings.query_batch_max_questions} questions"
+            ),
+        )
+
+    async def stream_results() -> AsyncIterator[str]:
+        async for index, result in qdrant_service.query_batch(
+            request.questions,
+            max_concurrency=settings.query_batch_max_concurrency,
+        ):
+            if isinstance(result, Exception):
+                line = BatchQueryResult(index=index, error=str(result))
+            else:
+                line = BatchQueryResult(index=index, output=result)
+            yield line.model_dump_json() + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
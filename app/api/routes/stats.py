@@ -0,0 +1,31 @@
+"""Runtime statistics endpoint router."""
+
+from fastapi import APIRouter
+
+from app.api.deps import ConversationServiceDep, QdrantServiceDep
+
+router = APIRouter(prefix="", tags=["stats"])
+
+
+@router.get("/stats")
+async def get_stats(
+    qdrant_service: QdrantServiceDep = None,
+    conversation_service: ConversationServiceDep = None,
+) -> dict:
+    """
+    Runtime statistics endpoint.
+
+    Args:
+        qdrant_service: Injected Qdrant service
+        conversation_service: Injected conversation service
+
+    Returns:
+        dict: Counters exposed by the services (cache hits and misses, etc.)
+
+    Example:
+        GET /stats
+    """
+    return {
+        "query": qdrant_service.get_stats(),
+        "conversations": conversation_service.stats(),
+    }
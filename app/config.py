@@ -1,6 +1,7 @@
 """Application configuration settings."""
 
 import os
+from typing import Literal
 
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
@@ -19,8 +20,111 @@ class Settings(BaseSettings):
     # OpenAI Settings
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
 
+    # LLM Settings (per pipeline stage)
+    condense_llm_model: str = "gpt-4o-mini"  # Rewrites follow-ups into questions
+    condense_llm_timeout_seconds: float = 10.0
+    condense_llm_max_tokens: int = 256
+    synthesis_llm_model: str = "gpt-4"  # Writes the cited answer
+    synthesis_llm_timeout_seconds: float = 60.0
+    synthesis_llm_max_tokens: int | None = None
+    fallback_llm_model: str | None = None  # Retried when a stage's model fails
+    fallback_llm_timeout_seconds: float = 30.0
+    fallback_llm_max_tokens: int | None = None
+
+    # LLM Resilience Settings
+    llm_hedge_enabled: bool = True
+    llm_hedge_percentile: float = 95.0  # Hedge calls slower than this percentile
+    llm_hedge_min_samples: int = 20  # Timed calls needed before hedging starts
+    llm_hedge_min_delay_seconds: float = 0.5
+    llm_breaker_failure_rate: float = 0.5  # Failure rate that opens the breaker
+    llm_breaker_window: int = 20
+    llm_breaker_min_calls: int = 5
+    llm_breaker_reset_seconds: float = 30.0
+
+    # Synthesis Settings
+    synthesis_response_mode: Literal["compact", "refine", "tree_summarize"] = "compact"
+    synthesis_max_context_tokens: int = 3000  # Retrieved text sent to synthesis
+    synthesis_max_llm_calls: int = 1  # Calls the synthesis context is cut to fit
+    # Hard cap on LLM calls per request, condensation and fallbacks included
+    request_max_llm_calls: int = 2
+
+    # Relevance Settings
+    # Questions whose best retrieved node scores below this floor get a canned
+    # "no relevant law" answer without an LLM call (None disables the check)
+    relevance_score_floor: float | None = None
+
+    # Latency Budget Settings
+    query_latency_budget_ms: float | None = None  # Default when no header is sent
+    degraded_answer_max_sections: int = 3  # Sections quoted in a degraded answer
+
+    # Cancellation Settings
+    # How often a running query checks whether its client is still connected;
+    # when it is gone, retrieval and LLM calls still pending are cancelled
+    client_disconnect_poll_seconds: float = 0.5
+
     # Qdrant Settings
     qdrant_similarity_top_k: int = 3  # Number of similar documents to retrieve
+    # Adaptive top-k: retrieve up to max_k and cut where the scores fall off
+    qdrant_adaptive_top_k: bool = False
+    qdrant_adaptive_max_k: int = 8
+    qdrant_adaptive_min_k: int = 1
+    qdrant_adaptive_score_floor: float = 0.75
+    qdrant_adaptive_max_relative_drop: float = 0.1
+
+    # Batch Query Settings
+    query_batch_max_questions: int = 5000
+    query_batch_max_concurrency: int = 8  # Concurrent LLM synthesis calls per batch
+
+    # Answer Cache Settings
+    # Off by default: the similarity threshold has not been measured on pairs
+    # of real questions, and a near-duplicate embedding can ask another thing
+    answer_cache_enabled: bool = False
+    answer_cache_similarity_threshold: float = 0.95  # Min cosine similarity for a hit
+    answer_cache_max_entries: int = 256
+    answer_cache_ttl_seconds: float = 3600.0
+    query_embedding_cache_size: int = 1024  # Exact-match query embedding LRU size
+
+    # Conversation Settings
+    # "memory" keeps conversations per process; "sqlite" persists them in a
+    # database file that several workers can share
+    conversation_store: Literal["memory", "sqlite"] = "memory"
+    conversation_db_path: str = "data/conversations.db"
+    conversation_db_pool_size: int = 4
+    # In-memory store: above this estimated size, the least recently used
+    # conversations are compressed to disk until accessed again (None keeps
+    # every conversation in memory)
+    conversation_memory_budget_bytes: int | None = None
+    conversation_spill_path: str = "data/conversation_spill"
+    # How long a message waits for the previous turn of its conversation
+    # before it is rejected with 409 (0 rejects it at once)
+    conversation_turn_wait_seconds: float = 0.0
+    # Keep the user message of a turn cancelled by a client disconnect (or
+    # failed); otherwise a turn is only recorded once it is answered
+    conversation_record_cancelled_turns: bool = True
+    # Answers to messages sent with an Idempotency-Key header, replayed to
+    # retries with the same key instead of answering again
+    conversation_idempotency_max_keys: int = 10000
+    conversation_idempotency_ttl_seconds: float = 86400.0
+    # With SQLite, a key claimed by a worker that died before answering is
+    # taken over by a retry after this long
+    conversation_idempotency_claim_seconds: float = 300.0
+    # Longest wait of a /conversations/changes long-poll, and how often it
+    # rechecks the SQLite store for changes made by other workers
+    conversation_changes_max_wait_seconds: float = 30.0
+    conversation_changes_poll_seconds: float = 1.0
+    # Deleted conversations remembered for change polling; clients with an
+    # older cursor are told to reload everything
+    conversation_change_tombstones: int = 1000
+    conversation_memory_token_limit: int = 3000  # History passed to condensation
+    # With rolling summaries, only this many latest messages are kept verbatim
+    conversation_memory_recent_messages: int = 6
+    conversation_summary_max_words: int = 150
+    # Answer follow-ups without pronouns or ellipsis without condensing them
+    condense_skip_standalone: bool = True
+    condense_min_standalone_words: int = 4  # Shorter follow-ups are condensed
+    # Retrieve for the raw follow-up while it is condensed, and reuse the nodes
+    # when the condensed question adds no content word to it
+    speculative_retrieval_enabled: bool = True
 
     # Document Settings
     documents_path: str = "docs/laws.pdf"
@@ -11,10 +11,12 @@ from app.api.deps import (
 )
 from app.config import settings
 from app.services import (
+    CitationCodec,
     ConversationService,
     DocumentService,
     DocumentStorageService,
     QdrantService,
+    SQLiteConversationService,
 )
 
 
@@ -35,12 +37,14 @@ async def lifespan(app: FastAPI):
 
     # Initialize document storage service
     doc_storage_service = DocumentStorageService()
-    doc_storage_service.store_documents(docs)
+    doc_storage_service.store_documents(docs, corpus_version=doc_service.source_version)
     set_document_storage_service(doc_storage_service)
     print("💾 DocumentStorageService initialized")
 
     # Initialize Qdrant service
-    qdrant_service = QdrantService(k=settings.qdrant_similarity_top_k)
+    qdrant_service = QdrantService(
+        k=settings.qdrant_similarity_top_k, document_storage=doc_storage_service
+    )
     qdrant_service.connect()
     qdrant_service.load(docs)
     print(f"🔍 QdrantService initialized (k={settings.qdrant_similarity_top_k})")
@@ -50,11 +54,27 @@ async def lifespan(app: FastAPI):
     print("✅ Services ready!")
 
     # Initialize conversation service
-    conversation_service = ConversationService()
+    # Messages share the cited law text kept by document storage
+    citation_codec = CitationCodec(doc_storage_service)
+    if settings.conversation_store == "sqlite":
+        conversation_service = SQLiteConversationService(
+            settings.conversation_db_path,
+            summarizer=qdrant_service.summarize_history,
+            pool_size=settings.conversation_db_pool_size,
+            citation_codec=citation_codec,
+        )
+    else:
+        conversation_service = ConversationService(
+            summarizer=qdrant_service.summarize_history,
+            memory_budget_bytes=settings.conversation_memory_budget_bytes,
+            spill_path=settings.conversation_spill_path,
+            citation_codec=citation_codec,
+        )
     set_conversation_service(conversation_service)
-    print("💬 ConversationService initialized")
+    print(f"💬 ConversationService initialized ({settings.conversation_store})")
 
     yield
 
     # Cleanup (if needed)
     print("🛑 Shutting down services...")
+    conversation_service.close()
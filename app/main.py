@@ -3,7 +3,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api.routes import conversations, documents, health, query
+from app.api.routes import conversations, documents, health, query, stats
 from app.config import settings
 from app.core.lifespan import lifespan
 
@@ -32,3 +32,4 @@ app.include_router(query.router)
 app.include_router(health.router)
 app.include_router(documents.router)
 app.include_router(conversations.router)
+app.include_router(stats.router)
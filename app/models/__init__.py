@@ -1,29 +1,43 @@
 """Pydantic models and schemas."""
 
 from app.models.schemas import (
+    BatchQueryRequest,
+    BatchQueryResult,
     Citation,
     Conversation,
+    ConversationChanges,
     ConversationListResponse,
+    ConversationSummary,
     CreateConversationRequest,
     DocumentDetail,
     DocumentListResponse,
     DocumentMetadata,
     DocumentSummary,
     Message,
+    MessageListResponse,
     Output,
+    RetrievalResponse,
+    ScoredCitation,
     SendMessageRequest,
 )
 
 __all__ = [
+    "BatchQueryRequest",
+    "BatchQueryResult",
     "Citation",
     "Conversation",
+    "ConversationChanges",
     "ConversationListResponse",
+    "ConversationSummary",
     "CreateConversationRequest",
     "DocumentDetail",
     "DocumentListResponse",
     "DocumentMetadata",
     "DocumentSummary",
     "Message",
+    "MessageListResponse",
     "Output",
+    "RetrievalResponse",
+    "ScoredCitation",
     "SendMessageRequest",
 ]
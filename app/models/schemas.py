@@ -1,8 +1,9 @@
 """Pydantic models for API request/response schemas."""
 
 from datetime import UTC, datetime
+from typing import Annotated
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 
 def utc_now() -> datetime:
@@ -23,6 +24,41 @@ class Output(BaseModel):
     query: str
     response: str
     citations: list[Citation]
+    degraded: bool = False  # Extractive answer returned when over latency budget
+
+    # Internal accounting of the LLM work behind the answer (not serialized)
+    _llm_calls: int = PrivateAttr(default=0)
+    _prompt_tokens: int = PrivateAttr(default=0)
+    _completion_tokens: int = PrivateAttr(default=0)
+
+
+class ScoredCitation(Citation):
+    """Citation returned by retrieval, with its score and source document."""
+
+    score: float | None = None
+    section_number: str | None = None
+    document_id: str | None = None  # DocumentStorageService ID of the section
+
+
+class RetrievalResponse(BaseModel):
+    """Response model for retrieval-only queries."""
+
+    query: str
+    citations: list[ScoredCitation]
+
+
+class BatchQueryRequest(BaseModel):
+    """Request to answer several queries in one call."""
+
+    questions: list[Annotated[str, Field(min_length=1)]] = Field(..., min_length=1)
+
+
+class BatchQueryResult(BaseModel):
+    """One line of a streamed batch query response."""
+
+    index: int  # Position of the question in the request
+    output: Output | None = None
+    error: str | None = None
 
 
 class Message(BaseModel):
@@ -56,11 +92,39 @@ class Conversation(BaseModel):
     updated_at: datetime = Field(default_factory=utc_now)
 
 
+class ConversationSummary(BaseModel):
+    """Summary conversation model for list view."""
+
+    id: str
+    title: str
+    updated_at: datetime
+    message_count: int
+    last_message_preview: str | None = None
+
+
 class ConversationListResponse(BaseModel):
     """Response model for conversation list endpoint."""
 
     total: int
-    conversations: list[Conversation]
+    conversations: list[ConversationSummary]
+    next_cursor: str | None = None  # Pass as `cursor` to fetch the next page
+
+
+class MessageListResponse(BaseModel):
+    """Response model for the conversation messages endpoint."""
+
+    messages: list[Message]  # Oldest first
+    next_before: int | None = None  # Pass as `before` to fetch older messages
+
+
+class ConversationChanges(BaseModel):
+    """Response model for the conversation changes endpoint."""
+
+    cursor: str  # Pass as `since` to fetch the changes after these
+    conversations: list[ConversationSummary]  # Created or updated
+    messages: dict[str, list[Message]]  # New messages by conversation ID
+    deleted: list[str]  # IDs of deleted conversations
+    reset: bool = False  # The cursor is too old: reload every conversation
 
 
 class DocumentMetadata(BaseModel):
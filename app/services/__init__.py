@@ -1,13 +1,65 @@
 """Business logic services."""
 
-from app.services.conversation_service import ConversationService
+from app.services.adaptive_top_k import AdaptiveTopKPostprocessor
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.citation_refs import CitationCodec, CitationRef
+from app.services.condense_classifier import needs_condensation, new_content_words
+from app.services.conversation_memory import ConversationMemory
+from app.services.conversation_service import (
+    ConversationBusy,
+    ConversationService,
+    ConversationStore,
+)
+from app.services.deadline import Deadline, DeadlineExceeded
 from app.services.document_service import DocumentService
 from app.services.document_storage_service import DocumentStorageService
+from app.services.idempotency import IdempotencyKeyReused, IdempotencyStore
+from app.services.latency import LatencyRecorder
+from app.services.llm_client import (
+    CircuitBreaker,
+    CircuitBreakerOpen,
+    ResilientLLM,
+)
+from app.services.llm_usage import (
+    LLMCallBudgetExceeded,
+    LLMUsageHandler,
+    LLMUsageStats,
+    track_llm_usage,
+)
 from app.services.qdrant_service import QdrantService
+from app.services.section_reference import parse_section_reference
+from app.services.single_flight import SingleFlight
+from app.services.spill_store import CompressedSpillStore
+from app.services.sqlite_conversation_service import SQLiteConversationService
 
 __all__ = [
     "DocumentService",
     "QdrantService",
     "DocumentStorageService",
+    "ConversationStore",
     "ConversationService",
+    "ConversationBusy",
+    "SQLiteConversationService",
+    "SemanticAnswerCache",
+    "SingleFlight",
+    "IdempotencyStore",
+    "IdempotencyKeyReused",
+    "CompressedSpillStore",
+    "CitationCodec",
+    "CitationRef",
+    "AdaptiveTopKPostprocessor",
+    "LatencyRecorder",
+    "LLMUsageHandler",
+    "LLMUsageStats",
+    "LLMCallBudgetExceeded",
+    "track_llm_usage",
+    "ResilientLLM",
+    "CircuitBreaker",
+    "CircuitBreakerOpen",
+    "Deadline",
+    "DeadlineExceeded",
+    "parse_section_reference",
+    "ConversationMemory",
+    "needs_condensation",
+    "new_content_words",
 ]
@@ -0,0 +1,54 @@
+"""Node postprocessor that picks the number of retrieved nodes per query."""
+
+import logging
+
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import NodeWithScore, QueryBundle
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveTopKPostprocessor(BaseNodePostprocessor):
+    """
+    Keep only the leading nodes of a retrieval, based on their scores.
+
+    Nodes are walked in descending score order and the cut is made at the first
+    node that falls below ``score_floor`` or whose score drops by more than
+    ``max_relative_drop`` relative to the previous node. At least ``min_k``
+    nodes are always kept.
+    """
+
+    min_k: int = Field(default=1)
+    score_floor: float = Field(default=0.75)
+    max_relative_drop: float = Field(default=0.1)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "AdaptiveTopKPostprocessor"
+
+    def _postprocess_nodes(
+        self,
+        nodes: list[NodeWithScore],
+        query_bundle: QueryBundle | None = None,
+    ) -> list[NodeWithScore]:
+        """Cut the node list where the similarity scores fall off."""
+        ranked = sorted(nodes, key=lambda node: node.score or 0.0, reverse=True)
+
+        kept = ranked[: self.min_k]
+        for node in ranked[self.min_k :]:
+            score = node.score or 0.0
+            previous = (kept[-1].score or 0.0) if kept else score
+            if score < self.score_floor:
+                break
+            if previous > 0 and (previous - score) / previous > self.max_relative_drop:
+                break
+            kept.append(node)
+
+        logger.info(
+            "Adaptive top-k kept %d of %d retrieved nodes for query %r",
+            len(kept),
+            len(nodes),
+            query_bundle.query_str if query_bundle else None,
+        )
+        return kept
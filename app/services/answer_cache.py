@@ -0,0 +1,140 @@
+"""Semantic cache of query answers keyed by query embedding."""
+
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.models import Output
+
+
+@dataclass
+class _CacheEntry:
+    """A cached answer together with its normalised query embedding."""
+
+    embedding: np.ndarray
+    output: Output
+    scope: Hashable
+    expires_at: float
+
+
+class SemanticAnswerCache:
+    """
+    LRU + TTL cache of ``Output`` objects looked up by cosine similarity.
+
+    A lookup returns the answer of the most similar stored query when its
+    cosine similarity is at least ``similarity_threshold`` and that was stored
+    under the same scope (e.g. retrieval parameters). Entries are tied to a
+    corpus version and the whole cache is dropped when that version changes.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: float = 3600.0,
+        similarity_threshold: float = 0.95,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.corpus_version: int | None = None
+        self._entries: OrderedDict[int, _CacheEntry] = OrderedDict()
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(embedding: list[float]) -> np.ndarray:
+        """Return the embedding as a unit-length vector."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _sync_corpus_version(self, corpus_version: int) -> None:
+        """Drop every entry if the corpus has changed since they were stored."""
+        if self.corpus_version != corpus_version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.corpus_version = corpus_version
+
+    def get(
+        self, embedding: list[float], corpus_version: int, scope: Hashable = None
+    ) -> Output | None:
+        """
+        Look up a cached answer for a query embedding.
+
+        Args:
+            embedding: Embedding of the incoming query
+            corpus_version: Version of the indexed corpus the answer must match
+            scope: Extra key the stored answer must have been cached under
+
+        Returns:
+            The cached Output if a similar enough query is stored, None otherwise
+        """
+        self._sync_corpus_version(corpus_version)
+        query = self._normalize(embedding)
+        now = time.monotonic()
+
+        best_id, best_score = None, self.similarity_threshold
+        for entry_id, entry in list(self._entries.items()):
+            if entry.expires_at <= now:
+                del self._entries[entry_id]
+                self.evictions += 1
+                continue
+            if entry.scope != scope:
+                continue
+            score = float(np.dot(query, entry.embedding))
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+
+        if best_id is None:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(best_id)
+        self.hits += 1
+        return self._entries[best_id].output
+
+    def put(
+        self,
+        embedding: list[float],
+        output: Output,
+        corpus_version: int,
+        scope: Hashable = None,
+    ) -> None:
+        """Store an answer, evicting the least recently used entry when full."""
+        self._sync_corpus_version(corpus_version)
+        self._entries[self._next_id] = _CacheEntry(
+            embedding=self._normalize(embedding),
+            output=output,
+            scope=scope,
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        self._next_id += 1
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove every cached answer."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current size."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "corpus_version": self.corpus_version,
+        }
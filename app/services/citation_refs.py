@@ -0,0 +1,167 @@
+"""Compact references to cited law text, resolved from document storage."""
+
+import hashlib
+import json
+import re
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from app.models import Citation
+from app.services.document_storage_service import DocumentStorageService
+
+# Label the citation engine puts before each cited chunk
+_SOURCE_LABEL = re.compile(r"Source \d+:\n")
+
+
+@dataclass(frozen=True, slots=True)
+class CitationRef:
+    """Where a citation's text lies in a stored document."""
+
+    source: str
+    document_id: str
+    start: int  # Offsets of the cited chunk in the document text
+    end: int
+    corpus_version: str
+    prefix: str = ""  # Text around the chunk, e.g. the "Source 1:" label
+    suffix: str = ""
+
+
+class CitationCodec:
+    """
+    Store citations as references into document storage.
+
+    The same law sections are cited over and over, so messages in memory
+    share one ``Citation`` per ``CitationRef`` instead of their own copy of
+    the text. Citations whose text is not found in a stored document are
+    kept as they are.
+
+    Stored messages keep a citation as its source and the hash of its text,
+    and the store keeps each text once, keyed by that hash. Offsets into the
+    stored documents are not persisted: the documents are rebuilt on every
+    start, so they would point at a different text later.
+    """
+
+    def __init__(self, storage: DocumentStorageService):
+        self.storage = storage
+        self._resolved: dict[CitationRef, Citation] = {}
+        self._shared_ids: set[int] = set()
+        # Shared citations by source and text hash, for decoding
+        self._by_key: dict[tuple[str, str], Citation] = {}
+
+    def to_ref(self, citation: Citation) -> CitationRef | None:
+        """Find a citation's text in document storage."""
+        document_id = self.storage.get_document_id_by_source(citation.source)
+        if document_id is None:
+            return None
+        document = self.storage.get_document_text(document_id)
+        text = citation.text
+        match = _SOURCE_LABEL.match(text)
+        prefix = match.group(0) if match else ""
+        body = text[len(prefix) :]
+        suffix = ""
+        start = document.find(body) if body else -1
+        if start < 0 and body.endswith("\n"):
+            body, suffix = body[:-1], "\n"
+            start = document.find(body) if body else -1
+        if start < 0:
+            return None
+        return CitationRef(
+            source=citation.source,
+            document_id=document_id,
+            start=start,
+            end=start + len(body),
+            corpus_version=self.storage.corpus_version,
+            prefix=prefix,
+            suffix=suffix,
+        )
+
+    def resolve(self, ref: CitationRef) -> Citation | None:
+        """Return the shared citation for a reference, None if out of date."""
+        citation = self._resolved.get(ref)
+        if citation is not None:
+            return citation
+        document = self.storage.get_document_text(ref.document_id)
+        if ref.corpus_version != self.storage.corpus_version or document is None:
+            # Not cached: the text may resolve once the right corpus is loaded
+            return None
+        citation = Citation(
+            source=ref.source,
+            text=ref.prefix + document[ref.start : ref.end] + ref.suffix,
+        )
+        self._resolved[ref] = citation
+        self._shared_ids.add(id(citation))
+        return citation
+
+    def dedupe(self, citation: Citation) -> Citation:
+        """Replace a citation by the shared one with the same text."""
+        if self.is_shared(citation):
+            return citation
+        ref = self.to_ref(citation)
+        shared = self.resolve(ref) if ref is not None else None
+        return shared if shared is not None else citation
+
+    def is_shared(self, citation: Citation) -> bool:
+        """Whether a citation is a shared instance held by the codec."""
+        return id(citation) in self._shared_ids
+
+    def dumps(self, citations: list[Citation]) -> tuple[str, dict[str, str]]:
+        """
+        Encode citations as JSON references to their texts.
+
+        Returns:
+            The JSON to store with the message, and the cited texts by hash
+            to store once each
+        """
+        items = []
+        texts = {}
+        for citation in citations:
+            key = citation_text_key(citation.text)
+            items.append({"source": citation.source, "text_key": key})
+            texts[key] = citation.text
+        return json.dumps(items), texts
+
+    def loads(
+        self,
+        data: str,
+        read_texts: Callable[[list[str]], dict[str, str]],
+    ) -> list[Citation]:
+        """
+        Decode citations encoded by ``dumps`` (or plain citation JSON).
+
+        Args:
+            data: The JSON stored with the message
+            read_texts: Reads the stored texts of hashes, called only for the
+                texts of citations not shared yet
+
+        Returns:
+            The citations, shared where their text is in document storage
+        """
+        items = json.loads(data)
+        missing = [
+            item["text_key"]
+            for item in items
+            if "text_key" in item
+            and (item["source"], item["text_key"]) not in self._by_key
+        ]
+        texts = read_texts(missing) if missing else {}
+        return [self._load(item, texts) for item in items]
+
+    def _load(self, item: dict, texts: dict[str, str]) -> Citation:
+        """Decode one citation, sharing it if its text is in document storage."""
+        if "text_key" not in item:
+            return self.dedupe(Citation(**item))
+        key = (item["source"], item["text_key"])
+        shared = self._by_key.get(key)
+        if shared is not None:
+            return shared
+        citation = self.dedupe(
+            Citation(source=item["source"], text=texts.get(item["text_key"], ""))
+        )
+        if self.is_shared(citation):
+            self._by_key[key] = citation
+        return citation
+
+
+def citation_text_key(text: str) -> str:
+    """Return the hash a cited text is stored under."""
+    return hashlib.sha256(text.encode()).hexdigest()
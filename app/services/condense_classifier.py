@@ -0,0 +1,167 @@
+"""Heuristic detection of follow-ups that depend on earlier turns."""
+
+import re
+
+# Pronouns and demonstratives that usually point back to an earlier turn
+_ANAPHORA = frozenset(
+    {
+        "it",
+        "its",
+        "it's",
+        "they",
+        "them",
+        "their",
+        "theirs",
+        "he",
+        "him",
+        "his",
+        "she",
+        "her",
+        "hers",
+        "this",
+        "that",
+        "these",
+        "those",
+        "there",
+        "such",
+        "same",
+        "former",
+        "latter",
+        "above",
+        "aforementioned",
+        "one",
+        "ones",
+    }
+)
+
+# Words that only make sense relative to something said before
+_CONTINUATIONS = frozenset(
+    {"else", "again", "too", "also", "instead", "otherwise", "more", "other"}
+)
+
+# Openings of elliptical follow-ups ("and for a wife?", "what about nobles?")
+_ELLIPSIS_OPENINGS = re.compile(
+    r"^(?:and|but|or|so|then|also|what about|how about|why|why not|"
+    r"same for|as for|plus)\b",
+    re.IGNORECASE,
+)
+
+
+def needs_condensation(question: str, min_words: int = 4) -> bool:
+    """
+    Return whether a follow-up must be rewritten using the conversation.
+
+    The check is deliberately conservative: a question is only treated as
+    standalone when it has at least ``min_words`` words, does not open like
+    an elliptical follow-up, and contains no pronoun, demonstrative or
+    continuation word referring back to earlier turns.
+
+    Args:
+        question: The follow-up question
+        min_words: Shorter questions are treated as fragments
+
+    Returns:
+        True if the question should be condensed before retrieval
+    """
+    words = re.findall(r"[\w']+", question.lower())
+    if len(words) < min_words:
+        return True
+    if _ELLIPSIS_OPENINGS.match(question.strip()):
+        return True
+    return any(word in _ANAPHORA or word in _CONTINUATIONS for word in words)
+
+
+# Function words a rewrite adds without changing what is retrieved
+_STOPWORDS = frozenset(
+    {
+        "a",
+        "an",
+        "the",
+        "is",
+        "are",
+        "was",
+        "were",
+        "be",
+        "been",
+        "being",
+        "do",
+        "does",
+        "did",
+        "has",
+        "have",
+        "had",
+        "can",
+        "could",
+        "will",
+        "would",
+        "shall",
+        "should",
+        "may",
+        "might",
+        "must",
+        "what",
+        "which",
+        "who",
+        "whom",
+        "whose",
+        "when",
+        "where",
+        "how",
+        "why",
+        "of",
+        "in",
+        "on",
+        "at",
+        "to",
+        "for",
+        "from",
+        "by",
+        "with",
+        "about",
+        "under",
+        "into",
+        "as",
+        "and",
+        "or",
+        "but",
+        "if",
+        "then",
+        "so",
+        "not",
+        "no",
+        "any",
+        "some",
+        "all",
+        "there",
+        "i",
+        "you",
+        "we",
+        "me",
+        "my",
+        "your",
+        "our",
+    }
+)
+
+
+def new_content_words(question: str, rewrite: str) -> set[str]:
+    """
+    Return the content words a rewrite of a follow-up adds to it.
+
+    A rewrite adding none only rephrased the question, so anything retrieved
+    for the raw question still fits; a rewrite resolving a referent ("it"
+    into "theft") adds the word that retrieval needs.
+
+    Args:
+        question: The follow-up question
+        rewrite: The standalone question it was condensed into
+
+    Returns:
+        Words of the rewrite missing from the question, besides stopwords
+    """
+    asked = set(re.findall(r"[\w']+", question.lower()))
+    return {
+        word
+        for word in re.findall(r"[\w']+", rewrite.lower())
+        if word not in asked and word not in _STOPWORDS
+    }
@@ -0,0 +1,91 @@
+"""Incrementally maintained chat memory of a conversation."""
+
+from collections import deque
+
+from llama_index.core.llms import ChatMessage, MessageRole
+from llama_index.core.utils import get_tokenizer
+
+from app.models import Message
+
+_ROLES = {"user": MessageRole.USER, "assistant": MessageRole.ASSISTANT}
+
+
+class ConversationMemory:
+    """
+    Token-bounded window over the latest messages of a conversation.
+
+    Each message is converted and tokenized once, when it is appended. The
+    oldest messages are dropped once the window exceeds ``token_limit`` (or
+    ``recent_messages`` messages, when set), so reading the memory costs the
+    same however long the conversation gets.
+
+    With ``recent_messages`` set, dropped messages are kept until they are
+    folded into ``summary`` (see ``take_unsummarized``), and the summary is
+    returned ahead of the window.
+    """
+
+    def __init__(self, token_limit: int = 3000, recent_messages: int | None = None):
+        self.token_limit = token_limit
+        self.recent_messages = recent_messages
+        self.total_tokens = 0
+        self.summary = ""
+        self._messages: deque[tuple[ChatMessage, int]] = deque()
+        self._unsummarized: list[ChatMessage] = []
+        self._tokenizer = get_tokenizer()
+
+    def append(self, message: Message) -> None:
+        """Add a message, dropping the oldest ones beyond the window."""
+        role = _ROLES.get(message.role)
+        if role is None:
+            return
+        tokens = len(self._tokenizer(message.content))
+        self._messages.append((ChatMessage(role=role, content=message.content), tokens))
+        self.total_tokens += tokens
+
+        while len(self._messages) > 1 and self._over_limit():
+            self._drop_oldest()
+        # Like ChatMemoryBuffer, never start the window with an assistant reply
+        while len(self._messages) > 1 and self._messages[0][0].role != MessageRole.USER:
+            self._drop_oldest()
+
+    def _over_limit(self) -> bool:
+        if self.total_tokens > self.token_limit:
+            return True
+        return (
+            self.recent_messages is not None
+            and len(self._messages) > self.recent_messages
+        )
+
+    def _drop_oldest(self) -> None:
+        message, tokens = self._messages.popleft()
+        self.total_tokens -= tokens
+        if self.recent_messages is not None:
+            self._unsummarized.append(message)
+
+    @property
+    def has_unsummarized(self) -> bool:
+        """Whether messages left the window since the summary was updated."""
+        return bool(self._unsummarized)
+
+    def take_unsummarized(self) -> list[ChatMessage]:
+        """Return and clear the messages not folded into the summary yet."""
+        messages, self._unsummarized = self._unsummarized, []
+        return messages
+
+    def restore_unsummarized(self, messages: list[ChatMessage]) -> None:
+        """Put back messages whose summarization failed."""
+        self._unsummarized = messages + self._unsummarized
+
+    def get(self) -> list[ChatMessage]:
+        """Return the summary (if any) and the messages in the window."""
+        messages = [message for message, _ in self._messages]
+        if self.summary:
+            summary = ChatMessage(
+                role=MessageRole.SYSTEM,
+                content=f"Summary of the earlier conversation: {self.summary}",
+            )
+            return [summary, *messages]
+        return messages
+
+    def __len__(self) -> int:
+        return len(self._messages)
@@ -1,19 +1,478 @@
-"""Service for managing conversations in memory."""
+"""Service for managing conversations in memory, and the store interface."""
 
+import asyncio
+import itertools
+import json
+import logging
+import sys
+import tempfile
 import uuid
+import weakref
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
 from datetime import UTC, datetime
 
-from app.models import Conversation, Message
+from llama_index.core.llms import ChatMessage
 
+from app.config import settings as app_settings
+from app.models import (
+    Citation,
+    Conversation,
+    ConversationChanges,
+    ConversationListResponse,
+    ConversationSummary,
+    Message,
+    MessageListResponse,
+)
+from app.services.citation_refs import CitationCodec
+from app.services.conversation_memory import ConversationMemory
+from app.services.idempotency import IdempotencyStore
+from app.services.spill_store import CompressedSpillStore
 
-class ConversationService:
+logger = logging.getLogger(__name__)
+
+# (current summary, messages to fold in) -> updated summary
+Summarizer = Callable[[str, list[ChatMessage]], Awaitable[str]]
+
+DEFAULT_TITLE = "New Conversation"
+PREVIEW_CHARS = 100  # Length of the last-message preview in conversation lists
+# Rough size of the pydantic objects around the strings of a message or
+# conversation, used to estimate resident memory
+OBJECT_OVERHEAD_BYTES = 400
+# Size of the change version kept per resident message (an int and its slot)
+SEQUENCE_BYTES = 36
+
+
+def message_preview(content: str) -> str:
+    """Shorten a message for the conversation list."""
+    return content[:PREVIEW_CHARS] + ("..." if len(content) > PREVIEW_CHARS else "")
+
+
+def message_bytes(
+    message: Message, is_shared: Callable[[Citation], bool] | None = None
+) -> int:
+    """
+    Estimate the memory held by a message and its citations.
+
+    Args:
+        message: The message
+        is_shared: Tells citations shared between messages, which only cost
+            a reference
+    """
+    return (
+        OBJECT_OVERHEAD_BYTES
+        + sys.getsizeof(message.content)
+        + sum(
+            (
+                8
+                if is_shared is not None and is_shared(c)
+                else OBJECT_OVERHEAD_BYTES
+                + sys.getsizeof(c.source)
+                + sys.getsizeof(c.text)
+            )
+            for c in message.citations
+        )
+    )
+
+
+def without_citation_text(message: Message) -> Message:
+    """Copy a message with the text of its citations left empty."""
+    return message.model_copy(
+        update={
+            "citations": [
+                citation.model_copy(update={"text": ""})
+                for citation in message.citations
+            ]
+        }
+    )
+
+
+class ConversationBusy(RuntimeError):
+    """
+    Raised when a conversation is still answering a previous message, or a
+    message was added to it since the turn began.
+    """
+
+
+class ConversationStore(ABC):
+    """
+    Interface of the conversation stores.
+
+    Also holds what does not depend on where conversations are kept: the
+    chat memories of this process and their rolling summaries, turn locks
+    and change notifications.
+    """
+
+    # How often a change poll rechecks for changes it is not woken up for
+    # (None: every change in this store wakes it up)
+    change_poll_seconds: float | None = None
+
+    def __init__(
+        self,
+        summarizer: Summarizer | None = None,
+        citation_codec: CitationCodec | None = None,
+    ):
+        """
+        Initialize the state shared by every store.
+
+        Args:
+            summarizer: Optional coroutine function keeping a rolling summary
+                of the turns that leave each conversation's memory window
+            citation_codec: Optional codec sharing one copy of each cited text
+        """
+        # Chat memory of each conversation, updated as messages are added
+        self.memories: dict[str, ConversationMemory] = {}
+        self.summarizer = summarizer
+        self.citation_codec = citation_codec
+        self._summary_tasks: dict[str, asyncio.Task] = {}
+        # One lock per conversation with a turn in progress; a lock is
+        # dropped once no turn holds or waits for it
+        self._turn_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = (
+            weakref.WeakValueDictionary()
+        )
+        self._changed = asyncio.Event()
+
+    @abstractmethod
+    def create_conversation(self, title: str = DEFAULT_TITLE) -> Conversation:
+        """Create a new conversation."""
+
+    @abstractmethod
+    def get_conversation(self, conversation_id: str) -> Conversation | None:
+        """Get a conversation by ID."""
+
+    @abstractmethod
+    def get_conversation_json(self, conversation_id: str) -> bytes | None:
+        """Get a conversation serialized as JSON, None if it does not exist."""
+
+    @abstractmethod
+    def get_memory(self, conversation_id: str) -> ConversationMemory | None:
+        """Get the chat memory of a conversation by ID."""
+
+    @abstractmethod
+    def get_message_count(self, conversation_id: str) -> int | None:
+        """Get the number of messages in a conversation, None if not found."""
+
+    @abstractmethod
+    def get_all_conversations(self) -> list[Conversation]:
+        """Get all conversations sorted by updated_at descending."""
+
+    @abstractmethod
+    def get_conversation_summaries(
+        self, limit: int, cursor: str | None = None
+    ) -> ConversationListResponse:
+        """Get one page of conversation summaries, most recently updated first."""
+
+    @abstractmethod
+    def get_messages(
+        self,
+        conversation_id: str,
+        limit: int,
+        before: int | None = None,
+        include_citation_text: bool = True,
+    ) -> MessageListResponse | None:
+        """Get one page of a conversation's messages, ending with the latest."""
+
+    @abstractmethod
+    def add_message(
+        self,
+        conversation_id: str,
+        message: Message,
+        expected_count: int | None = None,
+        idempotency_key: str | None = None,
+    ) -> Conversation | None:
+        """Add a message to a conversation, None if it does not exist."""
+
+    @abstractmethod
+    def delete_conversation(self, conversation_id: str) -> bool:
+        """Delete a conversation."""
+
+    @abstractmethod
+    def update_conversation_title(
+        self, conversation_id: str, title: str
+    ) -> Conversation | None:
+        """Update conversation title."""
+
+    @abstractmethod
+    def get_changes(self, since: str | None = None) -> ConversationChanges:
+        """Get what changed in the conversations after a cursor."""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Return statistics of the store."""
+
+    @abstractmethod
+    def close(self) -> None:
+        """Release the resources of the store."""
+
+    def _notify_changes(self) -> None:
+        """Wake up the change polls waiting in this process."""
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _new_memory(self) -> ConversationMemory:
+        """Create an empty chat memory for a conversation."""
+        return ConversationMemory(
+            token_limit=app_settings.conversation_memory_token_limit,
+            # Older turns are summarized instead of kept verbatim
+            recent_messages=(
+                app_settings.conversation_memory_recent_messages
+                if self.summarizer is not None
+                else None
+            ),
+        )
+
+    @asynccontextmanager
+    async def turn(
+        self, conversation_id: str, wait_seconds: float = 0.0
+    ) -> AsyncIterator[None]:
+        """
+        Hold a conversation for one question-and-answer turn.
+
+        Turns of the same conversation run one at a time, so each one sees
+        the complete history of the previous turns. Turns of different
+        conversations never wait for each other.
+
+        Args:
+            conversation_id: The conversation ID
+            wait_seconds: How long to wait for a turn in progress (0 does not
+                wait)
+
+        Raises:
+            ConversationBusy: If the previous turn did not finish in time
+        """
+        lock = self._turn_locks.get(conversation_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._turn_locks[conversation_id] = lock
+        if lock.locked() and wait_seconds <= 0:
+            raise ConversationBusy(f"Conversation {conversation_id} is busy")
+        try:
+            async with asyncio.timeout(wait_seconds if wait_seconds > 0 else None):
+                await lock.acquire()
+        except TimeoutError:
+            raise ConversationBusy(f"Conversation {conversation_id} is busy") from None
+        try:
+            yield
+        finally:
+            lock.release()
+
+    # Async variants used by the API. Kept in memory they run inline; a store
+    # doing blocking I/O runs it off the event loop.
+
+    async def acreate_conversation(self, title: str = DEFAULT_TITLE) -> Conversation:
+        """Create a new conversation without blocking the event loop."""
+        return self.create_conversation(title)
+
+    async def aget_conversation_json(self, conversation_id: str) -> bytes | None:
+        """Get a conversation as JSON without blocking the event loop."""
+        return self.get_conversation_json(conversation_id)
+
+    async def aget_conversation_summaries(
+        self, limit: int, cursor: str | None = None
+    ) -> ConversationListResponse:
+        """Get one page of conversation summaries without blocking the event loop."""
+        return self.get_conversation_summaries(limit, cursor)
+
+    async def aget_messages(
+        self,
+        conversation_id: str,
+        limit: int,
+        before: int | None = None,
+        include_citation_text: bool = True,
+    ) -> MessageListResponse | None:
+        """Get one page of messages without blocking the event loop."""
+        return self.get_messages(conversation_id, limit, before, include_citation_text)
+
+    async def adelete_conversation(self, conversation_id: str) -> bool:
+        """Delete a conversation without blocking the event loop."""
+        return self.delete_conversation(conversation_id)
+
+    async def aupdate_conversation_title(
+        self, conversation_id: str, title: str
+    ) -> Conversation | None:
+        """Update conversation title without blocking the event loop."""
+        return self.update_conversation_title(conversation_id, title)
+
+    async def aget_changes(self, since: str | None = None) -> ConversationChanges:
+        """Get the changes after a cursor without blocking the event loop."""
+        return self.get_changes(since)
+
+    async def aget_conversation(self, conversation_id: str) -> Conversation | None:
+        """Get a conversation by ID without blocking the event loop."""
+        return self.get_conversation(conversation_id)
+
+    async def aget_memory(self, conversation_id: str) -> ConversationMemory | None:
+        """Get the chat memory of a conversation without blocking the event loop."""
+        return self.get_memory(conversation_id)
+
+    async def aget_message_count(self, conversation_id: str) -> int | None:
+        """Count a conversation's messages without blocking the event loop."""
+        return self.get_message_count(conversation_id)
+
+    async def aadd_message(
+        self,
+        conversation_id: str,
+        message: Message,
+        expected_count: int | None = None,
+        idempotency_key: str | None = None,
+    ) -> Conversation | None:
+        """Add a message to a conversation without blocking the event loop."""
+        return self.add_message(
+            conversation_id, message, expected_count, idempotency_key
+        )
+
+    @staticmethod
+    def _title_from_message(content: str) -> str:
+        """Build a conversation title from its first user message."""
+        # Use first 50 chars of first user message as title
+        return content[:50] + ("..." if len(content) > 50 else "")
+
+    def _schedule_summary(
+        self, conversation_id: str, memory: ConversationMemory
+    ) -> None:
+        """Update the rolling summary in the background if turns left the window."""
+        if self.summarizer is None or not memory.has_unsummarized:
+            return
+        if conversation_id in self._summary_tasks:
+            # The running update picks up the new messages when it finishes
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self._update_summary(conversation_id, memory))
+        self._summary_tasks[conversation_id] = task
+
+    async def _update_summary(
+        self, conversation_id: str, memory: ConversationMemory
+    ) -> None:
+        """Fold the messages that left the window into the summary."""
+        try:
+            while memory.has_unsummarized:
+                messages = memory.take_unsummarized()
+                try:
+                    memory.summary = await self.summarizer(memory.summary, messages)
+                except Exception as e:
+                    memory.restore_unsummarized(messages)
+                    logger.warning(
+                        "Summarizing conversation %s failed: %s", conversation_id, e
+                    )
+                    return
+        finally:
+            self._summary_tasks.pop(conversation_id, None)
+
+    async def wait_for_summaries(self) -> None:
+        """Wait until every pending summary update has finished."""
+        while self._summary_tasks:
+            await asyncio.gather(*self._summary_tasks.values())
+
+    async def wait_for_changes(
+        self, since: str | None, timeout: float
+    ) -> ConversationChanges:
+        """
+        Get the changes after a cursor, waiting for one if there are none.
+
+        Args:
+            since: `cursor` of the previous changes, None for only the current
+                cursor
+            timeout: Longest wait in seconds before returning no changes
+
+        Returns:
+            ConversationChanges: The changes, empty if none came in time
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            changes = await self.aget_changes(since)
+            remaining = deadline - loop.time()
+            if (
+                since is None
+                or changes.conversations
+                or changes.deleted
+                or changes.reset
+                or remaining <= 0
+            ):
+                return changes
+            if self.change_poll_seconds is not None:
+                remaining = min(remaining, self.change_poll_seconds)
+            try:
+                async with asyncio.timeout(remaining):
+                    await self._changed.wait()
+            except TimeoutError:
+                pass
+
+
+class ConversationService(ConversationStore):
     """Service for managing conversations stored in memory."""
 
-    def __init__(self):
-        """Initialize with empty conversations list."""
-        self.conversations: dict[str, Conversation] = {}
+    def __init__(
+        self,
+        summarizer: Summarizer | None = None,
+        memory_budget_bytes: int | None = None,
+        spill_path: str | None = None,
+        citation_codec: CitationCodec | None = None,
+    ):
+        """
+        Initialize with empty conversations list.
 
-    def create_conversation(self, title: str = "New Conversation") -> Conversation:
+        Args:
+            summarizer: Optional coroutine function keeping a rolling summary
+                of the turns that leave each conversation's memory window
+            memory_budget_bytes: Estimated memory the resident conversations
+                may use; above it, the least recently used ones are spilled
+                to disk (None keeps every conversation in memory)
+            spill_path: Directory for spilled conversations (a temporary
+                directory when not set)
+            citation_codec: Optional codec sharing one copy of each cited
+                text between messages
+        """
+        super().__init__(summarizer, citation_codec)
+        # Resident conversations, least recently used first
+        self.conversations: OrderedDict[str, Conversation] = OrderedDict()
+        # Answers of messages sent with an idempotency key
+        self.idempotency = IdempotencyStore(
+            max_entries=app_settings.conversation_idempotency_max_keys,
+            ttl_seconds=app_settings.conversation_idempotency_ttl_seconds,
+        )
+        # Conversations ordered by last update: every update takes the next
+        # sequence number, so the ascending list of live sequence numbers is
+        # the updated_at order without sorting
+        self._sequence = itertools.count(1)
+        self._update_sequences: dict[str, int] = {}
+        self._update_order: list[int] = []
+        self._ids_by_sequence: dict[int, str] = {}
+        # Sequence numbers double as change versions for change polling: the
+        # version of each message, and of each recent deletion
+        self._version = 0
+        self._message_sequences: dict[str, list[int]] = {}
+        self._deleted: OrderedDict[str, int] = OrderedDict()
+        self._tombstone_floor = 0  # Deletions up to here are forgotten
+        # Memory budget: estimated size of each resident conversation, and
+        # the list-view summary of each spilled one
+        self.memory_budget_bytes = memory_budget_bytes
+        self.resident_bytes = 0
+        self._sizes: dict[str, int] = {}
+        self._spilled: dict[str, ConversationSummary] = {}
+        self._spill_store: CompressedSpillStore | None = None
+        if memory_budget_bytes is not None:
+            self._spill_store = CompressedSpillStore(
+                spill_path or tempfile.gettempdir()
+            )
+        self.evictions = 0
+        self.rehydrations = 0
+        # JSON of each message, serialized once when it is added (messages
+        # never change); citations shared through the codec are left out of
+        # it and serialized once each, so their text is not copied per message
+        self._message_json: dict[str, list[tuple[bytes, bool]]] = {}
+        self._citation_json: dict[int, bytes] = {}
+
+    def create_conversation(self, title: str = DEFAULT_TITLE) -> Conversation:
         """Create a new conversation."""
         conversation_id = str(uuid.uuid4())
         conversation = Conversation(
@@ -24,52 +483,508 @@ class ConversationService:
             updated_at=datetime.now(UTC),
         )
         self.conversations[conversation_id] = conversation
+        self.memories[conversation_id] = self._new_memory()
+        self._touch(conversation_id)
+        self._resize(conversation_id, OBJECT_OVERHEAD_BYTES + sys.getsizeof(title))
         return conversation
 
+    def _resident(self, conversation_id: str) -> Conversation | None:
+        """Get a conversation, loading it back if it was spilled to disk."""
+        conversation = self.conversations.get(conversation_id)
+        if conversation is not None:
+            self.conversations.move_to_end(conversation_id)
+            return conversation
+        if conversation_id not in self._spilled:
+            return None
+        return self._rehydrate(conversation_id)
+
+    def _resize(self, conversation_id: str, delta: int) -> None:
+        """Account a change of a resident conversation's size."""
+        self._sizes[conversation_id] = self._sizes.get(conversation_id, 0) + delta
+        self.resident_bytes += delta
+        self._enforce_budget(keep=conversation_id)
+
+    def _dedupe_citations(self, message: Message) -> Message:
+        """Point a message's citations to the codec's shared copies."""
+        if self.citation_codec is None or not message.citations:
+            return message
+        return message.model_copy(
+            update={
+                "citations": [self.citation_codec.dedupe(c) for c in message.citations]
+            }
+        )
+
+    def _message_bytes(self, message: Message) -> int:
+        """Estimate the memory held by a stored message."""
+        return message_bytes(
+            message,
+            self.citation_codec.is_shared if self.citation_codec else None,
+        )
+
+    def _enforce_budget(self, keep: str) -> None:
+        """Spill least recently used conversations until within the budget."""
+        if self.memory_budget_bytes is None:
+            return
+        while self.resident_bytes > self.memory_budget_bytes:
+            victim = next(
+                (
+                    conversation_id
+                    for conversation_id in self.conversations
+                    if conversation_id != keep and not self._is_busy(conversation_id)
+                ),
+                None,
+            )
+            if victim is None:
+                return
+            self._spill(victim)
+
+    def _is_busy(self, conversation_id: str) -> bool:
+        """Whether a turn or a summary update is using the conversation."""
+        lock = self._turn_locks.get(conversation_id)
+        return conversation_id in self._summary_tasks or (
+            lock is not None and lock.locked()
+        )
+
+    def _spill(self, conversation_id: str) -> None:
+        """Move a resident conversation to compressed disk storage."""
+        conversation = self.conversations.pop(conversation_id)
+        memory = self.memories.pop(conversation_id, None)
+        dumped = conversation.model_dump(mode="json")
+        if self.citation_codec is not None:
+            for message, item in zip(
+                conversation.messages, dumped["messages"], strict=True
+            ):
+                item["citations"] = self._spill_citations(message.citations)
+        payload = {
+            "conversation": dumped,
+            "summary": memory.summary if memory is not None else "",
+            "message_sequences": self._message_sequences.pop(conversation_id, []),
+        }
+        self._spill_store.write(conversation_id, json.dumps(payload).encode())
+        self._spilled[conversation_id] = self._summarize(conversation)
+        self._message_json.pop(conversation_id, None)
+        self.resident_bytes -= self._sizes.pop(conversation_id, 0)
+        self.evictions += 1
+
+    def _load_spilled(self, conversation_id: str) -> dict:
+        """Read a spilled conversation, its memory summary and message versions."""
+        payload = json.loads(self._spill_store.read(conversation_id))
+        for item in payload["conversation"]["messages"]:
+            if isinstance(item["citations"], str):
+                item["citations"] = self.citation_codec.loads(
+                    item["citations"], self._read_spilled_citation_texts
+                )
+        payload["conversation"] = Conversation.model_validate(payload["conversation"])
+        return payload
+
+    def _spill_citations(self, citations: list[Citation]) -> str:
+        """Encode spilled citations, writing each cited text to disk once."""
+        data, texts = self.citation_codec.dumps(citations)
+        for key, text in texts.items():
+            # Kept until the store closes, as other conversations may cite it
+            if f"citation-{key}" not in self._spill_store:
+                self._spill_store.write(f"citation-{key}", text.encode())
+        return data
+
+    def _read_spilled_citation_texts(self, keys: list[str]) -> dict[str, str]:
+        """Read spilled cited texts by their hash."""
+        return {key: self._spill_store.read(f"citation-{key}").decode() for key in keys}
+
+    def _rehydrate(self, conversation_id: str) -> Conversation:
+        """Load a spilled conversation back into memory."""
+        payload = self._load_spilled(conversation_id)
+        self._spill_store.delete(conversation_id)
+        del self._spilled[conversation_id]
+        conversation = payload["conversation"]
+        conversation.messages = [
+            self._dedupe_citations(m) for m in conversation.messages
+        ]
+        self.conversations[conversation_id] = conversation
+        self._message_sequences[conversation_id] = payload["message_sequences"]
+
+        memory = self._new_memory()
+        for message in conversation.messages:
+            memory.append(message)
+        if payload["summary"]:
+            # Turns that left the window are already in the saved summary
+            memory.take_unsummarized()
+            memory.summary = payload["summary"]
+        self.memories[conversation_id] = memory
+
+        self.rehydrations += 1
+        self._resize(
+            conversation_id,
+            OBJECT_OVERHEAD_BYTES
+            + sys.getsizeof(conversation.title)
+            + sum(
+                self._message_bytes(m) + SEQUENCE_BYTES for m in conversation.messages
+            )
+            + sum(len(json) for json, _ in self._message_fragments(conversation)),
+        )
+        return conversation
+
+    def _message_fragments(
+        self, conversation: Conversation
+    ) -> list[tuple[bytes, bool]]:
+        """Serialize the messages added since the conversation was last read."""
+        fragments = self._message_json.setdefault(conversation.id, [])
+        for message in conversation.messages[len(fragments) :]:
+            shared = self.citation_codec is not None and any(
+                self.citation_codec.is_shared(c) for c in message.citations
+            )
+            exclude = {"citations"} if shared else None
+            fragments.append(
+                (message.model_dump_json(exclude=exclude).encode(), shared)
+            )
+        return fragments
+
+    def _citation_fragment(self, citation: Citation) -> bytes:
+        """Serialize a citation, once for those shared through the codec."""
+        if self.citation_codec is None or not self.citation_codec.is_shared(citation):
+            return citation.model_dump_json().encode()
+        fragment = self._citation_json.get(id(citation))
+        if fragment is None:
+            fragment = citation.model_dump_json().encode()
+            self._citation_json[id(citation)] = fragment
+            # Shared by every conversation, so not part of any one's size
+            self.resident_bytes += len(fragment)
+        return fragment
+
+    def _next_change(self) -> int:
+        """Take the next sequence number as the version of a change."""
+        self._version = next(self._sequence)
+        self._notify_changes()
+        return self._version
+
+    def _touch(self, conversation_id: str) -> None:
+        """Move a conversation to the front of the update order."""
+        self._forget_order(conversation_id)
+        sequence = self._next_change()
+        self._update_sequences[conversation_id] = sequence
+        self._update_order.append(sequence)
+        self._ids_by_sequence[sequence] = conversation_id
+
+    def _forget_order(self, conversation_id: str) -> None:
+        """Remove a conversation from the update order."""
+        sequence = self._update_sequences.pop(conversation_id, None)
+        if sequence is not None:
+            del self._update_order[bisect_left(self._update_order, sequence)]
+            del self._ids_by_sequence[sequence]
+
     def get_conversation(self, conversation_id: str) -> Conversation | None:
         """Get a conversation by ID."""
-        return self.conversations.get(conversation_id)
+        return self._resident(conversation_id)
+
+    def get_conversation_json(self, conversation_id: str) -> bytes | None:
+        """
+        Get a conversation serialized as JSON, from its cached message JSON.
+
+        Args:
+            conversation_id: The conversation ID
+
+        Returns:
+            The JSON of the Conversation model, or None if it does not exist
+        """
+        conversation = self._resident(conversation_id)
+        if not conversation:
+            return None
+
+        messages = []
+        fragments = self._message_fragments(conversation)
+        for message, (fragment, shared) in zip(
+            conversation.messages, fragments, strict=True
+        ):
+            if shared:
+                citations = b",".join(
+                    self._citation_fragment(c) for c in message.citations
+                )
+                fragment = fragment[:-1] + b',"citations":[' + citations + b"]}"
+            messages.append(fragment)
+        header = conversation.model_dump_json(exclude={"messages"}).encode()
+        return header[:-1] + b',"messages":[' + b",".join(messages) + b"]}"
+
+    def get_memory(self, conversation_id: str) -> ConversationMemory | None:
+        """Get the chat memory of a conversation by ID."""
+        if self._resident(conversation_id) is None:
+            return None
+        return self.memories.get(conversation_id)
+
+    def get_message_count(self, conversation_id: str) -> int | None:
+        """Get the number of messages in a conversation, None if not found."""
+        conversation = self._resident(conversation_id)
+        if conversation is None:
+            return None
+        return len(conversation.messages)
 
     def get_all_conversations(self) -> list[Conversation]:
         """Get all conversations sorted by updated_at descending."""
-        conversations = list(self.conversations.values())
-        return sorted(conversations, key=lambda c: c.updated_at, reverse=True)
+        # Spilled conversations are read without loading them back
+        return [
+            self.conversations.get(conversation_id)
+            or self._load_spilled(conversation_id)["conversation"]
+            for conversation_id in (
+                self._ids_by_sequence[sequence]
+                for sequence in reversed(self._update_order)
+            )
+        ]
+
+    def get_conversation_summaries(
+        self, limit: int, cursor: str | None = None
+    ) -> ConversationListResponse:
+        """
+        Get one page of conversation summaries, most recently updated first.
+
+        Args:
+            limit: Maximum number of conversations in the page
+            cursor: `next_cursor` of the previous page, None for the first page
+
+        Returns:
+            ConversationListResponse: The page and the cursor of the next one
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        end = len(self._update_order)
+        if cursor is not None:
+            try:
+                end = bisect_left(self._update_order, int(cursor))
+            except ValueError:
+                raise ValueError(f"Invalid cursor: {cursor!r}") from None
+        start = max(0, end - limit)
+        sequences = self._update_order[start:end]
+        summaries = []
+        for sequence in reversed(sequences):
+            conversation_id = self._ids_by_sequence[sequence]
+            conversation = self.conversations.get(conversation_id)
+            summaries.append(
+                self._summarize(conversation)
+                if conversation is not None
+                else self._spilled[conversation_id]
+            )
+        return ConversationListResponse(
+            total=len(self.conversations) + len(self._spilled),
+            conversations=summaries,
+            next_cursor=str(sequences[0]) if start > 0 else None,
+        )
+
+    @staticmethod
+    def _summarize(conversation: Conversation) -> ConversationSummary:
+        """Build the list-view summary of a conversation."""
+        return ConversationSummary(
+            id=conversation.id,
+            title=conversation.title,
+            updated_at=conversation.updated_at,
+            message_count=len(conversation.messages),
+            last_message_preview=(
+                message_preview(conversation.messages[-1].content)
+                if conversation.messages
+                else None
+            ),
+        )
+
+    def get_messages(
+        self,
+        conversation_id: str,
+        limit: int,
+        before: int | None = None,
+        include_citation_text: bool = True,
+    ) -> MessageListResponse | None:
+        """
+        Get one page of a conversation's messages, ending with the latest.
+
+        Messages are addressed by their position in the conversation, which
+        never changes since messages are only appended.
+
+        Args:
+            conversation_id: The conversation ID
+            limit: Maximum number of messages in the page
+            before: `next_before` of the previous page, None for the latest
+            include_citation_text: Whether to return the text of citations
+
+        Returns:
+            MessageListResponse: The page (oldest first) and the cursor of the
+                older one, or None if the conversation does not exist
+        """
+        conversation = self._resident(conversation_id)
+        if not conversation:
+            return None
+
+        end = len(conversation.messages)
+        if before is not None:
+            end = min(end, before)
+        start = max(0, end - limit)
+        messages = conversation.messages[start:end]
+        if not include_citation_text:
+            messages = [without_citation_text(m) for m in messages]
+        return MessageListResponse(
+            messages=messages, next_before=start if start > 0 else None
+        )
 
     def add_message(
-        self, conversation_id: str, message: Message
+        self,
+        conversation_id: str,
+        message: Message,
+        expected_count: int | None = None,
+        idempotency_key: str | None = None,
     ) -> Conversation | None:
-        """Add a message to a conversation."""
-        conversation = self.conversations.get(conversation_id)
+        """
+        Add a message to a conversation.
+
+        Args:
+            conversation_id: The conversation ID
+            message: The message to append
+            expected_count: Number of messages the conversation must have
+                before this one, None to append unconditionally
+            idempotency_key: Idempotency key of the request the message
+                answers; only stores shared between workers record it
+
+        Returns:
+            Conversation: The updated conversation, or None if not found
+
+        Raises:
+            ConversationBusy: If the conversation has another number of messages
+        """
+        conversation = self._resident(conversation_id)
         if not conversation:
             return None
+        if expected_count is not None and len(conversation.messages) != expected_count:
+            raise ConversationBusy(
+                f"Conversation {conversation_id} changed during the turn"
+            )
 
+        message = self._dedupe_citations(message)
         conversation.messages.append(message)
         conversation.updated_at = datetime.now(UTC)
+        self._touch(conversation_id)
+        self._message_sequences.setdefault(conversation_id, []).append(self._version)
+        fragments = self._message_fragments(conversation)
+        size = self._message_bytes(message) + len(fragments[-1][0]) + SEQUENCE_BYTES
+        memory = self.memories.get(conversation_id)
+        if memory is not None:
+            memory.append(message)
+            if message.role == "assistant":
+                self._schedule_summary(conversation_id, memory)
 
         # Auto-generate title from first user message if still default
-        if conversation.title == "New Conversation" and message.role == "user":
-            # Use first 50 chars of first user message as title
-            conversation.title = message.content[:50] + (
-                "..." if len(message.content) > 50 else ""
-            )
+        if conversation.title == DEFAULT_TITLE and message.role == "user":
+            conversation.title = self._title_from_message(message.content)
+            size += sys.getsizeof(conversation.title) - sys.getsizeof(DEFAULT_TITLE)
 
+        self._resize(conversation_id, size)
         return conversation
 
     def delete_conversation(self, conversation_id: str) -> bool:
         """Delete a conversation."""
-        if conversation_id in self.conversations:
+        if conversation_id in self._spilled:
+            del self._spilled[conversation_id]
+            self._spill_store.delete(conversation_id)
+        elif conversation_id in self.conversations:
             del self.conversations[conversation_id]
-            return True
-        return False
+            self._message_json.pop(conversation_id, None)
+            self.resident_bytes -= self._sizes.pop(conversation_id, 0)
+            self.memories.pop(conversation_id, None)
+            task = self._summary_tasks.pop(conversation_id, None)
+            if task is not None:
+                task.cancel()
+        else:
+            return False
+        self._forget_order(conversation_id)
+        self._message_sequences.pop(conversation_id, None)
+        self._deleted[conversation_id] = self._next_change()
+        while len(self._deleted) > app_settings.conversation_change_tombstones:
+            _, self._tombstone_floor = self._deleted.popitem(last=False)
+        return True
 
     def update_conversation_title(
         self, conversation_id: str, title: str
     ) -> Conversation | None:
         """Update conversation title."""
-        conversation = self.conversations.get(conversation_id)
+        conversation = self._resident(conversation_id)
         if not conversation:
             return None
 
+        size = sys.getsizeof(title) - sys.getsizeof(conversation.title)
         conversation.title = title
         conversation.updated_at = datetime.now(UTC)
+        self._touch(conversation_id)
+        self._resize(conversation_id, size)
         return conversation
+
+    def get_changes(self, since: str | None = None) -> ConversationChanges:
+        """
+        Get what changed in the conversations after a cursor.
+
+        Args:
+            since: `cursor` of the previous changes, None for only the current
+                cursor
+
+        Returns:
+            ConversationChanges: Created or updated conversations, their new
+                messages, deleted conversations and the cursor to pass next
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        cursor = str(self._version)
+        if since is None:
+            # Clients read the conversations from the paged endpoints
+            return ConversationChanges(
+                cursor=cursor, conversations=[], messages={}, deleted=[]
+            )
+        try:
+            version = int(since)
+        except ValueError:
+            raise ValueError(f"Invalid cursor: {since!r}") from None
+        if version < self._tombstone_floor or version > self._version:
+            # Deletions were forgotten, or the cursor is from another process
+            return ConversationChanges(
+                cursor=cursor, conversations=[], messages={}, deleted=[], reset=True
+            )
+
+        summaries = []
+        messages = {}
+        start = bisect_right(self._update_order, version)
+        for sequence in reversed(self._update_order[start:]):
+            conversation_id = self._ids_by_sequence[sequence]
+            conversation = self.conversations.get(conversation_id)
+            sequences = self._message_sequences.get(conversation_id, [])
+            if conversation is None:
+                # Read without loading it back, like get_all_conversations
+                payload = self._load_spilled(conversation_id)
+                conversation = payload["conversation"]
+                sequences = payload["message_sequences"]
+            summaries.append(self._summarize(conversation))
+            first_new = bisect_right(sequences, version)
+            if first_new < len(conversation.messages):
+                messages[conversation_id] = conversation.messages[first_new:]
+        return ConversationChanges(
+            cursor=cursor,
+            conversations=summaries,
+            messages=messages,
+            deleted=[
+                conversation_id
+                for conversation_id, deleted_at in self._deleted.items()
+                if deleted_at > version
+            ],
+        )
+
+    def stats(self) -> dict:
+        """Return resident memory, disk spill and idempotency statistics."""
+        return {
+            "store": "memory",
+            "resident_conversations": len(self.conversations),
+            "resident_bytes": self.resident_bytes,
+            "memory_budget_bytes": self.memory_budget_bytes,
+            "spilled_conversations": len(self._spilled),
+            "spilled_bytes_on_disk": (
+                self._spill_store.bytes_on_disk if self._spill_store else 0
+            ),
+            "evictions": self.evictions,
+            "rehydrations": self.rehydrations,
+            "idempotency": self.idempotency.stats(),
+        }
+
+    def close(self) -> None:
+        """Remove the spilled conversations from disk."""
+        if self._spill_store is not None:
+            self._spill_store.close()
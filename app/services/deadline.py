@@ -0,0 +1,53 @@
+"""Per-request latency budgets."""
+
+import asyncio
+import time
+from collections.abc import Awaitable
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request's latency budget runs out."""
+
+
+class Deadline:
+    """Point in time by which a request must be answered."""
+
+    def __init__(self, budget_seconds: float):
+        self.budget_seconds = budget_seconds
+        self.expires_at = time.monotonic() + budget_seconds
+
+    @classmethod
+    def from_budget_ms(cls, budget_ms: float | None) -> "Deadline | None":
+        """Start a deadline from a budget in milliseconds, None for no budget."""
+        return cls(budget_ms / 1000) if budget_ms else None
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() == 0.0
+
+
+async def within(deadline: Deadline | None, awaitable: Awaitable[T]) -> T:
+    """
+    Await ``awaitable``, cancelling it when the deadline passes.
+
+    Raises:
+        DeadlineExceeded: If the deadline passed before it completed
+    """
+    if deadline is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, deadline.remaining())
+    except TimeoutError as e:
+        if not deadline.expired:
+            # Raised by the awaitable itself, not by the deadline
+            raise
+        raise DeadlineExceeded(
+            f"Latency budget of {1000 * deadline.budget_seconds:.0f} ms exceeded"
+        ) from e
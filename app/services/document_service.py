@@ -1,10 +1,15 @@
 """Service for loading and processing PDF documents."""
 
+import hashlib
+import io
 import re
 
 import pypdf
+from llama_index.core.llms import ChatMessage, MessageRole
 from llama_index.core.schema import Document
-from openai import OpenAI
+from llama_index.llms.openai import OpenAI
+
+from app.services.llm_client import ResilientLLM, build_resilient_llm
 
 
 class DocumentService:
@@ -14,6 +19,22 @@ class DocumentService:
 
     def __init__(self, file_path: str):
         self.file_path = file_path
+        self.text_llm: ResilientLLM | None = None
+        # Hash of the PDF read by create_documents; unlike the extracted text,
+        # which is cleaned up by an LLM, it is the same on every start
+        self.source_version: str | None = None
+
+    def _get_text_llm(self) -> ResilientLLM:
+        """Return the text-correction LLM, creating it on first use."""
+        if self.text_llm is None:
+            self.text_llm = build_resilient_llm(
+                OpenAI(
+                    model="gpt-4o-mini",
+                    temperature=0.1,  # Low temperature for consistency
+                    max_tokens=1000,  # Adjust based on expected text length
+                )
+            )
+        return self.text_llm
 
     @staticmethod
     def _add_spaces_to_text(text: str) -> str:
@@ -33,14 +54,12 @@ class DocumentService:
 
         return text.strip()
 
-    @staticmethod
-    def _improve_text_with_llm(text: str, api_key: str | None = None) -> str:
+    def _improve_text_with_llm(self, text: str) -> str:
         """
         Use LLM to improve text quality by fixing spacing and OCR errors.
 
         Args:
             text: Raw extracted text
-            api_key: OpenAI API key (optional, uses env var if not provided)
 
         Returns:
             Improved text with proper spacing and corrections
@@ -49,16 +68,12 @@ class DocumentService:
             return text
 
         try:
-            # Initialize OpenAI client
-            client = OpenAI(api_key=api_key) if api_key else OpenAI()
-
-            # Call OpenAI API to fix text
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
+            # Call OpenAI API to fix text (hedged and behind a circuit breaker)
+            response = self._get_text_llm().chat(
+                [
+                    ChatMessage(
+                        role=MessageRole.SYSTEM,
+                        content=(
                             "You are a text correction assistant for legal documents. "
                             "Fix spacing issues and OCR errors in the provided text while "
                             "preserving the exact meaning and all legal terminology. "
@@ -66,17 +81,15 @@ class DocumentService:
                             "Do not rephrase, summarize, or change any legal terms. "
                             "Return ONLY the corrected text without any explanations or additions."
                         ),
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Fix spacing and formatting issues in this text:\n\n{text}",
-                    },
-                ],
-                temperature=0.1,  # Low temperature for consistency
-                max_tokens=1000,  # Adjust based on expected text length
+                    ),
+                    ChatMessage(
+                        role=MessageRole.USER,
+                        content=f"Fix spacing and formatting issues in this text:\n\n{text}",
+                    ),
+                ]
             )
 
-            improved_text = response.choices[0].message.content.strip()
+            improved_text = (response.message.content or "").strip()
 
             # Validate the response is not empty
             if improved_text and len(improved_text) > 0:
@@ -107,10 +120,12 @@ class DocumentService:
     def create_documents(self) -> list[Document]:
         """Parse PDF into Document objects with metadata for each law section."""
         with open(self.file_path, "rb") as pdf_file:
-            reader = pypdf.PdfReader(pdf_file)
-            full_text = "".join(
-                page.extract_text(extraction_mode="layout") for page in reader.pages
-            )
+            data = pdf_file.read()
+        self.source_version = hashlib.sha256(data).hexdigest()[:16]
+        reader = pypdf.PdfReader(io.BytesIO(data))
+        full_text = "".join(
+            page.extract_text(extraction_mode="layout") for page in reader.pages
+        )
 
         full_text = re.sub(r"^.*?(?=1\.\s+)", "", full_text, flags=re.DOTALL)
         full_text = re.sub(r"Citations:.*$", "", full_text, flags=re.DOTALL)
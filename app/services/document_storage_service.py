@@ -1,5 +1,7 @@
 """Service for storing and retrieving documents."""
 
+import hashlib
+
 from llama_index.core.schema import Document
 
 from app.models import (
@@ -15,10 +17,38 @@ class DocumentStorageService:
 
     def __init__(self):
         self.documents: list[Document] = []
+        # Subsection number -> document index, for O(1) section lookups
+        self._section_index: dict[str, int] = {}
+        # Section name (citation source) -> document index
+        self._source_index: dict[str, int] = {}
+        # Version of the source the documents were built from
+        self.corpus_version = ""
+
+    def store_documents(
+        self, documents: list[Document], corpus_version: str | None = None
+    ) -> None:
+        """
+        Store documents in memory.
 
-    def store_documents(self, documents: list[Document]) -> None:
-        """Store documents in memory."""
+        Args:
+            documents: The documents to store
+            corpus_version: Version of the source they were built from, e.g.
+                a hash of the PDF (a hash of their texts when not given)
+        """
         self.documents = documents
+        self._section_index = {}
+        self._source_index = {}
+        digest = hashlib.sha256()
+        for idx, doc in enumerate(documents):
+            section_number = doc.metadata.get("SubsectionNumber")
+            if section_number is not None:
+                self._section_index.setdefault(section_number, idx)
+            source = doc.metadata.get("Section")
+            if source is not None:
+                self._source_index.setdefault(source, idx)
+            digest.update(doc.text.encode())
+            digest.update(b"\0")
+        self.corpus_version = corpus_version or digest.hexdigest()[:16]
 
     def get_all_documents(self) -> DocumentListResponse:
         """
@@ -81,16 +111,51 @@ class DocumentStorageService:
         Returns:
             DocumentDetail if found, None otherwise
         """
-        for idx, doc in enumerate(self.documents):
-            if doc.metadata.get("SubsectionNumber") == section_number:
-                metadata = doc.metadata
-                return DocumentDetail(
-                    id=str(idx),
-                    text=doc.text,
-                    metadata=DocumentMetadata(
-                        section=metadata.get("Section", "Unknown"),
-                        main_section=metadata.get("MainSection", "Unknown"),
-                        subsection_number=metadata.get("SubsectionNumber", ""),
-                    ),
-                )
-        return None
+        idx = self._section_index.get(section_number)
+        if idx is None:
+            return None
+        return self.get_document_by_id(str(idx))
+
+    def get_document_id_by_section(self, section_number: str) -> str | None:
+        """
+        Get the ID of the document for a section number.
+
+        Args:
+            section_number: The subsection number (e.g., "1.1")
+
+        Returns:
+            The document ID if found, None otherwise
+        """
+        idx = self._section_index.get(section_number)
+        return str(idx) if idx is not None else None
+
+    def get_document_id_by_source(self, source: str) -> str | None:
+        """
+        Get the ID of the document for a citation source.
+
+        Args:
+            source: The section name (e.g., "Thievery 1.1")
+
+        Returns:
+            The document ID if found, None otherwise
+        """
+        idx = self._source_index.get(source)
+        return str(idx) if idx is not None else None
+
+    def get_document_text(self, document_id: str) -> str | None:
+        """
+        Get the full text of a document.
+
+        Args:
+            document_id: The document ID (index)
+
+        Returns:
+            The document text if found, None otherwise
+        """
+        try:
+            idx = int(document_id)
+        except ValueError:
+            return None
+        if idx < 0 or idx >= len(self.documents):
+            return None
+        return self.documents[idx].text
@@ -0,0 +1,108 @@
+"""Outcomes of requests recorded under client-supplied idempotency keys."""
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass
+from typing import Any
+
+
+class IdempotencyKeyReused(ValueError):
+    """Raised when an idempotency key is sent again with a different request."""
+
+
+@dataclass
+class _Outcome:
+    """The task computing a keyed request, and what it was computed for."""
+
+    task: asyncio.Task
+    fingerprint: Hashable
+    expires_at: float
+
+
+class IdempotencyStore:
+    """
+    Bounded TTL store of request outcomes keyed by idempotency key.
+
+    The first request with a key runs; a retry arriving while it is in flight
+    awaits the same computation, and a retry after it finished gets the
+    stored result back without running again. Failed requests are not
+    recorded, so they can be retried.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 86400.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Oldest first, which is also the order they expire in
+        self._outcomes: OrderedDict[Hashable, _Outcome] = OrderedDict()
+        self.executions = 0
+        self.replays = 0
+
+    async def run(
+        self,
+        key: Hashable,
+        fingerprint: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        Run ``fn`` once for ``key`` and return its (possibly stored) result.
+
+        Args:
+            key: Idempotency key of the request
+            fingerprint: Identity of the request body; a retry must match it
+            fn: Zero-argument callable returning the awaitable to run
+
+        Returns:
+            The result of the request first sent with the key
+
+        Raises:
+            IdempotencyKeyReused: If the key was used for a different request
+        """
+        self._expire()
+        outcome = self._outcomes.get(key)
+        if outcome is not None:
+            if outcome.fingerprint != fingerprint:
+                raise IdempotencyKeyReused(
+                    "Idempotency key was already used for a different request"
+                )
+            self.replays += 1
+        else:
+            self.executions += 1
+            outcome = _Outcome(
+                task=asyncio.ensure_future(fn()),
+                fingerprint=fingerprint,
+                expires_at=time.monotonic() + self.ttl_seconds,
+            )
+            self._outcomes[key] = outcome
+            outcome.task.add_done_callback(lambda task: self._forget_failure(key, task))
+            while len(self._outcomes) > self.max_entries:
+                self._outcomes.popitem(last=False)
+
+        # Shield so a caller going away does not cancel the work for its retry
+        return await asyncio.shield(outcome.task)
+
+    def _forget_failure(self, key: Hashable, task: asyncio.Task) -> None:
+        """Drop a request that failed so a retry runs it again."""
+        if task.cancelled() or task.exception() is not None:
+            outcome = self._outcomes.get(key)
+            if outcome is not None and outcome.task is task:
+                del self._outcomes[key]
+
+    def _expire(self) -> None:
+        """Drop the oldest finished outcomes once past the TTL."""
+        now = time.monotonic()
+        while self._outcomes:
+            outcome = next(iter(self._outcomes.values()))
+            if outcome.expires_at > now or not outcome.task.done():
+                return
+            self._outcomes.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Return execution and replay counters."""
+        return {
+            "entries": len(self._outcomes),
+            "in_flight": sum(not o.task.done() for o in self._outcomes.values()),
+            "executions": self.executions,
+            "replays": self.replays,
+        }
@@ -0,0 +1,69 @@
+"""Rolling latency statistics for pipeline stages."""
+
+import time
+from collections import defaultdict, deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+
+class LatencyRecorder:
+    """Keep the most recent latency samples of each named stage."""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._samples: dict[str, deque[float]] = defaultdict(
+            lambda: deque(maxlen=self.window)
+        )
+        self._counts: dict[str, int] = defaultdict(int)
+
+    def record(self, stage: str, seconds: float) -> None:
+        """Record one latency sample for a stage."""
+        self._samples[stage].append(seconds)
+        self._counts[stage] += 1
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """Record the wall-clock time spent inside the block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def count(self, stage: str) -> int:
+        """Return the number of samples of a stage in the current window."""
+        samples = self._samples.get(stage)
+        return len(samples) if samples else 0
+
+    def percentile(self, stage: str, pct: float) -> float | None:
+        """
+        Return a latency percentile of a stage in seconds.
+
+        Args:
+            stage: Stage name
+            pct: Percentile between 0 and 100
+
+        Returns:
+            The percentile over the current window, or None without samples
+        """
+        samples = self._samples.get(stage)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+        return ordered[index]
+
+    def stats(self) -> dict:
+        """Return count, mean and percentiles (in ms) of every stage."""
+        result = {}
+        for stage, samples in self._samples.items():
+            if not samples:
+                continue
+            result[stage] = {
+                "count": self._counts[stage],
+                "mean_ms": 1000 * sum(samples) / len(samples),
+                "p50_ms": 1000 * self.percentile(stage, 50),
+                "p95_ms": 1000 * self.percentile(stage, 95),
+                "p99_ms": 1000 * self.percentile(stage, 99),
+            }
+        return result
@@ -0,0 +1,381 @@
+"""LLM wrapper adding hedged requests and a circuit breaker."""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, TypeVar
+
+from llama_index.core.base.llms.types import (
+    ChatMessage,
+    ChatResponse,
+    ChatResponseAsyncGen,
+    ChatResponseGen,
+    CompletionResponse,
+    CompletionResponseAsyncGen,
+    CompletionResponseGen,
+    LLMMetadata,
+)
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.llms import LLM
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+
+from app.config import settings as app_settings
+from app.services.latency import LatencyRecorder
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CircuitBreakerOpen(RuntimeError):
+    """Raised when a call is refused because the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker over a sliding window of calls.
+
+    The breaker opens when at least ``min_calls`` of the last ``window`` calls
+    were made and their failure rate reaches ``failure_rate_threshold``. While
+    open, calls are refused. After ``reset_timeout_seconds`` a single trial call
+    is let through (half-open): its success closes the breaker, its failure
+    opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_rate_threshold: float = 0.5,
+        window: int = 20,
+        min_calls: int = 5,
+        reset_timeout_seconds: float = 30.0,
+    ):
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_calls = min_calls
+        self.reset_timeout_seconds = reset_timeout_seconds
+        self.state = self.CLOSED
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.opened = 0
+        self.rejected = 0
+
+    def before_call(self) -> None:
+        """Raise CircuitBreakerOpen if the call must not be made."""
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout_seconds:
+                self.rejected += 1
+                raise CircuitBreakerOpen("LLM circuit breaker is open")
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                self.rejected += 1
+                raise CircuitBreakerOpen("LLM circuit breaker is half-open")
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        """Record a successful call."""
+        if self.state == self.HALF_OPEN:
+            self._trial_in_flight = False
+            self.state = self.CLOSED
+            self._outcomes.clear()
+        self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the breaker if needed."""
+        if self.state == self.HALF_OPEN:
+            self._trial_in_flight = False
+            self._open()
+            return
+        self._outcomes.append(False)
+        if (
+            len(self._outcomes) >= self.min_calls
+            and self.failure_rate >= self.failure_rate_threshold
+        ):
+            self._open()
+
+    def record_abort(self) -> None:
+        """Release a half-open trial that ended without an outcome."""
+        self._trial_in_flight = False
+
+    @property
+    def failure_rate(self) -> float:
+        """Failure rate over the current window."""
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self.opened += 1
+        logger.warning(
+            "LLM circuit breaker opened (failure rate %.0f%%)", 100 * self.failure_rate
+        )
+
+    def stats(self) -> dict:
+        """Return the breaker state and counters."""
+        return {
+            "state": self.state,
+            "failure_rate": self.failure_rate,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+class ResilientLLM(LLM):
+    """
+    Wrap an LLM with hedged requests and a circuit breaker.
+
+    Once ``hedge_min_samples`` calls have been timed, a call that takes longer
+    than the ``hedge_percentile`` of recent latencies (at least
+    ``hedge_min_delay_seconds``) gets a second, identical request. Whichever
+    attempt finishes first is returned and the other is cancelled. Async
+    attempts run as tasks; sync attempts run on a thread pool, where the
+    losing request is abandoned since threads cannot be interrupted.
+
+    Streaming calls are not hedged but still go through the circuit breaker.
+    """
+
+    llm: LLM = Field(description="The wrapped LLM.")
+    hedge_enabled: bool = Field(default=True)
+    hedge_percentile: float = Field(default=95.0)
+    hedge_min_samples: int = Field(default=20)
+    hedge_min_delay_seconds: float = Field(default=0.5)
+
+    _breaker: CircuitBreaker = PrivateAttr()
+    _latency: LatencyRecorder = PrivateAttr(default_factory=LatencyRecorder)
+    _executor: ThreadPoolExecutor | None = PrivateAttr(default=None)
+    _requests: int = PrivateAttr(default=0)
+    _attempts: int = PrivateAttr(default=0)
+    _hedges: int = PrivateAttr(default=0)
+    _hedge_wins: int = PrivateAttr(default=0)
+    _failures: int = PrivateAttr(default=0)
+
+    def __init__(self, breaker: CircuitBreaker | None = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._breaker = breaker or CircuitBreaker()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ResilientLLM"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return self.llm.metadata
+
+    def _hedge_delay(self) -> float | None:
+        """Seconds to wait before hedging, or None if calls are not hedged."""
+        if not self.hedge_enabled:
+            return None
+        if self._latency.count("call") < self.hedge_min_samples:
+            return None
+        delay = self._latency.percentile("call", self.hedge_percentile)
+        return max(delay, self.hedge_min_delay_seconds)
+
+    def _on_success(self, started: float, attempt: int) -> None:
+        """Account a call answered by its ``attempt``-th request."""
+        self._latency.record("call", time.perf_counter() - started)
+        self._breaker.record_success()
+        if attempt > 0:
+            self._hedge_wins += 1
+
+    def _on_failure(self) -> None:
+        self._failures += 1
+        self._breaker.record_failure()
+
+    def _call(self, fn: Callable[[], T]) -> T:
+        """Run a sync LLM request, hedged on a thread pool."""
+        self._breaker.before_call()
+        self._requests += 1
+        delay = self._hedge_delay()
+
+        if delay is None:
+            self._attempts += 1
+            started = time.perf_counter()
+            try:
+                result = fn()
+            except Exception:
+                self._on_failure()
+                raise
+            self._on_success(started, 0)
+            return result
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(thread_name_prefix="llm-hedge")
+        attempts: list[tuple[Future, float]] = []
+
+        def launch() -> None:
+            self._attempts += 1
+            attempts.append((self._executor.submit(fn), time.perf_counter()))
+
+        launch()
+        done, _ = wait([attempts[0][0]], timeout=delay)
+        if not done:
+            self._hedges += 1
+            launch()
+
+        pending = {future for future, _ in attempts}
+        error: BaseException | None = None
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for index, (future, started) in enumerate(attempts):
+                    if future in done and future.exception() is None:
+                        self._on_success(started, index)
+                        return future.result()
+                    if future in done:
+                        error = future.exception()
+            self._on_failure()
+            raise error
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def _acall(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run an async LLM request, hedged with a second task."""
+        self._breaker.before_call()
+        self._requests += 1
+        delay = self._hedge_delay()
+
+        if delay is None:
+            self._attempts += 1
+            started = time.perf_counter()
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                self._breaker.record_abort()
+                raise
+            except Exception:
+                self._on_failure()
+                raise
+            self._on_success(started, 0)
+            return result
+
+        attempts: list[tuple[asyncio.Future, float]] = []
+
+        def launch() -> None:
+            self._attempts += 1
+            attempts.append((asyncio.ensure_future(fn()), time.perf_counter()))
+
+        launch()
+        pending = {attempts[0][0]}
+        error: BaseException | None = None
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                self._hedges += 1
+                launch()
+                pending = {task for task, _ in attempts}
+
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for index, (task, started) in enumerate(attempts):
+                    if task in done and task.exception() is None:
+                        self._on_success(started, index)
+                        return task.result()
+                    if task in done:
+                        error = task.exception()
+            self._on_failure()
+            raise error
+        except asyncio.CancelledError:
+            self._breaker.record_abort()
+            raise
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @llm_chat_callback()
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return self._call(lambda: self.llm.chat(messages, **kwargs))
+
+    @llm_completion_callback()
+    def complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponse:
+        return self._call(
+            lambda: self.llm.complete(prompt, formatted=formatted, **kwargs)
+        )
+
+    @llm_chat_callback()
+    async def achat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        return await self._acall(lambda: self.llm.achat(messages, **kwargs))
+
+    @llm_completion_callback()
+    async def acomplete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponse:
+        return await self._acall(
+            lambda: self.llm.acomplete(prompt, formatted=formatted, **kwargs)
+        )
+
+    @llm_chat_callback()
+    def stream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseGen:
+        self._breaker.before_call()
+        return self.llm.stream_chat(messages, **kwargs)
+
+    @llm_completion_callback()
+    def stream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseGen:
+        self._breaker.before_call()
+        return self.llm.stream_complete(prompt, formatted=formatted, **kwargs)
+
+    @llm_chat_callback()
+    async def astream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponseAsyncGen:
+        self._breaker.before_call()
+        return await self.llm.astream_chat(messages, **kwargs)
+
+    @llm_completion_callback()
+    async def astream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseAsyncGen:
+        self._breaker.before_call()
+        return await self.llm.astream_complete(prompt, formatted=formatted, **kwargs)
+
+    def stats(self) -> dict:
+        """Return request, attempt, hedge and circuit breaker counters."""
+        return {
+            "model": self.metadata.model_name,
+            "requests": self._requests,
+            "attempts": self._attempts,
+            "hedges": self._hedges,
+            "hedge_wins": self._hedge_wins,
+            "failures": self._failures,
+            "hedge_delay_ms": (
+                1000 * delay if (delay := self._hedge_delay()) is not None else None
+            ),
+            "breaker": self._breaker.stats(),
+        }
+
+
+def build_resilient_llm(llm: LLM, **kwargs: Any) -> ResilientLLM:
+    """Wrap an LLM with the hedging and circuit breaker settings."""
+    return ResilientLLM(
+        llm=llm,
+        hedge_enabled=app_settings.llm_hedge_enabled,
+        hedge_percentile=app_settings.llm_hedge_percentile,
+        hedge_min_samples=app_settings.llm_hedge_min_samples,
+        hedge_min_delay_seconds=app_settings.llm_hedge_min_delay_seconds,
+        breaker=CircuitBreaker(
+            failure_rate_threshold=app_settings.llm_breaker_failure_rate,
+            window=app_settings.llm_breaker_window,
+            min_calls=app_settings.llm_breaker_min_calls,
+            reset_timeout_seconds=app_settings.llm_breaker_reset_seconds,
+        ),
+        **kwargs,
+    )
@@ -0,0 +1,191 @@
+"""Per-request accounting of LLM calls and tokens."""
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any
+
+from llama_index.core.callbacks import CBEventType
+from llama_index.core.callbacks.base_handler import BaseCallbackHandler
+from llama_index.core.callbacks.token_counting import get_llm_token_counts
+from llama_index.core.utilities.token_counting import TokenCounter
+
+
+class LLMCallBudgetExceeded(RuntimeError):
+    """Raised when a request tries to make more LLM calls than allowed."""
+
+
+@dataclass
+class LLMUsage:
+    """LLM calls and tokens used while answering one request."""
+
+    max_calls: int | None = None
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # Usage of the enclosing block, which also counts this block's calls
+    parent: "LLMUsage | None" = field(default=None, repr=False, compare=False)
+
+    def chain(self) -> Iterator["LLMUsage"]:
+        """Yield this usage and those of the enclosing blocks."""
+        usage: LLMUsage | None = self
+        while usage is not None:
+            yield usage
+            usage = usage.parent
+
+
+_current_usage: ContextVar[LLMUsage | None] = ContextVar("llm_usage", default=None)
+# Depth of nested LLM events (e.g. an async call wrapping the sync one)
+_llm_event_depth: ContextVar[int] = ContextVar("llm_event_depth", default=0)
+
+
+@contextmanager
+def track_llm_usage(max_calls: int | None = None) -> Iterator[LLMUsage]:
+    """
+    Account the LLM calls made inside the block (including spawned tasks).
+
+    Blocks can be nested: calls inside the inner block also count for the
+    enclosing ones, and their ``max_calls`` apply to them as well.
+
+    Args:
+        max_calls: Maximum number of LLM calls allowed inside the block
+
+    Yields:
+        LLMUsage: Usage accumulated so far
+    """
+    usage = LLMUsage(max_calls=max_calls, parent=_current_usage.get())
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+def remaining_llm_calls() -> int | None:
+    """Return how many more LLM calls the current block allows, None if no cap."""
+    usage = _current_usage.get()
+    if usage is None:
+        return None
+    remaining = [
+        u.max_calls - u.calls for u in usage.chain() if u.max_calls is not None
+    ]
+    return max(0, min(remaining)) if remaining else None
+
+
+class LLMUsageHandler(BaseCallbackHandler):
+    """
+    Callback handler counting LLM events into the current request's usage.
+
+    Only the outermost LLM event of a call is counted, in the current block
+    and every enclosing one. A call beyond the ``max_calls`` of any of them
+    is refused with LLMCallBudgetExceeded before it reaches the provider.
+    """
+
+    def __init__(self):
+        super().__init__(event_starts_to_ignore=[], event_ends_to_ignore=[])
+        self._token_counter = TokenCounter()
+
+    def on_event_start(
+        self,
+        event_type: CBEventType,
+        payload: dict[str, Any] | None = None,
+        event_id: str = "",
+        parent_id: str = "",
+        **kwargs: Any,
+    ) -> str:
+        if event_type != CBEventType.LLM:
+            return event_id
+        usage = _current_usage.get()
+        depth = _llm_event_depth.get()
+        if usage is not None and depth == 0:
+            for capped in usage.chain():
+                if capped.max_calls is not None and capped.calls >= capped.max_calls:
+                    raise LLMCallBudgetExceeded(
+                        f"Request exceeded its budget of {capped.max_calls} "
+                        "LLM call(s)"
+                    )
+            for counted in usage.chain():
+                counted.calls += 1
+        _llm_event_depth.set(depth + 1)
+        return event_id
+
+    def on_event_end(
+        self,
+        event_type: CBEventType,
+        payload: dict[str, Any] | None = None,
+        event_id: str = "",
+        **kwargs: Any,
+    ) -> None:
+        if event_type != CBEventType.LLM:
+            return
+        depth = max(0, _llm_event_depth.get() - 1)
+        _llm_event_depth.set(depth)
+        usage = _current_usage.get()
+        if usage is None or depth > 0 or not payload:
+            return
+        counts = get_llm_token_counts(self._token_counter, payload, event_id)
+        for counted in usage.chain():
+            counted.prompt_tokens += counts.prompt_token_count
+            counted.completion_tokens += counts.completion_token_count
+
+    def start_trace(self, trace_id: str | None = None) -> None:
+        """No-op: usage is tracked per request, not per trace."""
+
+    def end_trace(
+        self,
+        trace_id: str | None = None,
+        trace_map: dict[str, list[str]] | None = None,
+    ) -> None:
+        """No-op: usage is tracked per request, not per trace."""
+
+
+class LLMUsageStats:
+    """Aggregate LLM usage over all answered requests."""
+
+    def __init__(self):
+        self.requests = 0
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.max_calls_in_request = 0
+        self.multi_call_requests = 0
+        self.cancelled_requests = 0
+        self.cancelled_tokens_spent = 0  # Used before the requests were cancelled
+        self.tokens_saved = 0  # Estimated from the tokens of answered requests
+
+    def record(self, usage: LLMUsage) -> None:
+        """Add the usage of one request."""
+        self.requests += 1
+        self.calls += usage.calls
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+        self.max_calls_in_request = max(self.max_calls_in_request, usage.calls)
+        if usage.calls > 1:
+            self.multi_call_requests += 1
+
+    def record_cancelled(self, usage: LLMUsage) -> None:
+        """Add the usage of a request cancelled before it was answered."""
+        spent = usage.prompt_tokens + usage.completion_tokens
+        self.cancelled_requests += 1
+        self.cancelled_tokens_spent += spent
+        if self.requests:
+            average = (self.prompt_tokens + self.completion_tokens) / self.requests
+            self.tokens_saved += max(0, round(average) - spent)
+
+    def stats(self) -> dict:
+        """Return totals and per-request averages."""
+        return {
+            "requests": self.requests,
+            "llm_calls": self.calls,
+            "llm_calls_per_request": (
+                self.calls / self.requests if self.requests else 0.0
+            ),
+            "max_llm_calls_in_request": self.max_calls_in_request,
+            "multi_call_requests": self.multi_call_requests,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cancelled_requests": self.cancelled_requests,
+            "cancelled_tokens_spent": self.cancelled_tokens_spent,
+            "estimated_tokens_saved": self.tokens_saved,
+        }
@@ -1,37 +1,171 @@
 """Service for Qdrant vector store operations and querying."""
 
+import asyncio
+import logging
+import math
 import os
+import re
+import weakref
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Hashable
 
 import qdrant_client
 from dotenv import load_dotenv
 from llama_index.core import Settings, VectorStoreIndex
-from llama_index.core.chat_engine import CondenseQuestionChatEngine
-from llama_index.core.llms import ChatMessage, MessageRole
-from llama_index.core.memory import ChatMemoryBuffer
+from llama_index.core.base.llms.generic_utils import messages_to_history_str
+from llama_index.core.callbacks import CallbackManager
+from llama_index.core.chat_engine.condense_question import (
+    DEFAULT_PROMPT as CONDENSE_QUESTION_PROMPT,
+)
+from llama_index.core.llms import LLM, ChatMessage
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.prompts import PromptTemplate
 from llama_index.core.query_engine import CitationQueryEngine
-from llama_index.core.schema import Document
+from llama_index.core.query_engine.citation_query_engine import (
+    DEFAULT_CITATION_CHUNK_OVERLAP,
+)
+from llama_index.core.response_synthesizers import ResponseMode
+from llama_index.core.schema import Document, NodeWithScore, QueryBundle
+from llama_index.core.utils import get_tokenizer
+from llama_index.core.vector_stores import MetadataFilter, MetadataFilters
 from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.llms.openai import OpenAI
 from llama_index.vector_stores.qdrant import QdrantVectorStore
 
-from app.models import Citation, Message, Output
+from app.config import settings as app_settings
+from app.models import Citation, Message, Output, ScoredCitation
+from app.services.adaptive_top_k import AdaptiveTopKPostprocessor
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.condense_classifier import needs_condensation, new_content_words
+from app.services.conversation_memory import ConversationMemory
+from app.services.deadline import Deadline, DeadlineExceeded, within
+from app.services.document_storage_service import DocumentStorageService
+from app.services.latency import LatencyRecorder
+from app.services.llm_client import ResilientLLM, build_resilient_llm
+from app.services.llm_usage import (
+    LLMCallBudgetExceeded,
+    LLMUsage,
+    LLMUsageHandler,
+    LLMUsageStats,
+    remaining_llm_calls,
+    track_llm_usage,
+)
+from app.services.section_reference import parse_section_reference
+from app.services.single_flight import SingleFlight
 
 load_dotenv()
 key = os.getenv("OPENAI_API_KEY")
 
+logger = logging.getLogger(__name__)
+
+CITATION_CHUNK_SIZE = 512
+# Tokens of each synthesis call taken by the citation prompt and the question
+SYNTHESIS_PROMPT_TOKENS = 1000
+# Characters of each section quoted in a degraded (extractive) answer
+DEGRADED_EXCERPT_CHARS = 300
+SUMMARIZE_HISTORY_PROMPT = PromptTemplate(
+    "Update the summary of a conversation about laws with the new messages "
+    "below. Keep the questions asked, the sections cited and any facts the "
+    "user gave about their situation. Answer with the updated summary only, "
+    "in at most {max_words} words.\n\n"
+    "<Current summary>\n{summary}\n\n"
+    "<New messages>\n{messages}\n\n"
+    "<Updated summary>\n"
+)
+NO_RELEVANT_LAW_RESPONSE = (
+    "No relevant law was found for this question. Try rephrasing it or asking "
+    "about a topic covered by the laws."
+)
+
+
+class _Retrieval:
+    """Nodes retrieved by a shared query, for callers whose budget runs out."""
+
+    def __init__(self):
+        self.nodes: list[NodeWithScore] = []
+
 
 class QdrantService:
     """Service for managing Qdrant vector store and query operations."""
 
-    def __init__(self, k: int = 2):
+    def __init__(
+        self, k: int = 2, document_storage: DocumentStorageService | None = None
+    ):
         self.index = None
         self.k = k
+        # Answers direct section references ("show me 3.2") without RAG
+        self.document_storage = document_storage
+        self.section_reference_answers = 0
+        self.follow_up_turns = 0
+        self.condense_skipped = 0
+        self.speculative_retrievals = 0
+        self.speculative_reuses = 0
+        self.embed_model = None
+        # Per-stage models; None falls back to the global LlamaIndex Settings.llm
+        self.condense_llm: LLM | None = None
+        self.synthesis_llm: LLM | None = None
+        self.fallback_llm: LLM | None = None
+        self.latency = LatencyRecorder()
+        self.degraded_answers = 0
+        self.relevance_checks = 0
+        self.relevance_short_circuits = 0
+        self.llm_usage = LLMUsageStats()
+        self._llm_usage_handler = LLMUsageHandler()
+        # Bumped on every load so cached answers never outlive the corpus
+        self.corpus_version = 0
+        self.answer_cache = (
+            SemanticAnswerCache(
+                max_entries=app_settings.answer_cache_max_entries,
+                ttl_seconds=app_settings.answer_cache_ttl_seconds,
+                similarity_threshold=app_settings.answer_cache_similarity_threshold,
+            )
+            if app_settings.answer_cache_enabled
+            else None
+        )
+        self._embedding_cache: OrderedDict[str, list[float]] = OrderedDict()
+        self._single_flight = SingleFlight()
+        # Retrieval of each in-flight shared query, alive while it is awaited
+        self._retrievals: weakref.WeakValueDictionary[Hashable, _Retrieval] = (
+            weakref.WeakValueDictionary()
+        )
 
     def connect(self) -> None:
         """Initialize Qdrant client and vector store index."""
         # Configure global settings for embeddings and LLM
-        Settings.embed_model = OpenAIEmbedding()
-        Settings.llm = OpenAI(api_key=key, model="gpt-4")
+        self.embed_model = OpenAIEmbedding()
+        Settings.embed_model = self.embed_model
+        # Usage is accounted on the resilient wrappers, so a hedged call
+        # counts as a single LLM call
+        callback_manager = CallbackManager([self._llm_usage_handler])
+        self.condense_llm = build_resilient_llm(
+            OpenAI(
+                api_key=key,
+                model=app_settings.condense_llm_model,
+                timeout=app_settings.condense_llm_timeout_seconds,
+                max_tokens=app_settings.condense_llm_max_tokens,
+            ),
+            callback_manager=callback_manager,
+        )
+        self.synthesis_llm = build_resilient_llm(
+            OpenAI(
+                api_key=key,
+                model=app_settings.synthesis_llm_model,
+                timeout=app_settings.synthesis_llm_timeout_seconds,
+                max_tokens=app_settings.synthesis_llm_max_tokens,
+            ),
+            callback_manager=callback_manager,
+        )
+        if app_settings.fallback_llm_model:
+            self.fallback_llm = build_resilient_llm(
+                OpenAI(
+                    api_key=key,
+                    model=app_settings.fallback_llm_model,
+                    timeout=app_settings.fallback_llm_timeout_seconds,
+                    max_tokens=app_settings.fallback_llm_max_tokens,
+                ),
+                callback_manager=callback_manager,
+            )
+        Settings.llm = self.synthesis_llm
 
         # Initialize Qdrant client with in-memory storage
         client = qdrant_client.QdrantClient(location=":memory:")
@@ -45,22 +179,535 @@ class QdrantService:
     def load(self, docs: list[Document]) -> None:
         """Load documents into the vector store."""
         self.index.insert_nodes(docs)
+        self.corpus_version += 1
+
+    async def _get_query_embedding(self, query_str: str) -> list[float]:
+        """Embed a query, reusing the embedding of an identical earlier query."""
+        embedding = self._embedding_cache.get(query_str)
+        if embedding is not None:
+            self._embedding_cache.move_to_end(query_str)
+            return embedding
+
+        with self.latency.time("embed"):
+            embedding = await self.embed_model.aget_query_embedding(query_str)
+        self._embedding_cache[query_str] = embedding
+        if len(self._embedding_cache) > app_settings.query_embedding_cache_size:
+            self._embedding_cache.popitem(last=False)
+        return embedding
+
+    @staticmethod
+    def _build_filters(filters: dict[str, str] | None) -> MetadataFilters | None:
+        """Convert exact-match metadata filters into LlamaIndex filters."""
+        if not filters:
+            return None
+        return MetadataFilters(
+            filters=[
+                MetadataFilter(key=key, value=value) for key, value in filters.items()
+            ]
+        )
+
+    @staticmethod
+    def _filters_key(filters: dict[str, str] | None) -> tuple:
+        """Return a hashable, order-independent form of metadata filters."""
+        return tuple(sorted((filters or {}).items()))
+
+    def _query_key(
+        self, query_str: str, k: int, filters: dict[str, str] | None
+    ) -> tuple[str, int, tuple]:
+        """Identity of a query for coalescing: normalized text, k and filters."""
+        normalized = " ".join(query_str.lower().split())
+        return normalized, k, self._filters_key(filters)
+
+    def _create_query_engine(
+        self,
+        k: int,
+        filters: dict[str, str] | None = None,
+        llm: LLM | None = None,
+    ) -> CitationQueryEngine:
+        """
+        Create a CitationQueryEngine retrieving k nodes.
+
+        Synthesis runs on ``llm``, defaulting to the synthesis-stage model.
+
+        In adaptive top-k mode, up to ``qdrant_adaptive_max_k`` nodes are
+        retrieved and a postprocessor keeps only those worth sending to
+        synthesis.
+        """
+        node_postprocessors = []
+        if app_settings.qdrant_adaptive_top_k:
+            k = app_settings.qdrant_adaptive_max_k
+            node_postprocessors.append(
+                AdaptiveTopKPostprocessor(
+                    min_k=app_settings.qdrant_adaptive_min_k,
+                    score_floor=app_settings.qdrant_adaptive_score_floor,
+                    max_relative_drop=app_settings.qdrant_adaptive_max_relative_drop,
+                )
+            )
 
-    def query(self, query_str: str) -> Output:
+        # Initialize CitationQueryEngine with k for similarity_top_k
+        return CitationQueryEngine.from_args(
+            self.index,
+            llm=llm or self.synthesis_llm,
+            similarity_top_k=k,
+            citation_chunk_size=CITATION_CHUNK_SIZE,
+            filters=self._build_filters(filters),
+            node_postprocessors=node_postprocessors,
+            response_mode=ResponseMode(app_settings.synthesis_response_mode),
+        )
+
+    def get_stats(self) -> dict:
+        """Return runtime statistics for the query pipeline."""
+        return {
+            "corpus_version": self.corpus_version,
+            "answer_cache": self.answer_cache.stats() if self.answer_cache else None,
+            "coalescing": self._single_flight.stats(),
+            "latency": self.latency.stats(),
+            "degraded_answers": self.degraded_answers,
+            "section_reference_answers": self.section_reference_answers,
+            "condensation": {
+                "follow_up_turns": self.follow_up_turns,
+                "skipped": self.condense_skipped,
+                "skip_rate": (
+                    self.condense_skipped / self.follow_up_turns
+                    if self.follow_up_turns
+                    else 0.0
+                ),
+            },
+            "speculative_retrieval": {
+                "attempts": self.speculative_retrievals,
+                "reused": self.speculative_reuses,
+                "reuse_rate": (
+                    self.speculative_reuses / self.speculative_retrievals
+                    if self.speculative_retrievals
+                    else 0.0
+                ),
+            },
+            "relevance": {
+                "score_floor": app_settings.relevance_score_floor,
+                "checks": self.relevance_checks,
+                "short_circuits": self.relevance_short_circuits,
+                "short_circuit_rate": (
+                    self.relevance_short_circuits / self.relevance_checks
+                    if self.relevance_checks
+                    else 0.0
+                ),
+            },
+            "llm_usage": self.llm_usage.stats(),
+            "llm": {
+                stage: llm.stats()
+                for stage, llm in (
+                    ("condense", self.condense_llm),
+                    ("synthesis", self.synthesis_llm),
+                    ("fallback", self.fallback_llm),
+                )
+                if isinstance(llm, ResilientLLM)
+            },
+        }
+
+    async def query(
+        self,
+        query_str: str,
+        k: int | None = None,
+        filters: dict[str, str] | None = None,
+        budget_ms: float | None = None,
+    ) -> Output:
         """
         Initialize the query engine, run the query, and return the result as an Output object.
         Uses CitationQueryEngine to provide citations for the response.
+        Concurrent identical queries share a single in-flight computation.
+        The shared computation has no deadline; each caller waits for it
+        within its own budget, so one caller's budget never degrades the
+        answer of another.
+
+        Args:
+            query_str: The query string
+            k: Number of nodes to retrieve (defaults to self.k)
+            filters: Optional exact-match metadata filters, e.g. {"MainSection": "Thievery"}
+            budget_ms: Optional latency budget; when synthesis cannot finish in
+                time, a degraded extractive answer is returned instead
+
+        Returns:
+            Output: Query response with citations
         """
-        # Initialize CitationQueryEngine with self.k for similarity_top_k
-        query_engine = CitationQueryEngine.from_args(
-            self.index,
-            similarity_top_k=self.k,
-            citation_chunk_size=512,
+        section_answer = self._answer_section_reference(query_str)
+        if section_answer is not None:
+            return section_answer
+
+        k = k or self.k
+        key = self._query_key(query_str, k, filters)
+        deadline = Deadline.from_budget_ms(budget_ms)
+        # Held by every caller and the computation, so it outlives a timeout
+        retrieval = self._retrievals.setdefault(key, _Retrieval())
+        try:
+            output = await within(
+                deadline,
+                self._single_flight.do(
+                    key, lambda: self._run_query(query_str, k, filters, retrieval)
+                ),
+            )
+        except DeadlineExceeded:
+            # Degrade this caller only; the others keep waiting for the answer
+            return self._build_degraded_output(query_str, retrieval.nodes)
+        if output.query != query_str:
+            output = output.model_copy(update={"query": query_str})
+        return output
+
+    def _answer_section_reference(self, query_str: str) -> Output | None:
+        """
+        Answer a query that only asks for one section straight from storage.
+
+        Returns None, so the query goes through RAG, when the query is not a
+        bare section reference or the section does not exist.
+        """
+        if self.document_storage is None:
+            return None
+        section_number = parse_section_reference(query_str)
+        if section_number is None:
+            return None
+        document = self.document_storage.get_document_by_section(section_number)
+        if document is None:
+            return None
+
+        self.section_reference_answers += 1
+        source = document.metadata.section
+        return Output(
+            query=query_str,
+            response=f"{source} reads: {document.text} [1]",
+            citations=[Citation(source=source, text=document.text)],
         )
 
-        # Execute the query
-        response = query_engine.query(query_str)
+    async def retrieve(
+        self,
+        query_str: str,
+        k: int | None = None,
+        filters: dict[str, str] | None = None,
+    ) -> list[ScoredCitation]:
+        """
+        Retrieve the sections most relevant to a query without LLM synthesis.
+
+        Latency is bounded by embedding (served from the query embedding cache
+        on repeats) and vector search.
+
+        Args:
+            query_str: The query string
+            k: Number of nodes to retrieve (defaults to self.k)
+            filters: Optional exact-match metadata filters
+
+        Returns:
+            list[ScoredCitation]: Retrieved sections ranked by similarity score
+        """
+        k = k or self.k
+        query_bundle = QueryBundle(query_str)
+        if self.embed_model is not None:
+            query_bundle.embedding = await self._get_query_embedding(query_str)
+
+        query_engine = self._create_query_engine(k, filters)
+        with self.latency.time("retrieve"):
+            nodes = await query_engine.aretrieve(query_bundle)
+
+        return [
+            ScoredCitation(
+                source=node.node.metadata.get("Section", "Unknown Section"),
+                text=node.node.text,
+                score=node.score,
+                section_number=node.node.metadata.get("SubsectionNumber"),
+            )
+            for node in sorted(nodes, key=lambda n: n.score or 0.0, reverse=True)
+        ]
+
+    async def _run_query(
+        self,
+        query_str: str,
+        k: int,
+        filters: dict[str, str] | None,
+        retrieval: _Retrieval | None = None,
+    ) -> Output:
+        """
+        Run retrieval and synthesis for a query.
+
+        Answers to semantically equivalent earlier queries are served from the
+        answer cache without retrieval or synthesis. Retrieved nodes are kept
+        on ``retrieval`` for callers that cannot wait for synthesis. A query
+        cancelled because nobody waits for it any more is accounted with the
+        tokens it had used.
+        """
+        query_bundle = QueryBundle(query_str)
+        # Answers are only reused for the same retrieval parameters
+        scope = (k, self._filters_key(filters))
+        with track_llm_usage(max_calls=app_settings.request_max_llm_calls) as usage:
+            try:
+                if self.embed_model is not None:
+                    # Embed once; the embedding is reused for retrieval on a miss
+                    query_bundle.embedding = await self._get_query_embedding(query_str)
+                    cached = self._get_cached_answer(query_bundle, scope)
+                    if cached is not None:
+                        return cached
+
+                query_engine = self._create_query_engine(k, filters)
+                with self.latency.time("retrieve"):
+                    nodes = await query_engine.aretrieve(query_bundle)
+                if retrieval is not None:
+                    retrieval.nodes = nodes
+                return await self._synthesize(query_engine, query_bundle, nodes, scope)
+            except asyncio.CancelledError:
+                self.llm_usage.record_cancelled(usage)
+                raise
+
+    def _get_cached_answer(
+        self, query_bundle: QueryBundle, scope: tuple
+    ) -> Output | None:
+        """Return the cached answer for an embedded query, if any."""
+        if self.answer_cache is None or query_bundle.embedding is None:
+            return None
+        cached = self.answer_cache.get(
+            query_bundle.embedding, self.corpus_version, scope
+        )
+        if cached is None:
+            return None
+        return cached.model_copy(update={"query": query_bundle.query_str})
+
+    @staticmethod
+    def _synthesis_calls(chunks: int, tokens: int, window: int | None) -> int:
+        """
+        Estimate the LLM calls synthesizing from the given citation chunks.
+
+        Refine makes one call per chunk. Compact and tree_summarize pack the
+        chunks into the context window, making one call per window (plus one
+        to combine the summaries of several windows in tree_summarize).
+        """
+        mode = app_settings.synthesis_response_mode
+        if mode == ResponseMode.REFINE:
+            return chunks
+        windows = max(1, math.ceil(tokens / window)) if window else 1
+        if mode == ResponseMode.TREE_SUMMARIZE and windows > 1:
+            return windows + 1
+        return windows
+
+    @classmethod
+    def _apply_context_budget(
+        cls,
+        nodes: list[NodeWithScore],
+        window: int | None = None,
+        max_calls: int | None = None,
+    ) -> list[NodeWithScore]:
+        """
+        Keep the leading nodes that fit the synthesis budgets.
+
+        Nodes are kept in retrieval order until their text would exceed
+        ``synthesis_max_context_tokens`` or their citation chunks would need
+        more than ``max_calls`` LLM calls. The first node is always kept, cut
+        to the chunks that fit the call budget.
+
+        Args:
+            nodes: Retrieved nodes, most relevant first
+            window: Tokens of retrieved text one synthesis call can hold, None
+                if unknown
+            max_calls: LLM calls synthesis may make, by default
+                ``synthesis_max_llm_calls``
+        """
+        max_tokens = app_settings.synthesis_max_context_tokens
+        if max_calls is None:
+            max_calls = app_settings.synthesis_max_llm_calls
+        tokenizer = get_tokenizer()
+        # Split like CitationQueryEngine, so chunks match its citation nodes
+        splitter = SentenceSplitter(
+            chunk_size=CITATION_CHUNK_SIZE,
+            chunk_overlap=DEFAULT_CITATION_CHUNK_OVERLAP,
+        )
+
+        kept: list[NodeWithScore] = []
+        tokens = chunks = 0
+        for node in nodes:
+            content = node.node.get_content()
+            node_chunks = splitter.split_text(content) or [content]
+            node_tokens = len(tokenizer(content))
+            over_tokens = tokens + node_tokens > max_tokens
+            over_calls = (
+                cls._synthesis_calls(
+                    chunks + len(node_chunks), tokens + node_tokens, window
+                )
+                > max_calls
+            )
+            if kept and (over_tokens or over_calls):
+                break
+            if over_calls:
+                # The top node alone needs too many calls
+                return [cls._truncate_node(node, node_chunks, window, max_calls)]
+            kept.append(node)
+            tokens += node_tokens
+            chunks += len(node_chunks)
+        return kept
+
+    @classmethod
+    def _truncate_node(
+        cls,
+        node: NodeWithScore,
+        chunks: list[str],
+        window: int | None,
+        max_calls: int,
+    ) -> NodeWithScore:
+        """Cut a node's text after the leading citation chunks that fit the calls."""
+        tokenizer = get_tokenizer()
+        count = tokens = 0
+        for chunk in chunks:
+            tokens += len(tokenizer(chunk))
+            if count and cls._synthesis_calls(count + 1, tokens, window) > max_calls:
+                break
+            count += 1
+
+        # Chunks are substrings of the text, so the cut is where the last kept
+        # one ends; splitting the cut text again gives the same chunks
+        content = node.node.get_content()
+        start = end = 0
+        for chunk in chunks[:count]:
+            start = content.find(chunk, start)
+            if start < 0:
+                text = " ".join(chunks[:count])
+                break
+            end = start + len(chunk)
+        else:
+            text = content[:end]
+        logger.info(
+            "Cut the top node to %d of %d citation chunks to fit %d LLM calls",
+            count,
+            len(chunks),
+            max_calls,
+        )
+        return NodeWithScore(
+            node=node.node.model_copy(update={"text": text}), score=node.score
+        )
+
+    def _synthesis_window(self) -> int | None:
+        """Tokens of retrieved text one synthesis call can hold, if known."""
+        if not isinstance(self.synthesis_llm, LLM):
+            return None
+        metadata = self.synthesis_llm.metadata
+        return max(
+            CITATION_CHUNK_SIZE,
+            metadata.context_window
+            - max(metadata.num_output, 0)
+            - SYNTHESIS_PROMPT_TOKENS,
+        )
+
+    def _has_relevant_node(self, nodes: list[NodeWithScore]) -> bool:
+        """Return whether any node clears the relevance score floor."""
+        floor = app_settings.relevance_score_floor
+        if floor is None:
+            return True
+        self.relevance_checks += 1
+        # Nodes without a score (not from vector search) are given the benefit
+        if any(node.score is None or node.score >= floor for node in nodes):
+            return True
+        self.relevance_short_circuits += 1
+        logger.info("No node above the relevance floor %.2f; skipping synthesis", floor)
+        return False
+
+    @staticmethod
+    def _annotate_usage(output: Output, usage: LLMUsage) -> None:
+        """Attach the LLM calls and tokens used for an answer to the Output."""
+        output._llm_calls = usage.calls
+        output._prompt_tokens = usage.prompt_tokens
+        output._completion_tokens = usage.completion_tokens
+
+    async def _synthesize(
+        self,
+        query_engine: CitationQueryEngine,
+        query_bundle: QueryBundle,
+        nodes: list[NodeWithScore],
+        scope: tuple | None = None,
+        record_usage: bool = True,
+        deadline: Deadline | None = None,
+    ) -> Output:
+        """
+        Synthesize an answer from retrieved nodes and cache it.
 
+        Nodes are trimmed to fit ``synthesis_max_llm_calls`` LLM calls, or
+        the calls left in the request's ``request_max_llm_calls`` if fewer.
+        If the synthesis model fails and a fallback model is configured, the
+        answer is synthesized again with the fallback model, within the same
+        request budget. If the deadline passes or the call budget runs out
+        first, a degraded extractive answer is built from the nodes instead.
+
+        When no node clears the relevance score floor, a canned "no relevant
+        law" answer is returned without calling the LLM.
+        """
+        if not self._has_relevant_node(nodes):
+            return Output(
+                query=query_bundle.query_str,
+                response=NO_RELEVANT_LAW_RESPONSE,
+                citations=[],
+            )
+
+        max_calls = app_settings.synthesis_max_llm_calls
+        remaining = remaining_llm_calls()
+        if remaining is not None:
+            max_calls = min(max_calls, remaining)
+        # With no call left, synthesis is refused and the answer degraded
+        nodes = self._apply_context_budget(
+            nodes, self._synthesis_window(), max(max_calls, 1)
+        )
+        try:
+            with track_llm_usage() as usage:
+                response = await self._synthesize_response(
+                    query_engine, query_bundle, nodes, deadline
+                )
+        except DeadlineExceeded:
+            return self._build_degraded_output(query_bundle.query_str, nodes)
+        except LLMCallBudgetExceeded:
+            # Synthesis needed more calls than estimated; answer from the
+            # sections rather than fail the request
+            if record_usage:
+                self.llm_usage.record(usage)
+            return self._build_degraded_output(
+                query_bundle.query_str, nodes, reason="LLM call budget exceeded"
+            )
+
+        output = self._build_output(query_bundle.query_str, response)
+        self._annotate_usage(output, usage)
+        if record_usage:
+            self.llm_usage.record(usage)
+
+        cacheable = scope is not None and query_bundle.embedding is not None
+        if cacheable and self.answer_cache is not None:
+            self.answer_cache.put(
+                query_bundle.embedding, output, self.corpus_version, scope
+            )
+
+        return output
+
+    async def _synthesize_response(
+        self,
+        query_engine: CitationQueryEngine,
+        query_bundle: QueryBundle,
+        nodes: list[NodeWithScore],
+        deadline: Deadline | None,
+    ):
+        """Run synthesis on the synthesis model, then on the fallback model."""
+        try:
+            with self.latency.time("synthesis"):
+                return await within(
+                    deadline, query_engine.asynthesize(query_bundle, nodes)
+                )
+        except (LLMCallBudgetExceeded, DeadlineExceeded):
+            raise
+        except Exception:
+            if self.fallback_llm is None:
+                raise
+            fallback_engine = CitationQueryEngine.from_args(
+                self.index,
+                llm=self.fallback_llm,
+                retriever=query_engine.retriever,
+                citation_chunk_size=CITATION_CHUNK_SIZE,
+                response_mode=ResponseMode(app_settings.synthesis_response_mode),
+            )
+            with self.latency.time("synthesis_fallback"):
+                return await within(
+                    deadline, fallback_engine.asynthesize(query_bundle, nodes)
+                )
+
+    @staticmethod
+    def _build_output(query_str: str, response) -> Output:
+        """Convert a LlamaIndex response into an Output with citations."""
         # Extract citations from the response
         citations = []
         if hasattr(response, "source_nodes"):
@@ -73,70 +720,370 @@ class QdrantService:
                 citations.append(Citation(source=source, text=text))
 
         # Create and return the Output object
-        output = Output(
+        return Output(
             query=query_str,
             response=str(response),
             citations=citations,
         )
 
-        return output
+    def _build_degraded_output(
+        self,
+        query_str: str,
+        nodes: list[NodeWithScore],
+        reason: str = "Latency budget exceeded",
+    ) -> Output:
+        """
+        Build an extractive answer from the top nodes, without an LLM call.
+
+        Used when the latency budget runs out before synthesis completes, or
+        synthesis would exceed its LLM call budget. The answer quotes the
+        opening of each top section and cites them as usual.
+        """
+        self.degraded_answers += 1
+        ranked = sorted(nodes, key=lambda node: node.score or 0.0, reverse=True)
+        ranked = ranked[: app_settings.degraded_answer_max_sections]
+        logger.warning(
+            "%s; returning a degraded answer from %d sections", reason, len(ranked)
+        )
+
+        if not ranked:
+            return Output(
+                query=query_str,
+                response=(
+                    "An answer could not be produced within the latency budget. "
+                    "Please try again."
+                ),
+                citations=[],
+                degraded=True,
+            )
+
+        citations = []
+        excerpts = []
+        for number, node in enumerate(ranked, start=1):
+            source = node.node.metadata.get("Section", "Unknown Section")
+            citations.append(Citation(source=source, text=node.node.text))
+            excerpts.append(f"[{number}] {source}: {self._excerpt(node.node.text)}")
+
+        return Output(
+            query=query_str,
+            response=(
+                "A full answer could not be generated. "
+                "The most relevant sections are:\n" + "\n".join(excerpts)
+            ),
+            citations=citations,
+            degraded=True,
+        )
+
+    @staticmethod
+    def _excerpt(text: str) -> str:
+        """Return the first sentence of a section, truncated if very long."""
+        text = " ".join(text.split())
+        sentence = re.split(r"(?<=[.!?])\s", text, maxsplit=1)[0]
+        if len(sentence) > DEGRADED_EXCERPT_CHARS:
+            sentence = sentence[:DEGRADED_EXCERPT_CHARS].rsplit(" ", 1)[0] + "..."
+        return sentence
+
+    async def _get_query_embeddings(self, query_strs: list[str]) -> list[list[float]]:
+        """Embed many queries with a single batched call for the uncached ones."""
+        found: dict[str, list[float]] = {}
+        for query_str in query_strs:
+            embedding = self._embedding_cache.get(query_str)
+            if embedding is not None:
+                self._embedding_cache.move_to_end(query_str)
+                found[query_str] = embedding
+
+        missing = list(dict.fromkeys(q for q in query_strs if q not in found))
+        if missing:
+            # OpenAI embeds queries and texts with the same model, so the
+            # batched text endpoint yields the same vectors as per-query calls
+            with self.latency.time("embed_batch"):
+                embeddings = await self.embed_model.aget_text_embedding_batch(missing)
+            found.update(zip(missing, embeddings, strict=True))
+            # The cache only serves later lookups; a batch larger than the
+            # cache keeps its most recent entries
+            for query_str, embedding in zip(missing, embeddings, strict=True):
+                self._embedding_cache[query_str] = embedding
+            while len(self._embedding_cache) > app_settings.query_embedding_cache_size:
+                self._embedding_cache.popitem(last=False)
+
+        return [found[query_str] for query_str in query_strs]
+
+    async def query_batch(
+        self,
+        query_strs: list[str],
+        k: int | None = None,
+        max_concurrency: int = 8,
+    ) -> AsyncIterator[tuple[int, Output | Exception]]:
+        """
+        Answer many queries, yielding results in completion order.
+
+        All queries are embedded in one batched call and retrieved together;
+        LLM synthesis then runs with at most ``max_concurrency`` calls in flight.
+        Cached answers are yielded first, and a failure only affects its own query.
+
+        Args:
+            query_strs: The query strings
+            k: Number of nodes to retrieve (defaults to self.k)
+            max_concurrency: Maximum number of concurrent synthesis calls
+
+        Yields:
+            (index, result) pairs, where result is the Output or the exception
+            raised while answering the query at that index
+        """
+        k = k or self.k
+        scope = (k, self._filters_key(None))
+        query_bundles = [QueryBundle(query_str) for query_str in query_strs]
+        if self.embed_model is not None:
+            embeddings = await self._get_query_embeddings(query_strs)
+            for query_bundle, embedding in zip(query_bundles, embeddings, strict=True):
+                query_bundle.embedding = embedding
+
+        pending: list[tuple[int, QueryBundle]] = []
+        for index, query_bundle in enumerate(query_bundles):
+            cached = self._get_cached_answer(query_bundle, scope)
+            if cached is not None:
+                yield index, cached
+            else:
+                pending.append((index, query_bundle))
+
+        query_engine = self._create_query_engine(k)
+        node_lists = await asyncio.gather(
+            *(query_engine.aretrieve(query_bundle) for _, query_bundle in pending)
+        )
+
+        semaphore = asyncio.Semaphore(max_concurrency)
 
-    def query_with_history(
-        self, query_str: str, chat_history: list[Message] | None = None
+        async def answer(
+            index: int, query_bundle: QueryBundle, nodes: list[NodeWithScore]
+        ) -> tuple[int, Output | Exception]:
+            key = self._query_key(query_bundle.query_str, k, None)
+            try:
+                async with semaphore:
+                    output = await self._single_flight.do(
+                        key,
+                        lambda: self._synthesize(
+                            query_engine, query_bundle, nodes, scope
+                        ),
+                    )
+            except Exception as e:
+                return index, e
+            return index, output.model_copy(update={"query": query_bundle.query_str})
+
+        tasks = [
+            asyncio.ensure_future(answer(index, query_bundle, nodes))
+            for (index, query_bundle), nodes in zip(pending, node_lists, strict=True)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Stop outstanding synthesis if the consumer goes away early
+            for task in tasks:
+                task.cancel()
+
+    async def _embed_and_retrieve(
+        self, query_engine: CitationQueryEngine, query_str: str
+    ) -> tuple[QueryBundle, list[NodeWithScore]]:
+        """Embed a query and retrieve its nodes."""
+        query_bundle = QueryBundle(query_str)
+        if self.embed_model is not None:
+            query_bundle.embedding = await self._get_query_embedding(query_str)
+        with self.latency.time("retrieve"):
+            nodes = await query_engine.aretrieve(query_bundle)
+        return query_bundle, nodes
+
+    @staticmethod
+    def _speculative_nodes(speculative: asyncio.Future | None) -> list[NodeWithScore]:
+        """Return the nodes of a speculative retrieval that already succeeded."""
+        if (
+            speculative is None
+            or not speculative.done()
+            or speculative.cancelled()
+            or speculative.exception() is not None
+        ):
+            return []
+        _, nodes = speculative.result()
+        return nodes
+
+    @staticmethod
+    def _is_close_rewrite(query_str: str, standalone_question: str) -> bool:
+        """
+        Return whether a condensed question is close enough to the raw message
+        to reuse the nodes retrieved for it.
+
+        It is when the rewrite adds no content word: resolving a referent or
+        an ellipsis adds exactly the words retrieval was missing.
+        """
+        return bool(standalone_question.strip()) and not new_content_words(
+            query_str, standalone_question
+        )
+
+    async def _condense_question(
+        self, query_str: str, chat_history: list[ChatMessage]
+    ) -> str:
+        """
+        Rewrite a follow-up message into a standalone question.
+
+        Runs on the condense-stage model, retrying once on the fallback model
+        if one is configured.
+        """
+        history_str = messages_to_history_str(chat_history)
+        try:
+            with self.latency.time("condense"):
+                return await (self.condense_llm or Settings.llm).apredict(
+                    CONDENSE_QUESTION_PROMPT,
+                    question=query_str,
+                    chat_history=history_str,
+                )
+        except LLMCallBudgetExceeded:
+            raise
+        except Exception:
+            if self.fallback_llm is None:
+                raise
+            with self.latency.time("condense_fallback"):
+                return await self.fallback_llm.apredict(
+                    CONDENSE_QUESTION_PROMPT,
+                    question=query_str,
+                    chat_history=history_str,
+                )
+
+    async def summarize_history(self, summary: str, messages: list[ChatMessage]) -> str:
+        """
+        Fold messages into a rolling conversation summary.
+
+        Runs on the condense-stage model. Used as the ConversationService
+        summarizer for turns that leave the memory window.
+
+        Args:
+            summary: The current summary (empty for the first update)
+            messages: Messages to fold into the summary, oldest first
+
+        Returns:
+            The updated summary
+        """
+        with self.latency.time("summarize"):
+            updated = await (self.condense_llm or Settings.llm).apredict(
+                SUMMARIZE_HISTORY_PROMPT,
+                summary=summary or "(none)",
+                messages=messages_to_history_str(messages),
+                max_words=app_settings.conversation_summary_max_words,
+            )
+        return updated.strip()
+
+    async def query_with_history(
+        self,
+        query_str: str,
+        chat_history: list[Message] | None = None,
+        budget_ms: float | None = None,
+        memory_messages: list[ChatMessage] | None = None,
     ) -> Output:
         """
         Query with conversation history for multi-turn conversations.
-        Uses CondenseQuestionChatEngine to maintain context.
+        The follow-up is condensed into a standalone question on the cheap
+        condense model, then answered by the citation query engine on the
+        synthesis model. If the budget runs out before synthesis, the answer
+        quotes the nodes retrieved for the raw message, when they are ready.
 
         Args:
             query_str: The current query string
             chat_history: Optional list of previous messages for context
+            budget_ms: Optional latency budget for the whole turn
+            memory_messages: Token-bounded history kept incrementally by the
+                caller (see ConversationMemory); used instead of chat_history
 
         Returns:
             Output: Query response with citations
         """
-        if not chat_history or len(chat_history) == 0:
+        if memory_messages is None:
+            # No maintained memory - bound the full history passed to condensation
+            memory = ConversationMemory(
+                token_limit=app_settings.conversation_memory_token_limit
+            )
+            for message in chat_history or []:
+                memory.append(message)
+            memory_messages = memory.get()
+
+        if not memory_messages:
             # No history - use regular CitationQueryEngine
-            return self.query(query_str)
+            return await self.query(query_str, budget_ms=budget_ms)
 
-        # Create chat engine with memory
-        memory = ChatMemoryBuffer.from_defaults(token_limit=3000)
+        # A bare section reference needs neither condensation nor retrieval
+        section_answer = self._answer_section_reference(query_str)
+        if section_answer is not None:
+            return section_answer
 
-        # Populate memory with chat history
-        for msg in chat_history:
-            if msg.role == "user":
-                memory.put(ChatMessage(role=MessageRole.USER, content=msg.content))
-            elif msg.role == "assistant":
-                memory.put(ChatMessage(role=MessageRole.ASSISTANT, content=msg.content))
+        # A self-contained follow-up is answered like a first question
+        self.follow_up_turns += 1
+        if app_settings.condense_skip_standalone and not needs_condensation(
+            query_str, min_words=app_settings.condense_min_standalone_words
+        ):
+            self.condense_skipped += 1
+            logger.info(
+                "Skipped condensation of a standalone follow-up "
+                "(%d of %d follow-up turns, %.0f%%)",
+                self.condense_skipped,
+                self.follow_up_turns,
+                100 * self.condense_skipped / self.follow_up_turns,
+            )
+            return await self.query(query_str, budget_ms=budget_ms)
 
-        # Create the base query engine with citations
-        query_engine = CitationQueryEngine.from_args(
-            self.index,
-            similarity_top_k=self.k,
-            citation_chunk_size=512,
-        )
+        deadline = Deadline.from_budget_ms(budget_ms)
+        query_engine = self._create_query_engine(self.k)
 
-        # Create chat engine that condenses questions based on history
-        chat_engine = CondenseQuestionChatEngine.from_defaults(
-            query_engine=query_engine,
-            memory=memory,
-            verbose=False,
-        )
+        # Speculatively retrieve for the raw message while condensing it
+        speculative = None
+        if app_settings.speculative_retrieval_enabled:
+            self.speculative_retrievals += 1
+            speculative = asyncio.ensure_future(
+                self._embed_and_retrieve(query_engine, query_str)
+            )
+            # Errors only matter if the results are used
+            speculative.add_done_callback(
+                lambda task: task.cancelled() or task.exception()
+            )
 
-        # Execute query with context
-        response = chat_engine.chat(query_str)
+        with track_llm_usage(max_calls=app_settings.request_max_llm_calls) as usage:
+            try:
+                try:
+                    # Condense the follow-up into a standalone question
+                    standalone_question = await within(
+                        deadline, self._condense_question(query_str, memory_messages)
+                    )
 
-        # Extract citations from the response
-        citations = []
-        if hasattr(response, "source_nodes"):
-            for node in response.source_nodes:
-                metadata = node.node.metadata
-                source = metadata.get("Section", "Unknown Section")
-                text = node.node.text
-                citations.append(Citation(source=source, text=text))
+                    if speculative is not None and self._is_close_rewrite(
+                        query_str, standalone_question
+                    ):
+                        self.speculative_reuses += 1
+                        _, nodes = await within(deadline, speculative)
+                        query_bundle = QueryBundle(standalone_question)
+                    else:
+                        # Answer the standalone question with citations
+                        query_bundle, nodes = await within(
+                            deadline,
+                            self._embed_and_retrieve(query_engine, standalone_question),
+                        )
+                except DeadlineExceeded:
+                    # Quote the nodes retrieved for the raw message, if ready
+                    return self._build_degraded_output(
+                        query_str, self._speculative_nodes(speculative)
+                    )
+                finally:
+                    if speculative is not None and not speculative.done():
+                        speculative.cancel()
+                output = await self._synthesize(
+                    query_engine,
+                    query_bundle,
+                    nodes,
+                    record_usage=False,
+                    deadline=deadline,
+                )
+            except asyncio.CancelledError:
+                # The client went away; the remaining LLM calls are not made
+                self.llm_usage.record_cancelled(usage)
+                raise
 
-        return Output(
-            query=query_str,
-            response=str(response),
-            citations=citations,
-        )
+        output = output.model_copy(update={"query": query_str})
+        # Account the whole turn, condensation included
+        self._annotate_usage(output, usage)
+        self.llm_usage.record(usage)
+        return output
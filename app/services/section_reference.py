@@ -0,0 +1,79 @@
+"""Detection of queries that only ask for one section of the laws."""
+
+import re
+
+# A subsection number such as "3.2" or "6.2.3", optionally prefixed by
+# "section", "sec." or "§"
+_SECTION_NUMBER = re.compile(
+    r"(?:§\s*|\bsec(?:tion)?\.?\s*)?(?<![\d.])(\d+(?:\.\d+)+)(?![\d.]*\d)\.?",
+    re.IGNORECASE,
+)
+
+# Words that may surround a section number without changing what is asked
+_FILLER_WORDS = frozenset(
+    {
+        "a",
+        "about",
+        "can",
+        "contain",
+        "contains",
+        "content",
+        "contents",
+        "display",
+        "does",
+        "full",
+        "give",
+        "i",
+        "in",
+        "is",
+        "law",
+        "look",
+        "me",
+        "of",
+        "open",
+        "please",
+        "quote",
+        "read",
+        "rule",
+        "say",
+        "says",
+        "see",
+        "show",
+        "state",
+        "states",
+        "tell",
+        "text",
+        "the",
+        "up",
+        "what",
+        "what's",
+        "whats",
+        "wording",
+        "you",
+    }
+)
+
+
+def parse_section_reference(query_str: str) -> str | None:
+    """
+    Return the section number a query asks for, if that is all it asks.
+
+    Matches messages such as "3.2", "show me 3.2" or "what does section 6.2.3
+    say". A query that also asks something else ("what does 3.2 say about
+    theft?") or references several sections is not matched.
+
+    Args:
+        query_str: The user query
+
+    Returns:
+        The referenced subsection number (e.g. "6.2.3"), or None
+    """
+    numbers = set(_SECTION_NUMBER.findall(query_str))
+    if len(numbers) != 1:
+        return None
+
+    remainder = _SECTION_NUMBER.sub(" ", query_str).lower()
+    words = re.findall(r"[\w']+", remainder)
+    if any(word not in _FILLER_WORDS for word in words):
+        return None
+    return numbers.pop()
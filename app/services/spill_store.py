@@ -0,0 +1,64 @@
+"""Compressed on-disk storage for data evicted from memory."""
+
+import os
+import shutil
+import tempfile
+import zlib
+from pathlib import Path
+
+
+class CompressedSpillStore:
+    """
+    Keep zlib-compressed blobs in files of a private directory.
+
+    The directory is created under ``root`` and removed by ``close()``, so
+    several processes can spill under the same root without clashing.
+    """
+
+    def __init__(self, root: str, level: int = 6):
+        """
+        Create the store's directory.
+
+        Args:
+            root: Directory under which the store's own directory is created
+            level: zlib compression level
+        """
+        Path(root).mkdir(parents=True, exist_ok=True)
+        self.path = Path(tempfile.mkdtemp(prefix="spill-", dir=root))
+        self.level = level
+        self.bytes_on_disk = 0
+        self._sizes: dict[str, int] = {}
+
+    def _file(self, key: str) -> Path:
+        return self.path / f"{key}.z"
+
+    def write(self, key: str, data: bytes) -> None:
+        """Compress and store a blob, replacing any blob with the same key."""
+        compressed = zlib.compress(data, self.level)
+        file = self._file(key)
+        tmp = file.with_suffix(".tmp")
+        tmp.write_bytes(compressed)
+        os.replace(tmp, file)
+        self.bytes_on_disk += len(compressed) - self._sizes.get(key, 0)
+        self._sizes[key] = len(compressed)
+
+    def read(self, key: str) -> bytes:
+        """Return a stored blob, decompressed."""
+        return zlib.decompress(self._file(key).read_bytes())
+
+    def delete(self, key: str) -> None:
+        """Remove a stored blob if present."""
+        self._file(key).unlink(missing_ok=True)
+        self.bytes_on_disk -= self._sizes.pop(key, 0)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._sizes
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def close(self) -> None:
+        """Remove the store's directory and every blob in it."""
+        shutil.rmtree(self.path, ignore_errors=True)
+        self._sizes.clear()
+        self.bytes_on_disk = 0
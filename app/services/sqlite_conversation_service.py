@@ -0,0 +1,995 @@
+"""Service for managing conversations stored in SQLite."""
+
+import asyncio
+import hashlib
+import queue
+import sqlite3
+import time
+import uuid
+from collections.abc import Awaitable, Callable, Hashable, Iterator
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from pydantic import TypeAdapter
+
+from app.config import settings as app_settings
+from app.models import (
+    Citation,
+    Conversation,
+    ConversationChanges,
+    ConversationListResponse,
+    ConversationSummary,
+    Message,
+    MessageListResponse,
+)
+from app.services.citation_refs import CitationCodec
+from app.services.conversation_memory import ConversationMemory
+from app.services.conversation_service import (
+    DEFAULT_TITLE,
+    ConversationBusy,
+    ConversationStore,
+    Summarizer,
+    message_preview,
+    without_citation_text,
+)
+from app.services.idempotency import IdempotencyKeyReused, IdempotencyStore
+
+_CITATIONS = TypeAdapter(list[Citation])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    last_message TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_updated_at
+    ON conversations (updated_at, id);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id TEXT NOT NULL
+        REFERENCES conversations (id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    citations TEXT NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation
+    ON messages (conversation_id, id);
+CREATE TABLE IF NOT EXISTS changes (
+    conversation_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_changes_version ON changes (version);
+CREATE TABLE IF NOT EXISTS idempotency (
+    conversation_id TEXT NOT NULL
+        REFERENCES conversations (id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    message_id INTEGER,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (conversation_id, key)
+);
+CREATE INDEX IF NOT EXISTS idx_idempotency_created_at
+    ON idempotency (created_at);
+CREATE TABLE IF NOT EXISTS citation_texts (
+    key TEXT PRIMARY KEY,
+    text TEXT NOT NULL
+);
+-- Number of conversations, kept by triggers in the transaction of each
+-- insert or delete so listing pages does not count the table
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT INTO counters (name, value)
+    SELECT 'conversations', (SELECT COUNT(*) FROM conversations)
+    WHERE NOT EXISTS (SELECT 1 FROM counters WHERE name = 'conversations');
+CREATE TRIGGER IF NOT EXISTS conversations_counted_on_insert
+    AFTER INSERT ON conversations
+BEGIN
+    UPDATE counters SET value = value + 1 WHERE name = 'conversations';
+END;
+CREATE TRIGGER IF NOT EXISTS conversations_counted_on_delete
+    AFTER DELETE ON conversations
+BEGIN
+    UPDATE counters SET value = value - 1 WHERE name = 'conversations';
+END;
+"""
+
+# Statements are module constants so each pooled connection compiles them
+# once and reuses them from its statement cache
+_INSERT_CONVERSATION = (
+    "INSERT INTO conversations (id, title, created_at, updated_at) VALUES (?, ?, ?, ?)"
+)
+_SELECT_CONVERSATION = (
+    "SELECT id, title, created_at, updated_at FROM conversations WHERE id = ?"
+)
+_SELECT_SUMMARIES = (
+    "SELECT id, title, updated_at, message_count, last_message FROM conversations "
+    "ORDER BY updated_at DESC, id DESC LIMIT ?"
+)
+_SELECT_SUMMARIES_BEFORE = (
+    "SELECT id, title, updated_at, message_count, last_message FROM conversations "
+    "WHERE (updated_at, id) < (?, ?) ORDER BY updated_at DESC, id DESC LIMIT ?"
+)
+_COUNT_CONVERSATIONS = "SELECT value FROM counters WHERE name = 'conversations'"
+_SELECT_MESSAGES = (
+    "SELECT role, content, citations, timestamp FROM messages "
+    "WHERE conversation_id = ? ORDER BY id"
+)
+_SELECT_MESSAGES_BEFORE = (
+    "SELECT id, role, content, citations, timestamp FROM messages "
+    "WHERE conversation_id = ? AND id < ? ORDER BY id DESC LIMIT ?"
+)
+_SELECT_MESSAGES_AFTER = (
+    "SELECT id, role, content FROM messages "
+    "WHERE conversation_id = ? AND id > ? ORDER BY id"
+)
+_TOUCH_CONVERSATION = (
+    "UPDATE conversations SET updated_at = ?, "
+    "message_count = message_count + 1, last_message = ?, "
+    "title = CASE WHEN ? = 'user' AND title = ? THEN ? ELSE title END "
+    "WHERE id = ? AND (? IS NULL OR message_count = ?) "
+    "RETURNING id, title, created_at, updated_at"
+)
+_INSERT_MESSAGE = (
+    "INSERT INTO messages (conversation_id, role, content, citations, timestamp) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+_UPDATE_TITLE = "UPDATE conversations SET title = ?, updated_at = ? WHERE id = ?"
+_EXISTS_CONVERSATION = "SELECT 1 FROM conversations WHERE id = ?"
+_SELECT_MESSAGE_COUNT = "SELECT message_count FROM conversations WHERE id = ?"
+_DELETE_CONVERSATION = "DELETE FROM conversations WHERE id = ?"
+# One row per conversation, holding the version of its latest change; the
+# versions of every write are increasing since SQLite has a single writer
+_RECORD_CHANGE = (
+    "INSERT OR REPLACE INTO changes (conversation_id, version, deleted) "
+    "VALUES (?, (SELECT COALESCE(MAX(version), 0) + 1 FROM changes), ?)"
+)
+_SELECT_VERSION = (
+    "SELECT (SELECT COALESCE(MAX(version), 0) FROM changes), "
+    "(SELECT COALESCE(MAX(id), 0) FROM messages)"
+)
+_SELECT_CHANGED_SUMMARIES = (
+    "SELECT c.id, c.title, c.updated_at, c.message_count, c.last_message "
+    "FROM changes JOIN conversations c ON c.id = changes.conversation_id "
+    "WHERE changes.version > ? ORDER BY c.updated_at DESC, c.id DESC"
+)
+_SELECT_DELETED = (
+    "SELECT conversation_id FROM changes WHERE version > ? AND deleted = 1 "
+    "ORDER BY version"
+)
+_SELECT_NEW_MESSAGES = (
+    "SELECT conversation_id, role, content, citations, timestamp FROM messages "
+    "WHERE id > ? ORDER BY id"
+)
+
+
+# A key is claimed before its message is answered, and holds the row of the
+# answer once it is stored
+_CLAIM_IDEMPOTENCY_KEY = (
+    "INSERT OR IGNORE INTO idempotency "
+    "(conversation_id, key, fingerprint, created_at) "
+    "SELECT ?, ?, ?, ? WHERE EXISTS (SELECT 1 FROM conversations WHERE id = ?)"
+)
+_SELECT_IDEMPOTENCY_KEY = (
+    "SELECT fingerprint, message_id, created_at FROM idempotency "
+    "WHERE conversation_id = ? AND key = ?"
+)
+_RENEW_IDEMPOTENCY_KEY = (
+    "UPDATE idempotency SET created_at = ? WHERE conversation_id = ? AND key = ? "
+    "AND created_at = ? AND message_id IS NULL"
+)
+_ANSWER_IDEMPOTENCY_KEY = (
+    "UPDATE idempotency SET message_id = ? WHERE conversation_id = ? AND key = ?"
+)
+_RELEASE_IDEMPOTENCY_KEY = (
+    "DELETE FROM idempotency "
+    "WHERE conversation_id = ? AND key = ? AND message_id IS NULL"
+)
+_EXPIRE_IDEMPOTENCY_KEYS = "DELETE FROM idempotency WHERE created_at < ?"
+# Cited texts are content-addressed, so each one is stored once however
+# many messages cite it
+_INSERT_CITATION_TEXT = "INSERT OR IGNORE INTO citation_texts (key, text) VALUES (?, ?)"
+_SELECT_MESSAGE = (
+    "SELECT role, content, citations, timestamp FROM messages WHERE id = ?"
+)
+
+
+_MAX_ROW_ID = 2**63 - 1
+# Conversations read per page of summaries by get_all_conversations
+_ALL_CONVERSATIONS_PAGE = 100
+
+
+def _timestamp(value: datetime) -> str:
+    """Format a datetime as a sortable UTC ISO string."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return value.astimezone(UTC).isoformat(timespec="microseconds")
+
+
+class _SharedIdempotencyStore(IdempotencyStore):
+    """
+    IdempotencyStore whose keys are also claimed in the database.
+
+    Retries reaching this worker share its in-flight answer as usual. A retry
+    reaching another worker replays the answer stored with the key, or is
+    rejected as busy while the first worker is still answering.
+    """
+
+    def __init__(self, service: "SQLiteConversationService", **kwargs):
+        super().__init__(**kwargs)
+        self._service = service
+
+    async def run(
+        self,
+        key: tuple[str, str],
+        fingerprint: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """Run ``fn`` once for ``key`` across every worker sharing the database."""
+        conversation_id, idempotency_key = key
+        digest = hashlib.sha256(str(fingerprint).encode()).hexdigest()
+
+        async def claimed() -> Any:
+            stored = await asyncio.to_thread(
+                self._service._claim_idempotency_key,
+                conversation_id,
+                idempotency_key,
+                digest,
+            )
+            if stored is not None:
+                self.replays += 1
+                return stored
+            try:
+                return await fn()
+            except BaseException:
+                # Let a retry answer the message again
+                self._service._release_idempotency_key(conversation_id, idempotency_key)
+                raise
+
+        return await super().run(key, fingerprint, claimed)
+
+
+class SQLiteConversationService(ConversationStore):
+    """
+    Service for managing conversations stored in a SQLite database.
+
+    The database runs in WAL mode so several workers can share it: readers do
+    not block the single writer, and adding a message is one appended row.
+    Chat memories stay per process and catch up with messages written by
+    other workers when they are read.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        summarizer: Summarizer | None = None,
+        pool_size: int = 4,
+        citation_codec: CitationCodec | None = None,
+    ):
+        """
+        Open the database and create its schema if needed.
+
+        Args:
+            db_path: Path of the SQLite database file
+            summarizer: Optional coroutine function keeping a rolling summary
+                of the turns that leave each conversation's memory window
+            pool_size: Number of pooled connections
+            citation_codec: Optional codec storing each cited text once,
+                with messages keeping a reference to it
+        """
+        # Turns are serialized per process; see ConversationStore.turn
+        super().__init__(summarizer, citation_codec)
+        self.db_path = db_path
+        # Answers of messages sent with an idempotency key, shared with the
+        # other workers through the database
+        self.idempotency = _SharedIdempotencyStore(
+            self,
+            max_entries=app_settings.conversation_idempotency_max_keys,
+            ttl_seconds=app_settings.conversation_idempotency_ttl_seconds,
+        )
+        # Last message row folded into each cached memory
+        self._memory_positions: dict[str, int] = {}
+        # Changes from other workers are only seen by polling the database
+        self.change_poll_seconds = app_settings.conversation_changes_poll_seconds
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._pool: queue.Queue[sqlite3.Connection] = queue.Queue()
+        for _ in range(pool_size):
+            self._pool.put(self._open_connection())
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _open_connection(self) -> sqlite3.Connection:
+        """Open a connection configured for concurrent access."""
+        conn = sqlite3.connect(
+            self.db_path, check_same_thread=False, cached_statements=128
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Durable at checkpoints, without an fsync per appended message
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection from the pool."""
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def create_conversation(self, title: str = DEFAULT_TITLE) -> Conversation:
+        """Create a new conversation."""
+        return self._created(self._insert_conversation(title))
+
+    async def acreate_conversation(self, title: str = DEFAULT_TITLE) -> Conversation:
+        """Create a new conversation, writing from a worker thread."""
+        return self._created(await asyncio.to_thread(self._insert_conversation, title))
+
+    def _insert_conversation(self, title: str) -> Conversation:
+        """Write a new conversation; only touches the database."""
+        now = datetime.now(UTC)
+        conversation = Conversation(
+            id=str(uuid.uuid4()),
+            title=title,
+            messages=[],
+            created_at=now,
+            updated_at=now,
+        )
+        with self._connection() as conn, conn:
+            conn.execute(
+                _INSERT_CONVERSATION,
+                (conversation.id, title, _timestamp(now), _timestamp(now)),
+            )
+            conn.execute(_RECORD_CHANGE, (conversation.id, 0))
+        return conversation
+
+    def _created(self, conversation: Conversation) -> Conversation:
+        """Announce a new conversation and start its memory."""
+        self._notify_changes()
+        self.memories[conversation.id] = self._new_memory()
+        self._memory_positions[conversation.id] = 0
+        return conversation
+
+    def get_conversation(self, conversation_id: str) -> Conversation | None:
+        """Get a conversation by ID."""
+        with self._connection() as conn:
+            row = conn.execute(_SELECT_CONVERSATION, (conversation_id,)).fetchone()
+            if row is None:
+                return None
+            messages = [
+                self._message_from_row(conn, m)
+                for m in conn.execute(_SELECT_MESSAGES, (conversation_id,))
+            ]
+        return self._conversation_from_row(row, messages)
+
+    def get_messages(
+        self,
+        conversation_id: str,
+        limit: int,
+        before: int | None = None,
+        include_citation_text: bool = True,
+    ) -> MessageListResponse | None:
+        """
+        Get one page of a conversation's messages, ending with the latest.
+
+        Messages are addressed by their row ID and pages are read backwards
+        from the (conversation_id, id) index.
+
+        Args:
+            conversation_id: The conversation ID
+            limit: Maximum number of messages in the page
+            before: `next_before` of the previous page, None for the latest
+            include_citation_text: Whether to return the text of citations
+
+        Returns:
+            MessageListResponse: The page (oldest first) and the cursor of the
+                older one, or None if the conversation does not exist
+        """
+        with self._connection() as conn:
+            if (
+                conn.execute(_EXISTS_CONVERSATION, (conversation_id,)).fetchone()
+                is None
+            ):
+                return None
+            rows = conn.execute(
+                _SELECT_MESSAGES_BEFORE,
+                (
+                    conversation_id,
+                    before if before is not None else _MAX_ROW_ID,
+                    limit + 1,
+                ),
+            ).fetchall()
+            page = rows[:limit]
+            messages = [self._message_from_row(conn, row[1:]) for row in reversed(page)]
+        if not include_citation_text:
+            messages = [without_citation_text(m) for m in messages]
+        return MessageListResponse(
+            messages=messages,
+            next_before=page[-1][0] if len(rows) > limit else None,
+        )
+
+    async def aget_messages(
+        self,
+        conversation_id: str,
+        limit: int,
+        before: int | None = None,
+        include_citation_text: bool = True,
+    ) -> MessageListResponse | None:
+        """Get one page of messages, reading from a worker thread."""
+        return await asyncio.to_thread(
+            self.get_messages, conversation_id, limit, before, include_citation_text
+        )
+
+    def get_conversation_json(self, conversation_id: str) -> bytes | None:
+        """Get a conversation serialized as JSON."""
+        conversation = self.get_conversation(conversation_id)
+        if conversation is None:
+            return None
+        return conversation.model_dump_json().encode()
+
+    async def aget_conversation_json(self, conversation_id: str) -> bytes | None:
+        """Get a conversation as JSON, reading from a worker thread."""
+        return await asyncio.to_thread(self.get_conversation_json, conversation_id)
+
+    def get_memory(self, conversation_id: str) -> ConversationMemory | None:
+        """Get the chat memory of a conversation, caught up with the database."""
+        return self._caught_up_memory(
+            conversation_id, self._read_memory_rows(conversation_id)
+        )
+
+    async def aget_memory(self, conversation_id: str) -> ConversationMemory | None:
+        """Get the chat memory of a conversation, reading from a worker thread."""
+        rows = await asyncio.to_thread(self._read_memory_rows, conversation_id)
+        return self._caught_up_memory(conversation_id, rows)
+
+    def _read_memory_rows(self, conversation_id: str) -> list[tuple] | None:
+        """Read the messages a conversation's memory has not seen yet."""
+        with self._connection() as conn:
+            if (
+                conversation_id not in self.memories
+                and conn.execute(_EXISTS_CONVERSATION, (conversation_id,)).fetchone()
+                is None
+            ):
+                return None
+            return self._read_after(conn, conversation_id)
+
+    def _caught_up_memory(
+        self, conversation_id: str, rows: list[tuple] | None
+    ) -> ConversationMemory | None:
+        """Return a conversation's memory with the rows read for it appended."""
+        if rows is None:
+            return None
+        memory = self.memories.get(conversation_id)
+        if memory is None:
+            memory = self._new_memory()
+            self.memories[conversation_id] = memory
+            self._memory_positions[conversation_id] = 0
+        self._catch_up(conversation_id, memory, rows)
+        return memory
+
+    def get_all_conversations(self) -> list[Conversation]:
+        """
+        Get all conversations sorted by updated_at descending.
+
+        Conversations are read a page of summaries at a time, each with its
+        own query, so no single read holds the whole database; lists should
+        page with ``get_conversation_summaries`` instead.
+        """
+        conversations = []
+        cursor = None
+        while True:
+            page = self.get_conversation_summaries(_ALL_CONVERSATIONS_PAGE, cursor)
+            for summary in page.conversations:
+                conversation = self.get_conversation(summary.id)
+                # Deleted by another worker since the page was read
+                if conversation is not None:
+                    conversations.append(conversation)
+            if page.next_cursor is None:
+                return conversations
+            cursor = page.next_cursor
+
+    def get_conversation_summaries(
+        self, limit: int, cursor: str | None = None
+    ) -> ConversationListResponse:
+        """
+        Get one page of conversation summaries, most recently updated first.
+
+        Pages are read from the updated_at index, starting after the cursor.
+
+        Args:
+            limit: Maximum number of conversations in the page
+            cursor: `next_cursor` of the previous page, None for the first page
+
+        Returns:
+            ConversationListResponse: The page and the cursor of the next one
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        with self._connection() as conn:
+            if cursor is None:
+                rows = conn.execute(_SELECT_SUMMARIES, (limit + 1,)).fetchall()
+            else:
+                updated_at, separator, conversation_id = cursor.partition("|")
+                if not separator:
+                    raise ValueError(f"Invalid cursor: {cursor!r}")
+                rows = conn.execute(
+                    _SELECT_SUMMARIES_BEFORE, (updated_at, conversation_id, limit + 1)
+                ).fetchall()
+            total = conn.execute(_COUNT_CONVERSATIONS).fetchone()[0]
+        page = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = f"{page[-1][2]}|{page[-1][0]}"
+        return ConversationListResponse(
+            total=total,
+            conversations=[self._summary_from_row(row) for row in page],
+            next_cursor=next_cursor,
+        )
+
+    async def aget_conversation_summaries(
+        self, limit: int, cursor: str | None = None
+    ) -> ConversationListResponse:
+        """Get one page of conversation summaries, reading from a worker thread."""
+        return await asyncio.to_thread(self.get_conversation_summaries, limit, cursor)
+
+    def add_message(
+        self,
+        conversation_id: str,
+        message: Message,
+        expected_count: int | None = None,
+        idempotency_key: str | None = None,
+    ) -> Conversation | None:
+        """
+        Append a message to a conversation.
+
+        With ``expected_count`` the message is only appended if no other
+        message was added since the count was read, by this or any other
+        worker sharing the database.
+
+        Args:
+            conversation_id: The conversation ID
+            message: The message to append
+            expected_count: Number of messages the conversation must have
+                before this one, None to append unconditionally
+            idempotency_key: Idempotency key of the request the message
+                answers, recorded with it in the same transaction
+
+        Returns:
+            Conversation: The updated conversation without its messages, which
+                are not read back, or None if it does not exist
+
+        Raises:
+            ConversationBusy: If the conversation has another number of messages
+        """
+        stored = self._store_message(
+            conversation_id, message, expected_count, idempotency_key
+        )
+        return self._added(conversation_id, stored)
+
+    async def aadd_message(
+        self,
+        conversation_id: str,
+        message: Message,
+        expected_count: int | None = None,
+        idempotency_key: str | None = None,
+    ) -> Conversation | None:
+        """Append a message to a conversation, writing from a worker thread."""
+        stored = await asyncio.to_thread(
+            self._store_message,
+            conversation_id,
+            message,
+            expected_count,
+            idempotency_key,
+        )
+        return self._added(conversation_id, stored)
+
+    def get_message_count(self, conversation_id: str) -> int | None:
+        """Get the number of messages in a conversation, None if not found."""
+        with self._connection() as conn:
+            row = conn.execute(_SELECT_MESSAGE_COUNT, (conversation_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    async def aget_message_count(self, conversation_id: str) -> int | None:
+        """Count a conversation's messages, reading from a worker thread."""
+        return await asyncio.to_thread(self.get_message_count, conversation_id)
+
+    async def aget_conversation(self, conversation_id: str) -> Conversation | None:
+        """Get a conversation by ID, reading from a worker thread."""
+        return await asyncio.to_thread(self.get_conversation, conversation_id)
+
+    def _store_message(
+        self,
+        conversation_id: str,
+        message: Message,
+        expected_count: int | None = None,
+        idempotency_key: str | None = None,
+    ) -> tuple[Conversation, list[tuple]] | None:
+        """
+        Write a message and read the ones the cached memory has not seen.
+
+        Only touches the database, so it can run in a worker thread; the
+        memory and change notifications are updated by ``_added``.
+        """
+        now = _timestamp(datetime.now(UTC))
+        with self._connection() as conn:
+            with conn:
+                touched = conn.execute(
+                    _TOUCH_CONVERSATION,
+                    (
+                        now,
+                        message_preview(message.content),
+                        message.role,
+                        DEFAULT_TITLE,
+                        self._title_from_message(message.content),
+                        conversation_id,
+                        expected_count,
+                        expected_count,
+                    ),
+                ).fetchall()
+                if not touched:
+                    if expected_count is None or not self._exists(
+                        conn, conversation_id
+                    ):
+                        return None
+                    raise ConversationBusy(
+                        f"Conversation {conversation_id} changed during the turn"
+                    )
+                message_id = conn.execute(
+                    _INSERT_MESSAGE,
+                    (
+                        conversation_id,
+                        message.role,
+                        message.content,
+                        self._encode_citations(conn, message.citations),
+                        _timestamp(message.timestamp),
+                    ),
+                ).lastrowid
+                if idempotency_key is not None:
+                    conn.execute(
+                        _ANSWER_IDEMPOTENCY_KEY,
+                        (message_id, conversation_id, idempotency_key),
+                    )
+                conn.execute(_RECORD_CHANGE, (conversation_id, 0))
+            rows = (
+                self._read_after(conn, conversation_id)
+                if conversation_id in self.memories
+                else []
+            )
+        return self._conversation_from_row(touched[0], []), rows
+
+    def _added(
+        self,
+        conversation_id: str,
+        stored: tuple[Conversation, list[tuple]] | None,
+    ) -> Conversation | None:
+        """Announce a stored message and catch the cached memory up with it."""
+        if stored is None:
+            return None
+        conversation, rows = stored
+        self._notify_changes()
+        memory = self.memories.get(conversation_id)
+        if memory is not None:
+            self._catch_up(conversation_id, memory, rows)
+        return conversation
+
+    def _claim_idempotency_key(
+        self, conversation_id: str, key: str, fingerprint: str
+    ) -> Message | None:
+        """
+        Claim an idempotency key for answering, or get the answer stored with it.
+
+        Returns:
+            Message: The stored answer, or None if the key was claimed (or the
+                conversation does not exist) and the message is to be answered
+
+        Raises:
+            IdempotencyKeyReused: If the key was used for a different message
+            ConversationBusy: If another worker is still answering the message
+        """
+        now = time.time()
+        with self._connection() as conn, conn:
+            conn.execute(
+                _EXPIRE_IDEMPOTENCY_KEYS,
+                (now - app_settings.conversation_idempotency_ttl_seconds,),
+            )
+            claimed = conn.execute(
+                _CLAIM_IDEMPOTENCY_KEY,
+                (conversation_id, key, fingerprint, now, conversation_id),
+            ).rowcount
+            if claimed:
+                return None
+            row = conn.execute(
+                _SELECT_IDEMPOTENCY_KEY, (conversation_id, key)
+            ).fetchone()
+            if row is None:
+                return None
+            stored_fingerprint, message_id, claimed_at = row
+            if stored_fingerprint != fingerprint:
+                raise IdempotencyKeyReused(
+                    "Idempotency key was already used for a different request"
+                )
+            if message_id is not None:
+                return self._message_from_row(
+                    conn, conn.execute(_SELECT_MESSAGE, (message_id,)).fetchone()
+                )
+            stale = (
+                now - claimed_at >= app_settings.conversation_idempotency_claim_seconds
+            )
+            # Take over from a worker that died before answering, unless
+            # another retry took over first
+            if (
+                stale
+                and conn.execute(
+                    _RENEW_IDEMPOTENCY_KEY, (now, conversation_id, key, claimed_at)
+                ).rowcount
+            ):
+                return None
+            raise ConversationBusy(
+                f"Conversation {conversation_id} is answering this message"
+            )
+
+    def _release_idempotency_key(self, conversation_id: str, key: str) -> None:
+        """Drop the claim of a message that was not answered."""
+        with self._connection() as conn, conn:
+            conn.execute(_RELEASE_IDEMPOTENCY_KEY, (conversation_id, key))
+
+    @staticmethod
+    def _exists(conn: sqlite3.Connection, conversation_id: str) -> bool:
+        """Return whether a conversation exists."""
+        return (
+            conn.execute(_EXISTS_CONVERSATION, (conversation_id,)).fetchone()
+            is not None
+        )
+
+    def _read_after(self, conn: sqlite3.Connection, conversation_id: str) -> list:
+        """Read the messages stored after the memory's last position."""
+        return conn.execute(
+            _SELECT_MESSAGES_AFTER,
+            (conversation_id, self._memory_positions.get(conversation_id, 0)),
+        ).fetchall()
+
+    def _catch_up(
+        self, conversation_id: str, memory: ConversationMemory, rows: list[tuple]
+    ) -> None:
+        """Append the rows read after the memory's last position."""
+        # Rows read concurrently may already have been appended
+        position = self._memory_positions.get(conversation_id, 0)
+        rows = [row for row in rows if row[0] > position]
+        if not rows:
+            return
+        for _, role, content in rows:
+            memory.append(Message(role=role, content=content))
+        self._memory_positions[conversation_id] = rows[-1][0]
+        if any(role == "assistant" for _, role, _ in rows):
+            self._schedule_summary(conversation_id, memory)
+
+    def delete_conversation(self, conversation_id: str) -> bool:
+        """Delete a conversation and its messages."""
+        return self._deleted(conversation_id, self._delete_row(conversation_id))
+
+    async def adelete_conversation(self, conversation_id: str) -> bool:
+        """Delete a conversation and its messages, writing from a worker thread."""
+        deleted = await asyncio.to_thread(self._delete_row, conversation_id)
+        return self._deleted(conversation_id, deleted)
+
+    def _delete_row(self, conversation_id: str) -> bool:
+        """Delete a conversation from the database, if it exists."""
+        with self._connection() as conn, conn:
+            deleted = conn.execute(_DELETE_CONVERSATION, (conversation_id,)).rowcount
+            if deleted:
+                conn.execute(_RECORD_CHANGE, (conversation_id, 1))
+        return bool(deleted)
+
+    def _deleted(self, conversation_id: str, deleted: bool) -> bool:
+        """Announce a deletion and drop the conversation's memory."""
+        if deleted:
+            self._notify_changes()
+        self.memories.pop(conversation_id, None)
+        self._memory_positions.pop(conversation_id, None)
+        task = self._summary_tasks.pop(conversation_id, None)
+        if task is not None:
+            task.cancel()
+        return deleted
+
+    def update_conversation_title(
+        self, conversation_id: str, title: str
+    ) -> Conversation | None:
+        """Update conversation title."""
+        return self._updated(self._store_title(conversation_id, title))
+
+    async def aupdate_conversation_title(
+        self, conversation_id: str, title: str
+    ) -> Conversation | None:
+        """Update conversation title, writing from a worker thread."""
+        return self._updated(
+            await asyncio.to_thread(self._store_title, conversation_id, title)
+        )
+
+    def _store_title(self, conversation_id: str, title: str) -> Conversation | None:
+        """Write a conversation's title and read the conversation back."""
+        with self._connection() as conn, conn:
+            updated = conn.execute(
+                _UPDATE_TITLE,
+                (title, _timestamp(datetime.now(UTC)), conversation_id),
+            ).rowcount
+            if updated:
+                conn.execute(_RECORD_CHANGE, (conversation_id, 0))
+        if not updated:
+            return None
+        return self.get_conversation(conversation_id)
+
+    def _updated(self, conversation: Conversation | None) -> Conversation | None:
+        """Announce an updated conversation."""
+        if conversation is not None:
+            self._notify_changes()
+        return conversation
+
+    def get_changes(self, since: str | None = None) -> ConversationChanges:
+        """
+        Get what changed in the conversations after a cursor.
+
+        The cursor holds the latest change version and message row ID, read
+        in one snapshot together with the changes.
+
+        Args:
+            since: `cursor` of the previous changes, None for only the current
+                cursor
+
+        Returns:
+            ConversationChanges: Created or updated conversations, their new
+                messages, deleted conversations and the cursor to pass next
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        if since is None:
+            # Clients read the conversations from the paged endpoints
+            with self._connection() as conn:
+                latest_version, latest_message_id = conn.execute(
+                    _SELECT_VERSION
+                ).fetchone()
+            return ConversationChanges(
+                cursor=f"{latest_version}|{latest_message_id}",
+                conversations=[],
+                messages={},
+                deleted=[],
+            )
+        try:
+            version, message_id = (int(part) for part in since.split("|"))
+        except ValueError:
+            raise ValueError(f"Invalid cursor: {since!r}") from None
+
+        with self._connection() as conn:
+            # One read transaction, so the cursor matches the changes read
+            conn.execute("BEGIN")
+            try:
+                latest_version, latest_message_id = conn.execute(
+                    _SELECT_VERSION
+                ).fetchone()
+                cursor = f"{latest_version}|{latest_message_id}"
+                if version > latest_version or message_id > latest_message_id:
+                    # The cursor is from another database
+                    return ConversationChanges(
+                        cursor=cursor,
+                        conversations=[],
+                        messages={},
+                        deleted=[],
+                        reset=True,
+                    )
+                summaries = conn.execute(
+                    _SELECT_CHANGED_SUMMARIES, (version,)
+                ).fetchall()
+                deleted = conn.execute(_SELECT_DELETED, (version,)).fetchall()
+                messages: dict[str, list[Message]] = {}
+                for conversation_id, *message_row in conn.execute(
+                    _SELECT_NEW_MESSAGES, (message_id,)
+                ):
+                    messages.setdefault(conversation_id, []).append(
+                        self._message_from_row(conn, message_row)
+                    )
+            finally:
+                conn.rollback()
+        return ConversationChanges(
+            cursor=cursor,
+            conversations=[self._summary_from_row(row) for row in summaries],
+            messages=messages,
+            deleted=[row[0] for row in deleted],
+        )
+
+    async def aget_changes(self, since: str | None = None) -> ConversationChanges:
+        """Get the changes after a cursor, reading from a worker thread."""
+        return await asyncio.to_thread(self.get_changes, since)
+
+    def stats(self) -> dict:
+        """Return the chat memories cached and answers kept by this process."""
+        return {
+            "store": "sqlite",
+            "cached_memories": len(self.memories),
+            "idempotency": self.idempotency.stats(),
+        }
+
+    def close(self) -> None:
+        """Close every pooled connection."""
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                return
+            conn.close()
+
+    @staticmethod
+    def _conversation_from_row(row: tuple, messages: list[Message]) -> Conversation:
+        """Build a conversation from a conversations row."""
+        conversation_id, title, created_at, updated_at = row
+        return Conversation(
+            id=conversation_id,
+            title=title,
+            messages=messages,
+            created_at=datetime.fromisoformat(created_at),
+            updated_at=datetime.fromisoformat(updated_at),
+        )
+
+    @staticmethod
+    def _summary_from_row(row: tuple) -> ConversationSummary:
+        """Build a conversation summary from a conversations row."""
+        conversation_id, title, updated_at, message_count, last_message = row
+        return ConversationSummary(
+            id=conversation_id,
+            title=title,
+            updated_at=datetime.fromisoformat(updated_at),
+            message_count=message_count,
+            last_message_preview=last_message,
+        )
+
+    def _encode_citations(
+        self, conn: sqlite3.Connection, citations: list[Citation]
+    ) -> str:
+        """Encode citations for the messages table, storing their texts once."""
+        if self.citation_codec is None:
+            return _CITATIONS.dump_json(citations).decode()
+        data, texts = self.citation_codec.dumps(citations)
+        conn.executemany(_INSERT_CITATION_TEXT, texts.items())
+        return data
+
+    def _decode_citations(self, conn: sqlite3.Connection, data: str) -> list[Citation]:
+        """Decode citations from the messages table."""
+        if self.citation_codec is None:
+            return _CITATIONS.validate_json(data)
+        return self.citation_codec.loads(
+            data, lambda keys: self._read_citation_texts(conn, keys)
+        )
+
+    @staticmethod
+    def _read_citation_texts(
+        conn: sqlite3.Connection, keys: list[str]
+    ) -> dict[str, str]:
+        """Read cited texts by their hash."""
+        placeholders = ", ".join("?" * len(keys))
+        return dict(
+            conn.execute(
+                f"SELECT key, text FROM citation_texts WHERE key IN ({placeholders})",
+                keys,
+            )
+        )
+
+    def _message_from_row(self, conn: sqlite3.Connection, row: tuple | list) -> Message:
+        """Build a message from a messages row."""
+        role, content, citations, timestamp = row
+        return Message(
+            role=role,
+            content=content,
+            citations=self._decode_citations(conn, citations),
+            timestamp=datetime.fromisoformat(timestamp),
+        )
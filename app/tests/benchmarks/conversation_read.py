@@ -0,0 +1,82 @@
+"""
+Benchmark reading a conversation through the API.
+
+Compares the response_model path (dump, re-validate and encode the
+Conversation on every read) with the JSON assembled from cached message
+fragments. Run with ``python -m app.tests.benchmarks.conversation_read``.
+"""
+
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from app.models import Citation, Conversation, Message
+from app.services import ConversationService
+
+SIZES = (10, 100, 1000)
+READS = 50
+
+
+def build_service(message_count: int) -> tuple[ConversationService, str]:
+    """Create a conversation of alternating questions and cited answers."""
+    service = ConversationService()
+    conversation = service.create_conversation("Benchmark")
+    for i in range(message_count // 2):
+        service.add_message(
+            conversation.id, Message(role="user", content=f"Question {i} " * 10)
+        )
+        service.add_message(
+            conversation.id,
+            Message(
+                role="assistant",
+                content=f"Answer {i} " * 40,
+                citations=[
+                    Citation(source=f"Law {i}.{j}", text="Cited text " * 30)
+                    for j in range(3)
+                ],
+            ),
+        )
+    return service, conversation.id
+
+
+def read_with_response_model(
+    service: ConversationService, conversation_id: str
+) -> bytes:
+    """Serialize a conversation the way FastAPI does for a response_model."""
+    conversation = service.get_conversation(conversation_id)
+    validated = Conversation.model_validate(conversation.model_dump())
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+def read_cached(service: ConversationService, conversation_id: str) -> bytes:
+    """Serialize a conversation from its cached message JSON."""
+    return service.get_conversation_json(conversation_id)
+
+
+def measure(read, service: ConversationService, conversation_id: str) -> tuple:
+    """Return the mean wall and CPU milliseconds of one read."""
+    read(service, conversation_id)  # Warm up (fills the fragment cache)
+    wall, cpu = time.perf_counter(), time.process_time()
+    for _ in range(READS):
+        read(service, conversation_id)
+    return (
+        (time.perf_counter() - wall) * 1000 / READS,
+        (time.process_time() - cpu) * 1000 / READS,
+    )
+
+
+def main() -> None:
+    print(f"{'messages':>8} {'path':>15} {'wall ms':>9} {'cpu ms':>9}")
+    for size in SIZES:
+        service, conversation_id = build_service(size)
+        for name, read in (
+            ("response_model", read_with_response_model),
+            ("cached json", read_cached),
+        ):
+            wall, cpu = measure(read, service, conversation_id)
+            print(f"{size:>8} {name:>15} {wall:>9.3f} {cpu:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
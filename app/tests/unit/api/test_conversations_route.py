@@ -1,13 +1,23 @@
 """Unit tests for conversations API routes."""
 
+import asyncio
+from contextlib import nullcontext
 from datetime import UTC, datetime
-from unittest.mock import Mock
+from unittest.mock import AsyncMock, Mock
 
 import pytest
 from fastapi import HTTPException
 
 from app.api.routes import conversations
-from app.models import Conversation, Message
+from app.models import (
+    Conversation,
+    ConversationChanges,
+    ConversationListResponse,
+    ConversationSummary,
+    Message,
+    MessageListResponse,
+)
+from app.services import ConversationService, SQLiteConversationService
 
 
 class TestListConversations:
@@ -16,8 +26,10 @@ class TestListConversations:
     @pytest.mark.asyncio
     async def test_list_conversations_empty(self):
         """Test listing conversations when none exist."""
-        mock_service = Mock()
-        mock_service.get_all_conversations.return_value = []
+        mock_service = AsyncMock()
+        mock_service.aget_conversation_summaries.return_value = (
+            ConversationListResponse(total=0, conversations=[])
+        )
 
         response = await conversations.list_conversations(
             conversation_service=mock_service
@@ -25,36 +37,92 @@ class TestListConversations:
 
         assert response.total == 0
         assert response.conversations == []
-        mock_service.get_all_conversations.assert_called_once()
+        mock_service.aget_conversation_summaries.assert_awaited_once_with(
+            50, cursor=None
+        )
 
     @pytest.mark.asyncio
     async def test_list_conversations_with_data(self):
-        """Test listing conversations with existing data."""
+        """Test listing a page of conversation summaries."""
+        mock_service = AsyncMock()
+        summaries = [
+            ConversationSummary(
+                id=str(i),
+                title=f"Conversation {i}",
+                updated_at=datetime.now(UTC),
+                message_count=i,
+            )
+            for i in (1, 2)
+        ]
+        mock_service.aget_conversation_summaries.return_value = (
+            ConversationListResponse(
+                total=3, conversations=summaries, next_cursor="cursor"
+            )
+        )
+
+        response = await conversations.list_conversations(
+            cursor="previous", limit=2, conversation_service=mock_service
+        )
+
+        assert response.total == 3
+        assert [c.id for c in response.conversations] == ["1", "2"]
+        assert response.next_cursor == "cursor"
+        mock_service.aget_conversation_summaries.assert_awaited_once_with(
+            2, cursor="previous"
+        )
+
+    @pytest.mark.asyncio
+    async def test_list_conversations_invalid_cursor(self):
+        """Test an invalid cursor returns 400."""
+        mock_service = AsyncMock()
+        mock_service.aget_conversation_summaries.side_effect = ValueError(
+            "Invalid cursor"
+        )
+
+        with pytest.raises(HTTPException) as exc_info:
+            await conversations.list_conversations(
+                cursor="bad", conversation_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 400
+
+
+class TestGetChanges:
+    """Tests for get_changes endpoint."""
+
+    @pytest.mark.asyncio
+    async def test_get_changes_waits_up_to_cap(self, monkeypatch):
+        """Test changes are long-polled with the timeout capped by settings."""
+        monkeypatch.setattr(
+            conversations.settings, "conversation_changes_max_wait_seconds", 10.0
+        )
         mock_service = Mock()
-        conv1 = Conversation(
-            id="1",
-            title="First",
-            messages=[],
-            created_at=datetime.now(UTC),
-            updated_at=datetime.now(UTC),
+        changes = ConversationChanges(
+            cursor="5", conversations=[], messages={}, deleted=["gone"]
         )
-        conv2 = Conversation(
-            id="2",
-            title="Second",
-            messages=[],
-            created_at=datetime.now(UTC),
-            updated_at=datetime.now(UTC),
+        mock_service.wait_for_changes = AsyncMock(return_value=changes)
+
+        response = await conversations.get_changes(
+            since="3", timeout=60.0, conversation_service=mock_service
         )
-        mock_service.get_all_conversations.return_value = [conv1, conv2]
 
-        response = await conversations.list_conversations(
-            conversation_service=mock_service
+        assert response == changes
+        mock_service.wait_for_changes.assert_awaited_once_with("3", 10.0)
+
+    @pytest.mark.asyncio
+    async def test_get_changes_invalid_cursor(self):
+        """Test an invalid cursor returns 400."""
+        mock_service = Mock()
+        mock_service.wait_for_changes = AsyncMock(
+            side_effect=ValueError("Invalid cursor")
         )
 
-        assert response.total == 2
-        assert len(response.conversations) == 2
-        assert response.conversations[0].id == "1"
-        assert response.conversations[1].id == "2"
+        with pytest.raises(HTTPException) as exc_info:
+            await conversations.get_changes(
+                since="bad", conversation_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 400
 
 
 class TestCreateConversation:
@@ -63,7 +131,7 @@ class TestCreateConversation:
     @pytest.mark.asyncio
     async def test_create_conversation_default_title(self):
         """Test creating a conversation with default title."""
-        mock_service = Mock()
+        mock_service = AsyncMock()
         expected_conv = Conversation(
             id="test-id",
             title="New Conversation",
@@ -71,7 +139,7 @@ class TestCreateConversation:
             created_at=datetime.now(UTC),
             updated_at=datetime.now(UTC),
         )
-        mock_service.create_conversation.return_value = expected_conv
+        mock_service.acreate_conversation.return_value = expected_conv
 
         request = conversations.CreateConversationRequest()
         response = await conversations.create_conversation(
@@ -80,14 +148,14 @@ class TestCreateConversation:
 
         assert response.id == "test-id"
         assert response.title == "New Conversation"
-        mock_service.create_conversation.assert_called_once_with(
+        mock_service.acreate_conversation.assert_awaited_once_with(
             title="New Conversation"
         )
 
     @pytest.mark.asyncio
     async def test_create_conversation_custom_title(self):
         """Test creating a conversation with custom title."""
-        mock_service = Mock()
+        mock_service = AsyncMock()
         expected_conv = Conversation(
             id="test-id",
             title="Custom Title",
@@ -95,7 +163,7 @@ class TestCreateConversation:
             created_at=datetime.now(UTC),
             updated_at=datetime.now(UTC),
         )
-        mock_service.create_conversation.return_value = expected_conv
+        mock_service.acreate_conversation.return_value = expected_conv
 
         request = conversations.CreateConversationRequest(title="Custom Title")
         response = await conversations.create_conversation(
@@ -103,7 +171,7 @@ class TestCreateConversation:
         )
 
         assert response.title == "Custom Title"
-        mock_service.create_conversation.assert_called_once_with(title="Custom Title")
+        mock_service.acreate_conversation.assert_awaited_once_with(title="Custom Title")
 
 
 class TestGetConversation:
@@ -111,8 +179,8 @@ class TestGetConversation:
 
     @pytest.mark.asyncio
     async def test_get_conversation_success(self):
-        """Test getting an existing conversation."""
-        mock_service = Mock()
+        """Test getting an existing conversation returns its cached JSON."""
+        mock_service = AsyncMock()
         expected_conv = Conversation(
             id="test-id",
             title="Test",
@@ -120,21 +188,23 @@ class TestGetConversation:
             created_at=datetime.now(UTC),
             updated_at=datetime.now(UTC),
         )
-        mock_service.get_conversation.return_value = expected_conv
+        mock_service.aget_conversation_json.return_value = (
+            expected_conv.model_dump_json().encode()
+        )
 
         response = await conversations.get_conversation(
             conversation_id="test-id", conversation_service=mock_service
         )
 
-        assert response.id == "test-id"
-        assert response.title == "Test"
-        mock_service.get_conversation.assert_called_once_with("test-id")
+        assert response.media_type == "application/json"
+        assert Conversation.model_validate_json(response.body) == expected_conv
+        mock_service.aget_conversation_json.assert_awaited_once_with("test-id")
 
     @pytest.mark.asyncio
     async def test_get_conversation_not_found(self):
         """Test getting a non-existent conversation."""
-        mock_service = Mock()
-        mock_service.get_conversation.return_value = None
+        mock_service = AsyncMock()
+        mock_service.aget_conversation_json.return_value = None
 
         with pytest.raises(HTTPException) as exc_info:
             await conversations.get_conversation(
@@ -145,6 +215,45 @@ class TestGetConversation:
         assert exc_info.value.detail == "Conversation not found"
 
 
+class TestListMessages:
+    """Tests for list_messages endpoint."""
+
+    @pytest.mark.asyncio
+    async def test_list_messages_success(self):
+        """Test a page of messages is returned from the service."""
+        mock_service = AsyncMock()
+        page = MessageListResponse(
+            messages=[Message(role="user", content="Q")], next_before=3
+        )
+        mock_service.aget_messages.return_value = page
+
+        response = await conversations.list_messages(
+            conversation_id="test-id",
+            before=4,
+            limit=1,
+            include_citation_text=False,
+            conversation_service=mock_service,
+        )
+
+        assert response == page
+        mock_service.aget_messages.assert_awaited_once_with(
+            "test-id", 1, before=4, include_citation_text=False
+        )
+
+    @pytest.mark.asyncio
+    async def test_list_messages_not_found(self):
+        """Test listing messages of a non-existent conversation."""
+        mock_service = AsyncMock()
+        mock_service.aget_messages.return_value = None
+
+        with pytest.raises(HTTPException) as exc_info:
+            await conversations.list_messages(
+                conversation_id="non-existent", conversation_service=mock_service
+            )
+
+        assert exc_info.value.status_code == 404
+
+
 class TestSendMessage:
     """Tests for send_message endpoint."""
 
@@ -152,7 +261,8 @@ class TestSendMessage:
     async def test_send_message_success(self):
         """Test sending a message and getting AI response."""
         mock_conv_service = Mock()
-        mock_qdrant_service = Mock()
+        mock_conv_service.turn.return_value = nullcontext()
+        mock_qdrant_service = AsyncMock()
 
         # Setup conversation
         conv = Conversation(
@@ -162,7 +272,10 @@ class TestSendMessage:
             created_at=datetime.now(UTC),
             updated_at=datetime.now(UTC),
         )
-        mock_conv_service.get_conversation.return_value = conv
+        mock_conv_service.aget_message_count = AsyncMock(return_value=0)
+        mock_conv_service.aget_memory = AsyncMock(return_value=None)
+        mock_conv_service.aget_conversation = AsyncMock(return_value=conv)
+        mock_conv_service.aadd_message = AsyncMock()
 
         # Setup AI response
         from app.models import Citation, Output
@@ -187,16 +300,47 @@ class TestSendMessage:
         assert len(response.citations) == 1
 
         # Verify services were called correctly
-        mock_conv_service.get_conversation.assert_called_once_with("test-id")
-        assert mock_conv_service.add_message.call_count == 2  # User + assistant
+        mock_conv_service.aget_conversation.assert_awaited_once_with("test-id")
+        assert mock_conv_service.aadd_message.await_count == 2  # User + assistant
         mock_qdrant_service.query_with_history.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_send_message_uses_memory_snapshot(self):
+        """Test the history is taken from the conversation memory."""
+        from app.models import Output
+        from app.services import ConversationService
+
+        conv_service = ConversationService()
+        conv = conv_service.create_conversation()
+        conv_service.add_message(conv.id, Message(role="user", content="First"))
+        conv_service.add_message(conv.id, Message(role="assistant", content="Reply"))
+        mock_qdrant_service = AsyncMock()
+        mock_qdrant_service.query_with_history.return_value = Output(
+            query="Second", response="Answer", citations=[]
+        )
+
+        await conversations.send_message(
+            conversation_id=conv.id,
+            request=conversations.SendMessageRequest(message="Second"),
+            conversation_service=conv_service,
+            qdrant_service=mock_qdrant_service,
+        )
+
+        call_args = mock_qdrant_service.query_with_history.call_args
+        assert [m.content for m in call_args.kwargs["memory_messages"]] == [
+            "First",
+            "Reply",
+        ]
+        assert call_args.args[1] is None  # The full history is not loaded
+        assert len(conv_service.get_memory(conv.id)) == 4
+
     @pytest.mark.asyncio
     async def test_send_message_conversation_not_found(self):
         """Test sending message to non-existent conversation."""
         mock_conv_service = Mock()
-        mock_qdrant_service = Mock()
-        mock_conv_service.get_conversation.return_value = None
+        mock_conv_service.turn.return_value = nullcontext()
+        mock_qdrant_service = AsyncMock()
+        mock_conv_service.aget_message_count = AsyncMock(return_value=None)
 
         request = conversations.SendMessageRequest(message="test")
 
@@ -215,7 +359,8 @@ class TestSendMessage:
     async def test_send_message_with_history(self):
         """Test that query_with_history is called with conversation context."""
         mock_conv_service = Mock()
-        mock_qdrant_service = Mock()
+        mock_conv_service.turn.return_value = nullcontext()
+        mock_qdrant_service = AsyncMock()
 
         # Setup conversation with existing messages
         existing_message = Message(
@@ -233,7 +378,10 @@ class TestSendMessage:
             updated_at=datetime.now(UTC),
         )
 
-        mock_conv_service.get_conversation.return_value = conv
+        mock_conv_service.aget_message_count = AsyncMock(return_value=1)
+        mock_conv_service.aget_memory = AsyncMock(return_value=None)
+        mock_conv_service.aget_conversation = AsyncMock(return_value=conv)
+        mock_conv_service.aadd_message = AsyncMock()
 
         from app.models import Output
 
@@ -255,6 +403,257 @@ class TestSendMessage:
         mock_qdrant_service.query_with_history.assert_called_once()
         call_args = mock_qdrant_service.query_with_history.call_args
         assert call_args[0][0] == "follow up"  # Query string should be passed
+        assert call_args[0][1] == [existing_message]  # Earlier messages only
+
+
+class TestSendMessageConcurrency:
+    """Stress tests for concurrent send_message calls."""
+
+    @staticmethod
+    def _slow_qdrant_service(histories: list[int], in_flight: list[int]):
+        """Qdrant service mock recording history lengths and concurrency."""
+        from app.models import Output
+
+        running = 0
+
+        async def query_with_history(query_str, chat_history, **kwargs):
+            nonlocal running
+            running += 1
+            in_flight.append(running)
+            histories.append(len(kwargs["memory_messages"]))
+            await asyncio.sleep(0.01)
+            running -= 1
+            return Output(query=query_str, response="answer", citations=[])
+
+        service = AsyncMock()
+        service.query_with_history.side_effect = query_with_history
+        return service
+
+    @staticmethod
+    async def _send(conv_service, qdrant_service, conversation_id, message):
+        """Send one message through the route."""
+        return await conversations.send_message(
+            conversation_id=conversation_id,
+            request=conversations.SendMessageRequest(message=message),
+            conversation_service=conv_service,
+            qdrant_service=qdrant_service,
+        )
+
+    @pytest.mark.asyncio
+    async def test_concurrent_sends_are_serialized(self, monkeypatch):
+        """Test concurrent sends to one conversation run one turn at a time."""
+        monkeypatch.setattr(
+            "app.api.routes.conversations.settings.conversation_turn_wait_seconds",
+            5.0,
+        )
+        conv_service = ConversationService()
+        conv = conv_service.create_conversation()
+        histories, in_flight = [], []
+        qdrant_service = self._slow_qdrant_service(histories, in_flight)
+
+        await asyncio.gather(
+            *(
+                self._send(conv_service, qdrant_service, conv.id, f"Q{i}")
+                for i in range(20)
+            )
+        )
+
+        # Every turn saw the complete question/answer pairs before it
+        assert histories == list(range(0, 40, 2))
+        assert max(in_flight) == 1
+        messages = conv_service.get_conversation(conv.id).messages
+        assert [m.role for m in messages] == ["user", "assistant"] * 20
+
+    @pytest.mark.asyncio
+    async def test_concurrent_send_rejected_when_busy(self, monkeypatch):
+        """Test sends to a busy conversation are rejected with 409."""
+        monkeypatch.setattr(
+            "app.api.routes.conversations.settings.conversation_turn_wait_seconds",
+            0.0,
+        )
+        conv_service = ConversationService()
+        conv = conv_service.create_conversation()
+        qdrant_service = self._slow_qdrant_service([], [])
+
+        results = await asyncio.gather(
+            *(
+                self._send(conv_service, qdrant_service, conv.id, f"Q{i}")
+                for i in range(10)
+            ),
+            return_exceptions=True,
+        )
+
+        errors = [r for r in results if isinstance(r, HTTPException)]
+        assert len(errors) == 9
+        assert {e.status_code for e in errors} == {409}
+        assert len(conv_service.get_conversation(conv.id).messages) == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_sends_across_workers_conflict(
+        self, monkeypatch, tmp_path
+    ):
+        """Test a turn interleaved by another SQLite worker is rejected with 409."""
+        monkeypatch.setattr(
+            "app.api.routes.conversations.settings.conversation_record_cancelled_turns",
+            False,
+        )
+        db_path = str(tmp_path / "conversations.db")
+        workers = [SQLiteConversationService(db_path) for _ in range(2)]
+        conv = workers[0].create_conversation()
+        qdrant_service = self._slow_qdrant_service([], [])
+
+        try:
+            results = await asyncio.gather(
+                *(
+                    self._send(worker, qdrant_service, conv.id, f"Q{i}")
+                    for i, worker in enumerate(workers)
+                ),
+                return_exceptions=True,
+            )
+            messages = workers[0].get_conversation(conv.id).messages
+        finally:
+            for worker in workers:
+                worker.close()
+
+        errors = [r for r in results if isinstance(r, HTTPException)]
+        assert [e.status_code for e in errors] == [409]
+        assert [m.role for m in messages] == ["user", "assistant"]
+
+    @pytest.mark.asyncio
+    async def test_unrelated_conversations_do_not_contend(self):
+        """Test sends to different conversations run concurrently."""
+        conv_service = ConversationService()
+        ids = [conv_service.create_conversation().id for _ in range(10)]
+        in_flight = []
+        qdrant_service = self._slow_qdrant_service([], in_flight)
+
+        await asyncio.gather(
+            *(self._send(conv_service, qdrant_service, i, "Q") for i in ids)
+        )
+
+        assert max(in_flight) == 10
+        assert len(conv_service._turn_locks) == 0
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("record", [True, False])
+    async def test_disconnect_cancels_turn(self, monkeypatch, record):
+        """Test a client disconnect cancels the turn, keeping it only if set."""
+        monkeypatch.setattr(
+            "app.api.routes.conversations.settings.conversation_record_cancelled_turns",
+            record,
+        )
+        monkeypatch.setattr(
+            "app.api.disconnect.settings.client_disconnect_poll_seconds", 0.01
+        )
+        conv_service = ConversationService()
+        conv = conv_service.create_conversation()
+
+        async def slow_answer(*args, **kwargs):
+            await asyncio.sleep(10)
+
+        qdrant_service = AsyncMock()
+        qdrant_service.query_with_history.side_effect = slow_answer
+        http_request = Mock()
+        http_request.is_disconnected = AsyncMock(side_effect=[False, True])
+
+        with pytest.raises(HTTPException) as exc_info:
+            await conversations.send_message(
+                conversation_id=conv.id,
+                request=conversations.SendMessageRequest(message="Q"),
+                http_request=http_request,
+                conversation_service=conv_service,
+                qdrant_service=qdrant_service,
+            )
+
+        assert exc_info.value.status_code == 499
+        messages = conv_service.get_conversation(conv.id).messages
+        assert [m.content for m in messages] == (["Q"] if record else [])
+        assert len(conv_service._turn_locks) == 0
+
+
+class TestSendMessageIdempotency:
+    """Tests for send_message with an Idempotency-Key header."""
+
+    @staticmethod
+    async def _send(conv_service, qdrant_service, conversation_id, message, key):
+        """Send one message through the route with an idempotency key."""
+        return await conversations.send_message(
+            conversation_id=conversation_id,
+            request=conversations.SendMessageRequest(message=message),
+            idempotency_key=key,
+            conversation_service=conv_service,
+            qdrant_service=qdrant_service,
+        )
+
+    @pytest.mark.asyncio
+    async def test_retries_answered_once(self):
+        """Test in-flight and later retries get the answer of the first send."""
+        conv_service = ConversationService()
+        conv = conv_service.create_conversation()
+        qdrant_service = TestSendMessageConcurrency._slow_qdrant_service([], [])
+
+        concurrent = await asyncio.gather(
+            *(
+                self._send(conv_service, qdrant_service, conv.id, "Q", "k")
+                for _ in range(3)
+            )
+        )
+        later = await self._send(conv_service, qdrant_service, conv.id, "Q", "k")
+
+        assert all(result is concurrent[0] for result in concurrent)
+        assert later is concurrent[0]
+        assert qdrant_service.query_with_history.await_count == 1
+        assert len(conv_service.get_conversation(conv.id).messages) == 2
+        assert conv_service.idempotency.stats()["replays"] == 3
+
+    @pytest.mark.asyncio
+    async def test_retry_on_other_sqlite_worker_replayed(self, tmp_path):
+        """Test a retry reaching another SQLite worker gets the same answer."""
+        db_path = str(tmp_path / "conversations.db")
+        workers = [SQLiteConversationService(db_path) for _ in range(2)]
+        conv = workers[0].create_conversation()
+        qdrant_service = TestSendMessageConcurrency._slow_qdrant_service([], [])
+
+        try:
+            results = [
+                await self._send(worker, qdrant_service, conv.id, "Q", "k")
+                for worker in workers
+            ]
+            messages = workers[1].get_conversation(conv.id).messages
+        finally:
+            for worker in workers:
+                worker.close()
+
+        assert results[1] == results[0]
+        assert qdrant_service.query_with_history.await_count == 1
+        assert [m.role for m in messages] == ["user", "assistant"]
+
+    @pytest.mark.asyncio
+    async def test_key_reused_for_other_message(self):
+        """Test reusing a key for a different message returns 422."""
+        conv_service = ConversationService()
+        conv = conv_service.create_conversation()
+        qdrant_service = TestSendMessageConcurrency._slow_qdrant_service([], [])
+        await self._send(conv_service, qdrant_service, conv.id, "Q", "k")
+
+        with pytest.raises(HTTPException) as exc_info:
+            await self._send(conv_service, qdrant_service, conv.id, "Other", "k")
+
+        assert exc_info.value.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_failed_send_not_replayed(self):
+        """Test a retry after a failed send runs it again."""
+        conv_service = ConversationService()
+
+        with pytest.raises(HTTPException) as exc_info:
+            await self._send(conv_service, AsyncMock(), "missing", "Q", "k")
+        conv = conv_service.create_conversation()
+        qdrant_service = TestSendMessageConcurrency._slow_qdrant_service([], [])
+        result = await self._send(conv_service, qdrant_service, conv.id, "Q", "k")
+
+        assert exc_info.value.status_code == 404
+        assert result.content == "answer"
 
 
 class TestDeleteConversation:
@@ -263,21 +662,21 @@ class TestDeleteConversation:
     @pytest.mark.asyncio
     async def test_delete_conversation_success(self):
         """Test deleting an existing conversation."""
-        mock_service = Mock()
-        mock_service.delete_conversation.return_value = True
+        mock_service = AsyncMock()
+        mock_service.adelete_conversation.return_value = True
 
         response = await conversations.delete_conversation(
             conversation_id="test-id", conversation_service=mock_service
         )
 
         assert response == {"message": "Conversation deleted successfully"}
-        mock_service.delete_conversation.assert_called_once_with("test-id")
+        mock_service.adelete_conversation.assert_awaited_once_with("test-id")
 
     @pytest.mark.asyncio
     async def test_delete_conversation_not_found(self):
         """Test deleting a non-existent conversation."""
-        mock_service = Mock()
-        mock_service.delete_conversation.return_value = False
+        mock_service = AsyncMock()
+        mock_service.adelete_conversation.return_value = False
 
         with pytest.raises(HTTPException) as exc_info:
             await conversations.delete_conversation(
@@ -294,7 +693,7 @@ class TestUpdateConversationTitle:
     @pytest.mark.asyncio
     async def test_update_title_success(self):
         """Test updating a conversation title."""
-        mock_service = Mock()
+        mock_service = AsyncMock()
         updated_conv = Conversation(
             id="test-id",
             title="New Title",
@@ -302,7 +701,7 @@ class TestUpdateConversationTitle:
             created_at=datetime.now(UTC),
             updated_at=datetime.now(UTC),
         )
-        mock_service.update_conversation_title.return_value = updated_conv
+        mock_service.aupdate_conversation_title.return_value = updated_conv
 
         response = await conversations.update_conversation_title(
             conversation_id="test-id",
@@ -311,15 +710,15 @@ class TestUpdateConversationTitle:
         )
 
         assert response.title == "New Title"
-        mock_service.update_conversation_title.assert_called_once_with(
+        mock_service.aupdate_conversation_title.assert_awaited_once_with(
             "test-id", "New Title"
         )
 
     @pytest.mark.asyncio
     async def test_update_title_not_found(self):
         """Test updating title of non-existent conversation."""
-        mock_service = Mock()
-        mock_service.update_conversation_title.return_value = None
+        mock_service = AsyncMock()
+        mock_service.aupdate_conversation_title.return_value = None
 
         with pytest.raises(HTTPException) as exc_info:
             await conversations.update_conversation_title(
@@ -0,0 +1,64 @@
+"""Unit tests for cancelling request work on client disconnect."""
+
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.disconnect import CLIENT_CLOSED_REQUEST, cancel_on_disconnect
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    """Check the connection every few milliseconds."""
+    monkeypatch.setattr(
+        "app.api.disconnect.settings.client_disconnect_poll_seconds", 0.01
+    )
+
+
+def connection(*disconnected: bool):
+    """Request mock reporting the given connection states, then disconnected."""
+    request = Mock()
+    request.is_disconnected = AsyncMock(side_effect=[*disconnected, *[True] * 100])
+    return request
+
+
+class TestCancelOnDisconnect:
+    """Tests for cancel_on_disconnect."""
+
+    async def test_returns_result_while_connected(self):
+        """Test the result of the work is returned to a connected client."""
+
+        async def work():
+            await asyncio.sleep(0.03)
+            return "result"
+
+        result = await cancel_on_disconnect(connection(*[False] * 100), work())
+
+        assert result == "result"
+
+    async def test_work_cancelled_on_disconnect(self):
+        """Test the work is cancelled once the client disconnects."""
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        with pytest.raises(HTTPException) as exc_info:
+            await cancel_on_disconnect(connection(False), work())
+
+        assert exc_info.value.status_code == CLIENT_CLOSED_REQUEST
+        assert cancelled.is_set()
+
+    async def test_without_request(self):
+        """Test work is awaited unwatched when there is no request."""
+
+        async def work():
+            return "result"
+
+        assert await cancel_on_disconnect(None, work()) == "result"
@@ -1,5 +1,13 @@
 """Unit tests for query route."""
 
+import json
+from unittest.mock import Mock
+
+import pytest
+
+from app.api.deps import set_document_storage_service
+from app.models import ScoredCitation
+from app.services import DocumentStorageService
 
 
 class TestQueryRoute:
@@ -89,7 +97,35 @@ class TestQueryRoute:
         query_text = "what happens if I steal"
         client_with_mock_service.get(f"/query?q={query_text}")
 
-        mock_qdrant_service.query.assert_called_once_with(query_text)
+        mock_qdrant_service.query.assert_called_once_with(query_text, budget_ms=None)
+
+    def test_query_latency_budget_header(
+        self, client_with_mock_service, mock_qdrant_service
+    ):
+        """Test the latency budget header is passed to the service."""
+        client_with_mock_service.get(
+            "/query?q=steal", headers={"X-Latency-Budget-Ms": "250"}
+        )
+
+        mock_qdrant_service.query.assert_called_once_with("steal", budget_ms=250)
+
+    def test_query_latency_budget_default(
+        self, client_with_mock_service, mock_qdrant_service, monkeypatch
+    ):
+        """Test the configured latency budget is used without a header."""
+        monkeypatch.setattr("app.api.deps.settings.query_latency_budget_ms", 5000.0)
+
+        client_with_mock_service.get("/query?q=steal")
+
+        mock_qdrant_service.query.assert_called_once_with("steal", budget_ms=5000.0)
+
+    def test_query_invalid_latency_budget(self, client_with_mock_service):
+        """Test a non-positive latency budget is rejected."""
+        response = client_with_mock_service.get(
+            "/query?q=steal", headers={"X-Latency-Budget-Ms": "0"}
+        )
+
+        assert response.status_code == 422
 
     def test_query_url_encoding(self, client_with_mock_service):
         """Test query handles URL encoding correctly."""
@@ -116,3 +152,104 @@ class TestQueryRoute:
 
         assert response.status_code == 200
         assert response.headers["content-type"] == "application/json"
+
+
+class TestBatchQueryRoute:
+    """Tests for /query/batch endpoint."""
+
+    def test_batch_query_streams_ndjson(
+        self, client_with_mock_service, mock_qdrant_service, sample_output
+    ):
+        """Test batch results are streamed as NDJSON lines with their index."""
+
+        async def fake_batch(questions, **kwargs):
+            yield 1, sample_output
+            yield 0, RuntimeError("LLM failed")
+
+        mock_qdrant_service.query_batch = fake_batch
+
+        response = client_with_mock_service.post(
+            "/query/batch", json={"questions": ["first?", "second?"]}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert lines[0]["index"] == 1
+        assert lines[0]["output"]["response"] == sample_output.response
+        assert lines[1] == {"index": 0, "output": None, "error": "LLM failed"}
+
+    def test_batch_query_empty_list(self, client_with_mock_service):
+        """Test an empty question list returns 422."""
+        response = client_with_mock_service.post("/query/batch", json={"questions": []})
+
+        assert response.status_code == 422
+
+    def test_batch_query_empty_question(self, client_with_mock_service):
+        """Test an empty question in the list returns 422."""
+        response = client_with_mock_service.post(
+            "/query/batch", json={"questions": ["valid", ""]}
+        )
+
+        assert response.status_code == 422
+
+    def test_batch_query_too_many_questions(
+        self, client_with_mock_service, monkeypatch
+    ):
+        """Test a batch above the configured maximum returns 422."""
+        monkeypatch.setattr(
+            "app.api.routes.query.settings.query_batch_max_questions", 2
+        )
+
+        response = client_with_mock_service.post(
+            "/query/batch", json={"questions": ["a", "b", "c"]}
+        )
+
+        assert response.status_code == 422
+        assert "exceeds the maximum" in response.json()["detail"]
+
+
+class TestRetrieveRoute:
+    """Tests for /retrieve endpoint."""
+
+    @pytest.fixture
+    def client_with_storage(self, client_with_mock_service):
+        """TestClient with mocked QdrantService and DocumentStorageService."""
+        storage_service = Mock(spec=DocumentStorageService)
+        storage_service.get_document_id_by_section.side_effect = {"1.1": "0"}.get
+        set_document_storage_service(storage_service)
+
+        yield client_with_mock_service
+
+        set_document_storage_service(None)
+
+    def test_retrieve_returns_scored_citations(
+        self, client_with_storage, mock_qdrant_service
+    ):
+        """Test retrieval results carry scores and storage document IDs."""
+        mock_qdrant_service.retrieve.return_value = [
+            ScoredCitation(
+                source="Thievery 1.1",
+                text="Punishment text",
+                score=0.9,
+                section_number="1.1",
+            ),
+            ScoredCitation(source="Unknown Section", text="Other", score=0.5),
+        ]
+
+        response = client_with_storage.get("/retrieve?q=steal&k=2")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["query"] == "steal"
+        assert data["citations"][0]["document_id"] == "0"
+        assert data["citations"][0]["score"] == 0.9
+        assert data["citations"][1]["document_id"] is None
+        mock_qdrant_service.retrieve.assert_called_once_with("steal", k=2)
+        mock_qdrant_service.query.assert_not_called()
+
+    def test_retrieve_invalid_k(self, client_with_storage):
+        """Test k outside the allowed range returns 422."""
+        response = client_with_storage.get("/retrieve?q=steal&k=0")
+
+        assert response.status_code == 422
@@ -0,0 +1,28 @@
+"""Unit tests for stats route."""
+
+from app.api.deps import set_conversation_service
+from app.services import ConversationService
+
+
+class TestStatsRoute:
+    """Tests for /stats endpoint."""
+
+    def test_stats_success(self, client_with_mock_service, mock_qdrant_service):
+        """Test stats returns the query pipeline statistics."""
+        mock_qdrant_service.get_stats.return_value = {
+            "corpus_version": 1,
+            "answer_cache": {"hits": 3, "misses": 1},
+        }
+
+        set_conversation_service(ConversationService())
+
+        try:
+            response = client_with_mock_service.get("/stats")
+        finally:
+            set_conversation_service(None)
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["query"]["answer_cache"]["hits"] == 3
+        assert data["conversations"]["resident_conversations"] == 0
+        mock_qdrant_service.get_stats.assert_called_once()
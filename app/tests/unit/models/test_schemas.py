@@ -391,21 +391,28 @@ class TestConversationModels:
 
     def test_conversation_list_response(self):
         """Test ConversationListResponse."""
-        from app.models import Conversation, ConversationListResponse
+        from app.models import ConversationListResponse, ConversationSummary
 
         conversations = [
-            Conversation(id="1", title="First"),
-            Conversation(id="2", title="Second"),
+            ConversationSummary(
+                id="1", title="First", updated_at=datetime.now(UTC), message_count=2
+            ),
+            ConversationSummary(
+                id="2", title="Second", updated_at=datetime.now(UTC), message_count=0
+            ),
         ]
 
         response = ConversationListResponse(
-            total=2,
+            total=3,
             conversations=conversations,
+            next_cursor="2",
         )
 
-        assert response.total == 2
+        assert response.total == 3
         assert len(response.conversations) == 2
         assert response.conversations[0].id == "1"
+        assert response.conversations[0].last_message_preview is None
+        assert response.next_cursor == "2"
 
     def test_conversation_list_response_empty(self):
         """Test ConversationListResponse with no conversations."""
@@ -0,0 +1,72 @@
+"""Unit tests for AdaptiveTopKPostprocessor."""
+
+from llama_index.core.schema import NodeWithScore, QueryBundle, TextNode
+
+from app.services import AdaptiveTopKPostprocessor
+
+
+def make_nodes(*scores: float) -> list[NodeWithScore]:
+    """Build scored nodes for the given similarity scores."""
+    return [
+        NodeWithScore(node=TextNode(text=f"Node {i}"), score=score)
+        for i, score in enumerate(scores)
+    ]
+
+
+class TestAdaptiveTopKPostprocessor:
+    """Tests for AdaptiveTopKPostprocessor."""
+
+    def test_keeps_nodes_until_sharp_drop(self):
+        """Test the cut is made where the score drops sharply."""
+        postprocessor = AdaptiveTopKPostprocessor(
+            score_floor=0.5, max_relative_drop=0.1
+        )
+        nodes = make_nodes(0.90, 0.88, 0.86, 0.60, 0.59)
+
+        kept = postprocessor.postprocess_nodes(nodes, QueryBundle("test"))
+
+        assert [node.score for node in kept] == [0.90, 0.88, 0.86]
+
+    def test_cuts_below_score_floor(self):
+        """Test nodes below the score floor are dropped."""
+        postprocessor = AdaptiveTopKPostprocessor(
+            score_floor=0.85, max_relative_drop=0.5
+        )
+        nodes = make_nodes(0.90, 0.88, 0.84, 0.83)
+
+        kept = postprocessor.postprocess_nodes(nodes, QueryBundle("test"))
+
+        assert [node.score for node in kept] == [0.90, 0.88]
+
+    def test_keeps_min_k_even_below_floor(self):
+        """Test at least min_k nodes are kept."""
+        postprocessor = AdaptiveTopKPostprocessor(min_k=2, score_floor=0.95)
+        nodes = make_nodes(0.50, 0.40, 0.39)
+
+        kept = postprocessor.postprocess_nodes(nodes, QueryBundle("test"))
+
+        assert len(kept) == 2
+
+    def test_sorts_by_score(self):
+        """Test nodes are ranked by score before cutting."""
+        postprocessor = AdaptiveTopKPostprocessor(score_floor=0.0)
+        nodes = make_nodes(0.70, 0.90, 0.80)
+
+        kept = postprocessor.postprocess_nodes(nodes, QueryBundle("test"))
+
+        assert kept[0].score == 0.90
+
+    def test_empty_nodes(self):
+        """Test an empty retrieval stays empty."""
+        postprocessor = AdaptiveTopKPostprocessor()
+
+        assert postprocessor.postprocess_nodes([], QueryBundle("test")) == []
+
+    def test_logs_chosen_k(self, caplog):
+        """Test the chosen k is logged."""
+        postprocessor = AdaptiveTopKPostprocessor(score_floor=0.5)
+
+        with caplog.at_level("INFO", logger="app.services.adaptive_top_k"):
+            postprocessor.postprocess_nodes(make_nodes(0.9, 0.2), QueryBundle("q"))
+
+        assert "kept 1 of 2" in caplog.text
@@ -0,0 +1,93 @@
+"""Unit tests for SemanticAnswerCache."""
+
+from unittest.mock import patch
+
+from app.models import Output
+from app.services import SemanticAnswerCache
+
+
+def make_output(response: str = "Answer") -> Output:
+    """Build a minimal Output for cache tests."""
+    return Output(query="question", response=response, citations=[])
+
+
+class TestSemanticAnswerCache:
+    """Tests for SemanticAnswerCache."""
+
+    def test_miss_on_empty_cache(self):
+        """Test lookup on an empty cache is a miss."""
+        cache = SemanticAnswerCache()
+
+        assert cache.get([1.0, 0.0], corpus_version=1) is None
+        assert cache.stats()["misses"] == 1
+
+    def test_hit_on_similar_embedding(self):
+        """Test a near-identical embedding returns the cached answer."""
+        cache = SemanticAnswerCache(similarity_threshold=0.95)
+        output = make_output()
+        cache.put([1.0, 0.0], output, corpus_version=1)
+
+        result = cache.get([0.99, 0.05], corpus_version=1)
+
+        assert result is output
+        assert cache.stats()["hits"] == 1
+
+    def test_miss_below_threshold(self):
+        """Test a dissimilar embedding is a miss."""
+        cache = SemanticAnswerCache(similarity_threshold=0.95)
+        cache.put([1.0, 0.0], make_output(), corpus_version=1)
+
+        assert cache.get([0.0, 1.0], corpus_version=1) is None
+
+    def test_returns_most_similar_entry(self):
+        """Test the best match wins when several entries clear the threshold."""
+        cache = SemanticAnswerCache(similarity_threshold=0.5)
+        cache.put([1.0, 0.2], make_output("first"), corpus_version=1)
+        cache.put([1.0, 0.0], make_output("second"), corpus_version=1)
+
+        result = cache.get([1.0, 0.0], corpus_version=1)
+
+        assert result.response == "second"
+
+    def test_lru_eviction(self):
+        """Test the least recently used entry is evicted when full."""
+        cache = SemanticAnswerCache(max_entries=2, similarity_threshold=0.99)
+        cache.put([1.0, 0.0, 0.0], make_output("a"), corpus_version=1)
+        cache.put([0.0, 1.0, 0.0], make_output("b"), corpus_version=1)
+        # Touch "a" so "b" becomes the least recently used entry
+        cache.get([1.0, 0.0, 0.0], corpus_version=1)
+        cache.put([0.0, 0.0, 1.0], make_output("c"), corpus_version=1)
+
+        assert cache.get([0.0, 1.0, 0.0], corpus_version=1) is None
+        assert cache.get([1.0, 0.0, 0.0], corpus_version=1).response == "a"
+        assert cache.stats()["evictions"] == 1
+
+    def test_ttl_expiry(self):
+        """Test expired entries are not returned."""
+        cache = SemanticAnswerCache(ttl_seconds=10)
+        with patch("app.services.answer_cache.time.monotonic", return_value=100.0):
+            cache.put([1.0, 0.0], make_output(), corpus_version=1)
+        with patch("app.services.answer_cache.time.monotonic", return_value=111.0):
+            assert cache.get([1.0, 0.0], corpus_version=1) is None
+
+        assert cache.stats()["entries"] == 0
+
+    def test_corpus_version_change_invalidates(self):
+        """Test entries are dropped when the corpus version changes."""
+        cache = SemanticAnswerCache()
+        cache.put([1.0, 0.0], make_output(), corpus_version=1)
+
+        assert cache.get([1.0, 0.0], corpus_version=2) is None
+        stats = cache.stats()
+        assert stats["entries"] == 0
+        assert stats["invalidations"] == 1
+        assert stats["corpus_version"] == 2
+
+    def test_stats_hit_rate(self):
+        """Test hit rate is computed from hits and misses."""
+        cache = SemanticAnswerCache()
+        cache.put([1.0, 0.0], make_output(), corpus_version=1)
+        cache.get([1.0, 0.0], corpus_version=1)
+        cache.get([0.0, 1.0], corpus_version=1)
+
+        assert cache.stats()["hit_rate"] == 0.5
@@ -0,0 +1,112 @@
+"""Unit tests for CitationCodec."""
+
+import json
+
+import pytest
+from llama_index.core.schema import Document
+
+from app.models import Citation
+from app.services import CitationCodec, DocumentStorageService
+from app.services.citation_refs import citation_text_key
+
+
+@pytest.fixture
+def codec(sample_documents):
+    """CitationCodec over the sample documents."""
+    storage = DocumentStorageService()
+    storage.store_documents(sample_documents)
+    return CitationCodec(storage)
+
+
+class TestCitationCodec:
+    """Tests for CitationCodec."""
+
+    def test_to_ref_finds_labelled_chunk(self, codec, sample_documents):
+        """Test a citation engine chunk is located in its document."""
+        text = sample_documents[0].text
+        citation = Citation(source="Thievery 1.1", text=f"Source 2:\n{text[10:40]}\n")
+
+        ref = codec.to_ref(citation)
+
+        assert ref.document_id == "0"
+        assert (ref.start, ref.end) == (10, 40)
+        assert (ref.prefix, ref.suffix) == ("Source 2:\n", "\n")
+        assert codec.resolve(ref) == citation
+
+    @pytest.mark.parametrize(
+        "citation",
+        [
+            Citation(source="Unknown Section", text="Some text"),
+            Citation(source="Thievery 1.1", text="Text that is not in the law"),
+        ],
+    )
+    def test_to_ref_unknown_text(self, codec, citation):
+        """Test citations not found in storage have no reference."""
+        assert codec.to_ref(citation) is None
+        assert codec.dedupe(citation) is citation
+
+    def test_dedupe_shares_one_citation(self, codec, sample_documents):
+        """Test equal citations are replaced by one shared instance."""
+        text = sample_documents[1].text
+
+        first = codec.dedupe(Citation(source="Thievery 1.2", text=text))
+        second = codec.dedupe(Citation(source="Thievery 1.2", text=text))
+
+        assert first is second
+        assert codec.is_shared(first)
+        assert codec.dedupe(first) is first
+
+    def test_dumps_and_loads(self, codec, sample_documents):
+        """Test citations round-trip through references to their stored texts."""
+        citations = [
+            Citation(source="Thievery 1.1", text=sample_documents[0].text),
+            Citation(source="Unknown Section", text="Kept as is"),
+        ]
+
+        data, texts = codec.dumps(citations)
+
+        items = json.loads(data)
+        assert items == [
+            {"source": c.source, "text_key": citation_text_key(c.text)}
+            for c in citations
+        ]
+        assert sorted(texts.values()) == sorted(c.text for c in citations)
+        loaded = codec.loads(data, lambda keys: {k: texts[k] for k in keys})
+        assert loaded == citations
+        assert codec.is_shared(loaded[0])
+        assert not codec.is_shared(loaded[1])
+
+    def test_loads_reads_shared_texts_once(self, codec, sample_documents):
+        """Test texts of already shared citations are not read again."""
+        citation = Citation(source="Thievery 1.1", text=sample_documents[0].text)
+        data, texts = codec.dumps([citation])
+        reads = []
+
+        def read_texts(keys):
+            reads.append(keys)
+            return {k: texts[k] for k in keys}
+
+        first = codec.loads(data, read_texts)
+        second = codec.loads(data, read_texts)
+
+        assert first[0] is second[0]
+        assert len(reads) == 1
+
+    def test_loads_after_corpus_changed(self, codec, sample_documents):
+        """Test citations keep their stored text when the corpus changed."""
+        citation = Citation(source="Thievery 1.1", text=sample_documents[0].text)
+        data, texts = codec.dumps([citation])
+        changed = [
+            Document(text="Cleaned up differently", metadata=doc.metadata)
+            for doc in sample_documents
+        ]
+        storage = DocumentStorageService()
+        storage.store_documents(changed)
+
+        assert CitationCodec(storage).loads(data, lambda keys: texts) == [citation]
+
+    def test_loads_plain_citations(self, codec):
+        """Test citations stored without the codec still load."""
+        data = json.dumps([{"source": "Law 1.1", "text": "Text"}])
+
+        assert codec.loads(data, dict) == [Citation(source="Law 1.1", text="Text")]
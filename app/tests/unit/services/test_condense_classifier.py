@@ -0,0 +1,61 @@
+"""Unit tests for the condensation heuristic."""
+
+import pytest
+
+from app.services import needs_condensation, new_content_words
+
+
+class TestNeedsCondensation:
+    """Tests for needs_condensation."""
+
+    @pytest.mark.parametrize(
+        "question",
+        [
+            "What happens if I steal from a sept?",
+            "How is inheritance divided among sons?",
+            "What is the punishment for theft in the Seven Kingdoms?",
+        ],
+    )
+    def test_standalone_questions(self, question):
+        """Test self-contained questions skip condensation."""
+        assert needs_condensation(question) is False
+
+    @pytest.mark.parametrize(
+        "question",
+        [
+            "Why?",
+            "And for a wife?",
+            "What about nobles in the North?",
+            "What does that mean for my brother?",
+            "Does it apply to knights as well?",
+            "What else applies to thieves?",
+        ],
+    )
+    def test_follow_ups_needing_context(self, question):
+        """Test fragments, ellipsis and anaphora are condensed."""
+        assert needs_condensation(question) is True
+
+    def test_min_words(self):
+        """Test questions shorter than min_words are treated as fragments."""
+        assert needs_condensation("Punishment for theft?", min_words=4) is True
+        assert needs_condensation("Punishment for theft?", min_words=3) is False
+
+
+class TestNewContentWords:
+    """Tests for new_content_words."""
+
+    def test_resolved_referent_is_new(self):
+        """Test a rewrite resolving a pronoun adds the referent."""
+        assert new_content_words(
+            "Is it punished by death?", "Is theft punished by death?"
+        ) == {"theft"}
+
+    def test_rephrasing_adds_nothing(self):
+        """Test reordering and function words add no content word."""
+        assert (
+            new_content_words(
+                "And then what happens to the thief?",
+                "What happens to the thief then?",
+            )
+            == set()
+        )
@@ -0,0 +1,106 @@
+"""Unit tests for ConversationMemory."""
+
+from llama_index.core.llms import MessageRole
+
+from app.models import Message
+from app.services import ConversationMemory
+
+
+class TestConversationMemory:
+    """Tests for ConversationMemory."""
+
+    def test_append_converts_messages(self):
+        """Test messages are kept as chat messages in order."""
+        memory = ConversationMemory()
+        memory.append(Message(role="user", content="What if I steal?"))
+        memory.append(Message(role="assistant", content="You lose a hand."))
+
+        messages = memory.get()
+
+        assert [m.role for m in messages] == [MessageRole.USER, MessageRole.ASSISTANT]
+        assert messages[1].content == "You lose a hand."
+        assert memory.total_tokens > 0
+
+    def test_unknown_roles_are_ignored(self):
+        """Test messages that are neither user nor assistant are skipped."""
+        memory = ConversationMemory()
+        memory.append(Message(role="system", content="Ignored"))
+
+        assert len(memory) == 0
+
+    def test_oldest_messages_dropped_over_limit(self):
+        """Test the window keeps only the latest messages within the limit."""
+        memory = ConversationMemory(token_limit=20)
+        for turn in range(10):
+            memory.append(Message(role="user", content=f"question number {turn}"))
+            memory.append(Message(role="assistant", content=f"answer number {turn}"))
+
+        messages = memory.get()
+
+        assert memory.total_tokens <= 20
+        assert messages[-1].content == "answer number 9"
+        assert messages[0].role == MessageRole.USER
+        assert "question number 0" not in [m.content for m in messages]
+
+    def test_total_tokens_tracks_window(self):
+        """Test the token count is kept in sync as messages are dropped."""
+        memory = ConversationMemory(token_limit=20)
+        for turn in range(10):
+            memory.append(Message(role="user", content=f"question number {turn}"))
+
+        recount = ConversationMemory(token_limit=1000)
+        for message in memory.get():
+            recount.append(Message(role="user", content=message.content))
+        assert memory.total_tokens == recount.total_tokens
+
+    def test_single_message_over_limit_is_kept(self):
+        """Test the latest message is kept even if it exceeds the limit."""
+        memory = ConversationMemory(token_limit=1)
+        memory.append(Message(role="user", content="a long question " * 10))
+
+        assert len(memory) == 1
+
+    def test_recent_messages_window(self):
+        """Test only the latest messages are kept when summarizing."""
+        memory = ConversationMemory(recent_messages=2)
+        for turn in range(3):
+            memory.append(Message(role="user", content=f"question {turn}"))
+            memory.append(Message(role="assistant", content=f"answer {turn}"))
+
+        assert [m.content for m in memory.get()] == ["question 2", "answer 2"]
+        assert memory.has_unsummarized
+        dropped = memory.take_unsummarized()
+        assert [m.content for m in dropped][:2] == ["question 0", "answer 0"]
+        assert not memory.has_unsummarized
+
+    def test_dropped_messages_not_kept_without_summary(self):
+        """Test messages leaving the window are discarded by default."""
+        memory = ConversationMemory(token_limit=5)
+        for turn in range(5):
+            memory.append(Message(role="user", content=f"question number {turn}"))
+
+        assert not memory.has_unsummarized
+
+    def test_summary_returned_ahead_of_window(self):
+        """Test the summary is returned as a system message before the window."""
+        memory = ConversationMemory(recent_messages=2)
+        memory.append(Message(role="user", content="Latest"))
+        memory.summary = "The user asked about theft."
+
+        messages = memory.get()
+
+        assert messages[0].role == MessageRole.SYSTEM
+        assert "The user asked about theft." in messages[0].content
+        assert messages[1].content == "Latest"
+
+    def test_restore_unsummarized(self):
+        """Test messages can be put back ahead of newer ones."""
+        memory = ConversationMemory(recent_messages=1)
+        memory.append(Message(role="user", content="one"))
+        memory.append(Message(role="user", content="two"))
+        taken = memory.take_unsummarized()
+        memory.append(Message(role="user", content="three"))
+
+        memory.restore_unsummarized(taken)
+
+        assert [m.content for m in memory.take_unsummarized()] == ["one", "two"]
@@ -1,9 +1,18 @@
 """Unit tests for ConversationService."""
 
+import asyncio
+import json
 from datetime import UTC, datetime
 
-from app.models import Message
-from app.services import ConversationService
+import pytest
+
+from app.models import Citation, Message
+from app.services import (
+    CitationCodec,
+    ConversationBusy,
+    ConversationService,
+    DocumentStorageService,
+)
 
 
 class TestConversationService:
@@ -90,6 +99,162 @@ class TestConversationService:
         assert conversations[0].id == conv1.id
         assert conversations[1].id == conv2.id
 
+    def test_get_conversation_summaries_pages(self):
+        """Test summaries are paged by most recent update with a cursor."""
+        service = ConversationService()
+        conversations = [service.create_conversation(f"C{i}") for i in range(5)]
+        service.add_message(
+            conversations[1].id, Message(role="user", content="x" * 150)
+        )
+
+        first = service.get_conversation_summaries(limit=2)
+        second = service.get_conversation_summaries(limit=2, cursor=first.next_cursor)
+        last = service.get_conversation_summaries(limit=2, cursor=second.next_cursor)
+
+        assert first.total == 5
+        assert [c.title for c in first.conversations] == ["C1", "C4"]
+        assert first.conversations[0].message_count == 1
+        assert first.conversations[0].last_message_preview == "x" * 100 + "..."
+        assert first.conversations[1].last_message_preview is None
+        assert [c.title for c in second.conversations] == ["C3", "C2"]
+        assert [c.title for c in last.conversations] == ["C0"]
+        assert last.next_cursor is None
+
+    def test_get_conversation_summaries_after_delete(self):
+        """Test deleted conversations leave the summary list."""
+        service = ConversationService()
+        first = service.create_conversation("First")
+        service.create_conversation("Second")
+        service.delete_conversation(first.id)
+
+        page = service.get_conversation_summaries(limit=10)
+
+        assert [c.title for c in page.conversations] == ["Second"]
+
+    def test_get_conversation_summaries_invalid_cursor(self):
+        """Test a malformed cursor raises ValueError."""
+        service = ConversationService()
+
+        with pytest.raises(ValueError):
+            service.get_conversation_summaries(limit=10, cursor="not-a-cursor")
+
+    def test_get_messages_pages_backwards(self):
+        """Test messages are paged from the latest with a position cursor."""
+        service = ConversationService()
+        conversation = service.create_conversation()
+        for i in range(5):
+            service.add_message(conversation.id, Message(role="user", content=f"M{i}"))
+
+        latest = service.get_messages(conversation.id, limit=2)
+        older = service.get_messages(
+            conversation.id, limit=2, before=latest.next_before
+        )
+        oldest = service.get_messages(
+            conversation.id, limit=2, before=older.next_before
+        )
+
+        assert [m.content for m in latest.messages] == ["M3", "M4"]
+        assert [m.content for m in older.messages] == ["M1", "M2"]
+        assert [m.content for m in oldest.messages] == ["M0"]
+        assert oldest.next_before is None
+
+    def test_get_messages_without_citation_text(self):
+        """Test citation texts can be left out of the page."""
+        service = ConversationService()
+        conversation = service.create_conversation()
+        service.add_message(
+            conversation.id,
+            Message(
+                role="assistant",
+                content="A",
+                citations=[Citation(source="Law 1.1", text="Full text")],
+            ),
+        )
+
+        page = service.get_messages(
+            conversation.id, limit=10, include_citation_text=False
+        )
+
+        assert page.messages[0].citations[0].source == "Law 1.1"
+        assert page.messages[0].citations[0].text == ""
+        # The stored message keeps its citation text
+        assert conversation.messages[0].citations[0].text == "Full text"
+
+    def test_get_messages_conversation_not_found(self):
+        """Test getting messages of a non-existent conversation."""
+        service = ConversationService()
+
+        assert service.get_messages("non-existent-id", limit=10) is None
+
+    async def test_turn_rejects_busy_conversation(self):
+        """Test a second turn of a conversation waits, then gives up."""
+        service = ConversationService()
+
+        async with service.turn("conversation"):
+            with pytest.raises(ConversationBusy):
+                async with service.turn("conversation"):
+                    pass
+            with pytest.raises(ConversationBusy):
+                async with service.turn("conversation", wait_seconds=0.01):
+                    pass
+            # Other conversations are not held up
+            async with service.turn("other"):
+                pass
+
+        # The conversation can be held again once the turn is over
+        async with service.turn("conversation"):
+            pass
+
+    def test_citations_shared_between_messages(self, sample_documents):
+        """Test messages citing the same text share one citation."""
+        storage = DocumentStorageService()
+        storage.store_documents(sample_documents)
+        service = ConversationService(citation_codec=CitationCodec(storage))
+        conversation = service.create_conversation()
+        text = sample_documents[0].text
+
+        for _ in range(2):
+            service.add_message(
+                conversation.id,
+                Message(
+                    role="assistant",
+                    content="A",
+                    citations=[Citation(source="Thievery 1.1", text=text)],
+                ),
+            )
+
+        first, second = service.get_conversation(conversation.id).messages
+        assert first.citations[0] is second.citations[0]
+        assert first.citations[0].text == text
+
+    def test_get_conversation_json_matches_model(self, sample_documents):
+        """Test the cached JSON equals the serialized conversation."""
+        storage = DocumentStorageService()
+        storage.store_documents(sample_documents)
+        service = ConversationService(citation_codec=CitationCodec(storage))
+        conversation = service.create_conversation()
+        service.add_message(conversation.id, Message(role="user", content='Q "1"'))
+        service.add_message(
+            conversation.id,
+            Message(
+                role="assistant",
+                content="A",
+                citations=[
+                    Citation(source="Thievery 1.1", text=sample_documents[0].text),
+                    Citation(source="Unknown Section", text="Other"),
+                ],
+            ),
+        )
+        json_before = service.get_conversation_json(conversation.id)
+        service.add_message(conversation.id, Message(role="user", content="Q2"))
+
+        content = service.get_conversation_json(conversation.id)
+
+        expected = service.get_conversation(conversation.id)
+        assert json.loads(content) == json.loads(expected.model_dump_json())
+        assert len(json.loads(json_before)["messages"]) == 2
+        assert service.get_conversation_json("missing") is None
+
     def test_add_message_success(self):
         """Test adding a message to a conversation."""
         service = ConversationService()
@@ -122,6 +287,25 @@ class TestConversationService:
 
         assert result is None
 
+    def test_add_message_expected_count(self):
+        """Test an append expecting another message count is rejected."""
+        service = ConversationService()
+        conversation = service.create_conversation()
+        service.add_message(conversation.id, Message(role="user", content="Q"))
+
+        with pytest.raises(ConversationBusy):
+            service.add_message(
+                conversation.id,
+                Message(role="assistant", content="A"),
+                expected_count=0,
+            )
+        service.add_message(
+            conversation.id, Message(role="assistant", content="A"), expected_count=1
+        )
+
+        assert service.get_message_count(conversation.id) == 2
+        assert service.get_message_count("missing") is None
+
     def test_add_message_updates_timestamp(self):
         """Test that adding a message updates the conversation timestamp."""
         service = ConversationService()
@@ -263,3 +447,362 @@ class TestConversationService:
         assert len(result.messages) == 2
         assert result.messages[0].role == "user"
         assert result.messages[1].role == "assistant"
+
+    def test_memory_updated_with_messages(self):
+        """Test the conversation memory is updated as messages are added."""
+        service = ConversationService()
+        conversation = service.create_conversation()
+
+        service.add_message(conversation.id, Message(role="user", content="Question"))
+        service.add_message(
+            conversation.id, Message(role="assistant", content="Answer")
+        )
+
+        memory = service.get_memory(conversation.id)
+        assert [m.content for m in memory.get()] == ["Question", "Answer"]
+
+    def test_memory_evicted_with_conversation(self):
+        """Test deleting a conversation drops its memory."""
+        service = ConversationService()
+        conversation = service.create_conversation()
+
+        service.delete_conversation(conversation.id)
+
+        assert service.get_memory(conversation.id) is None
+
+    async def test_rolling_summary_updated_after_assistant_message(self, monkeypatch):
+        """Test turns leaving the window are summarized in the background."""
+        monkeypatch.setattr(
+            "app.services.conversation_service.app_settings.conversation_memory_recent_messages",
+            2,
+        )
+        calls = []
+
+        async def summarizer(summary, messages):
+            calls.append((summary, [m.content for m in messages]))
+            return f"{summary}+{len(messages)}"
+
+        service = ConversationService(summarizer=summarizer)
+        conversation = service.create_conversation()
+        for turn in range(2):
+            service.add_message(
+                conversation.id, Message(role="user", content=f"Q{turn}")
+            )
+            service.add_message(
+                conversation.id, Message(role="assistant", content=f"A{turn}")
+            )
+            await service.wait_for_summaries()
+
+        memory = service.get_memory(conversation.id)
+        assert calls == [("", ["Q0", "A0"])]
+        assert memory.summary == "+2"
+        assert [m.content for m in memory.get()][1:] == ["Q1", "A1"]
+
+    async def test_failed_summary_keeps_messages(self, monkeypatch):
+        """Test messages are kept for the next update when summarizing fails."""
+        monkeypatch.setattr(
+            "app.services.conversation_service.app_settings.conversation_memory_recent_messages",
+            1,
+        )
+
+        async def summarizer(summary, messages):
+            raise RuntimeError("LLM down")
+
+        service = ConversationService(summarizer=summarizer)
+        conversation = service.create_conversation()
+        service.add_message(conversation.id, Message(role="user", content="Q"))
+        service.add_message(conversation.id, Message(role="assistant", content="A"))
+        await service.wait_for_summaries()
+
+        memory = service.get_memory(conversation.id)
+        assert memory.summary == ""
+        assert memory.has_unsummarized
+
+    def test_no_summary_without_event_loop(self):
+        """Test adding messages outside an event loop does not summarize."""
+        service = ConversationService(summarizer=lambda summary, messages: None)
+        conversation = service.create_conversation()
+        for _ in range(10):
+            service.add_message(conversation.id, Message(role="user", content="Q"))
+            service.add_message(conversation.id, Message(role="assistant", content="A"))
+
+        assert service.get_memory(conversation.id).has_unsummarized
+
+
+class TestConversationChanges:
+    """Tests for polling conversation changes."""
+
+    def test_changes_since_cursor(self):
+        """Test only conversations and messages changed after the cursor return."""
+        service = ConversationService()
+        first = service.create_conversation("First")
+        second = service.create_conversation("Second")
+        third = service.create_conversation("Third")
+        service.add_message(first.id, Message(role="user", content="Old"))
+        cursor = service.get_changes().cursor
+
+        service.add_message(first.id, Message(role="user", content="New"))
+        service.update_conversation_title(third.id, "Renamed")
+        service.delete_conversation(second.id)
+        changes = service.get_changes(cursor)
+
+        assert [c.title for c in changes.conversations] == ["Renamed", "First"]
+        assert list(changes.messages) == [first.id]
+        assert [m.content for m in changes.messages[first.id]] == ["New"]
+        assert changes.deleted == [second.id]
+        assert changes.reset is False
+
+    def test_no_changes_keeps_cursor(self):
+        """Test polling without changes returns nothing and the same cursor."""
+        service = ConversationService()
+        service.create_conversation()
+        cursor = service.get_changes().cursor
+
+        changes = service.get_changes(cursor)
+
+        assert changes.cursor == cursor
+        assert changes.conversations == []
+        assert changes.messages == {}
+        assert changes.deleted == []
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor raises ValueError."""
+        with pytest.raises(ValueError):
+            ConversationService().get_changes("not-a-cursor")
+
+    def test_reset_when_cursor_unknown(self, monkeypatch):
+        """Test cursors older than the kept deletions or from elsewhere reset."""
+        monkeypatch.setattr(
+            "app.services.conversation_service.app_settings.conversation_change_tombstones",
+            1,
+        )
+        service = ConversationService()
+        conversations = [service.create_conversation() for _ in range(3)]
+        cursor = service.get_changes().cursor
+        service.delete_conversation(conversations[0].id)
+        service.delete_conversation(conversations[1].id)
+
+        assert service.get_changes(cursor).reset is True
+        assert service.get_changes("1000").reset is True
+        assert service.get_changes(service.get_changes().cursor).reset is False
+
+    async def test_no_cursor_returns_only_the_cursor(self, monkeypatch):
+        """Test a poll without a cursor gets the current cursor and no data."""
+        monkeypatch.setattr(
+            "app.services.conversation_service.app_settings.conversation_change_tombstones",
+            1,
+        )
+        service = ConversationService()
+        conversations = [service.create_conversation() for _ in range(3)]
+        service.add_message(conversations[2].id, Message(role="user", content="Q"))
+        service.delete_conversation(conversations[0].id)
+        service.delete_conversation(conversations[1].id)
+
+        changes = service.get_changes()
+        waited = await service.wait_for_changes(None, timeout=5)
+
+        assert changes.cursor == str(service._version)
+        assert changes.conversations == []
+        assert changes.messages == {}
+        assert changes.deleted == []
+        assert changes.reset is False
+        assert waited == changes
+
+    async def test_wait_for_changes_wakes_on_change(self):
+        """Test a waiting poll returns as soon as a conversation changes."""
+        service = ConversationService()
+        conversation = service.create_conversation()
+        cursor = service.get_changes().cursor
+
+        poll = asyncio.create_task(service.wait_for_changes(cursor, timeout=5))
+        await asyncio.sleep(0)
+        service.add_message(conversation.id, Message(role="user", content="Q"))
+        changes = await asyncio.wait_for(poll, timeout=1)
+
+        assert [m.content for m in changes.messages[conversation.id]] == ["Q"]
+
+    async def test_wait_for_changes_times_out(self):
+        """Test a poll without changes returns empty after the timeout."""
+        service = ConversationService()
+        service.create_conversation()
+        cursor = service.get_changes().cursor
+
+        changes = await service.wait_for_changes(cursor, timeout=0.01)
+
+        assert changes.cursor == cursor
+        assert changes.conversations == []
+
+
+class TestConversationMemoryBudget:
+    """Tests for spilling conversations to disk under a memory budget."""
+
+    @pytest.fixture
+    def service(self, tmp_path):
+        """ConversationService holding about two conversations in memory."""
+        service = ConversationService(
+            memory_budget_bytes=13000, spill_path=str(tmp_path)
+        )
+        yield service
+        service.close()
+
+    @staticmethod
+    def _fill(service, title):
+        """Create a conversation with one question and a cited answer."""
+        conversation = service.create_conversation(title)
+        service.add_message(conversation.id, Message(role="user", content="Q" * 500))
+        service.add_message(
+            conversation.id,
+            Message(
+                role="assistant",
+                content="A" * 500,
+                citations=[Citation(source="Law 1.1", text="T" * 1000)],
+            ),
+        )
+        return conversation
+
+    def test_least_recently_used_conversation_spilled(self, service):
+        """Test going over budget spills the least recently used conversation."""
+        first = self._fill(service, "First")
+        second = self._fill(service, "Second")
+        service.get_conversation(first.id)
+        third = self._fill(service, "Third")
+
+        assert list(service.conversations) == [first.id, third.id]
+        assert service.stats()["spilled_conversations"] == 1
+        assert service.stats()["evictions"] == 1
+        assert service.resident_bytes <= service.memory_budget_bytes
+        assert second.id not in service.conversations
+
+    def test_spilled_conversation_rehydrated_on_access(self, service):
+        """Test a spilled conversation is loaded back intact when accessed."""
+        first = self._fill(service, "First")
+        self._fill(service, "Second")
+        self._fill(service, "Third")
+
+        retrieved = service.get_conversation(first.id)
+
+        assert retrieved.title == "First"
+        assert retrieved.messages[1].citations[0].text == "T" * 1000
+        assert [m.content[0] for m in service.get_memory(first.id).get()] == [
+            "Q",
+            "A",
+        ]
+        stats = service.stats()
+        assert stats["rehydrations"] == 1
+        assert stats["resident_conversations"] == 2
+
+    def test_spilled_citation_texts_stored_once(self, tmp_path, sample_documents):
+        """Test spilled messages reference cited texts written to disk once."""
+        storage = DocumentStorageService()
+        storage.store_documents(sample_documents)
+        service = ConversationService(
+            memory_budget_bytes=1,
+            spill_path=str(tmp_path),
+            citation_codec=CitationCodec(storage),
+        )
+        citation = Citation(source="Thievery 1.1", text=sample_documents[0].text)
+        conversations = [service.create_conversation(f"C{i}") for i in range(3)]
+        for conversation in conversations:
+            service.add_message(
+                conversation.id,
+                Message(role="assistant", content="A", citations=[citation]),
+            )
+        spilled = [c.id for c in conversations if c.id in service._spilled]
+
+        blobs = [service._spill_store.read(c) for c in spilled]
+        restored = [service.get_conversation(c).messages[0] for c in spilled]
+        service.close()
+
+        assert len(spilled) >= 2
+        assert all(citation.text.encode() not in blob for blob in blobs)
+        assert restored[0].citations == [citation]
+        assert restored[0].citations[0] is restored[1].citations[0]
+
+    def test_message_versions_spilled_with_conversation(self, service):
+        """Test message versions leave memory with a spilled conversation."""
+        first = self._fill(service, "First")
+        cursor = service.get_changes().cursor
+        service.add_message(first.id, Message(role="user", content="New"))
+        self._fill(service, "Second")
+        self._fill(service, "Third")
+
+        assert first.id in service._spilled
+        assert first.id not in service._message_sequences
+        changes = service.get_changes(cursor)
+        assert [m.content for m in changes.messages[first.id]] == ["New"]
+
+        service.get_conversation(first.id)
+        assert len(service._message_sequences[first.id]) == 3
+        changes = service.get_changes(cursor)
+        assert [m.content for m in changes.messages[first.id]] == ["New"]
+
+    def test_cached_citation_json_counted(self, sample_documents):
+        """Test citation JSON cached for shared citations counts as resident."""
+        storage = DocumentStorageService()
+        storage.store_documents(sample_documents)
+        service = ConversationService(citation_codec=CitationCodec(storage))
+        conversation = service.create_conversation()
+        citation = Citation(source="Thievery 1.1", text=sample_documents[0].text)
+        service.add_message(
+            conversation.id,
+            Message(role="assistant", content="A", citations=[citation]),
+        )
+        before = service.resident_bytes
+
+        service.get_conversation_json(conversation.id)
+        service.get_conversation_json(conversation.id)
+
+        assert service.resident_bytes == before + len(citation.model_dump_json())
+
+    def test_summaries_listed_without_rehydration(self, service):
+        """Test spilled conversations are listed from their saved summary."""
+        conversations = [self._fill(service, f"C{i}") for i in range(4)]
+
+        page = service.get_conversation_summaries(limit=10)
+
+        assert page.total == 4
+        assert [c.title for c in page.conversations] == ["C3", "C2", "C1", "C0"]
+        assert page.conversations[3].message_count == 2
+        assert service.rehydrations == 0
+        assert [c.id for c in service.get_all_conversations()] == [
+            c.id for c in reversed(conversations)
+        ]
+        assert service.rehydrations == 0
+
+    def test_delete_spilled_conversation(self, service):
+        """Test deleting a spilled conversation removes it from disk."""
+        first = self._fill(service, "First")
+        self._fill(service, "Second")
+        self._fill(service, "Third")
+
+        assert service.delete_conversation(first.id) is True
+        assert service.get_conversation(first.id) is None
+        assert service.stats()["spilled_bytes_on_disk"] == 0
+
+    async def test_busy_conversation_not_spilled(self, service):
+        """Test a conversation with a turn in progress stays in memory."""
+        first = self._fill(service, "First")
+        async with service.turn(first.id):
+            self._fill(service, "Second")
+            self._fill(service, "Third")
+
+            assert first.id in service.conversations
+
+    def test_memory_stays_flat(self, service):
+        """Test resident memory stays within budget as conversations pile up."""
+        for i in range(50):
+            self._fill(service, f"C{i}")
+
+        stats = service.stats()
+        assert stats["resident_bytes"] <= service.memory_budget_bytes
+        assert stats["resident_conversations"] + stats["spilled_conversations"] == 50
+
+    def test_changes_include_spilled_conversations(self, service):
+        """Test changes of spilled conversations are read without loading them."""
+        conversations = [self._fill(service, f"C{i}") for i in range(3)]
+
+        changes = service.get_changes("0")
+
+        assert {c.id for c in changes.conversations} == {c.id for c in conversations}
+        assert all(len(changes.messages[c.id]) == 2 for c in conversations)
+        assert service.rehydrations == 0
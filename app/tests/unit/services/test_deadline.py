@@ -0,0 +1,48 @@
+"""Unit tests for latency budgets."""
+
+import asyncio
+
+import pytest
+
+from app.services import Deadline, DeadlineExceeded
+from app.services.deadline import within
+
+
+class TestDeadline:
+    """Tests for Deadline and within."""
+
+    def test_from_budget_ms(self):
+        """Test a deadline is started from a budget in milliseconds."""
+        deadline = Deadline.from_budget_ms(500)
+
+        assert deadline.budget_seconds == 0.5
+        assert 0 < deadline.remaining() <= 0.5
+        assert not deadline.expired
+
+    def test_from_budget_ms_none(self):
+        """Test no deadline is created without a budget."""
+        assert Deadline.from_budget_ms(None) is None
+
+    async def test_within_returns_result(self):
+        """Test the result is returned when the awaitable is on time."""
+        assert await within(Deadline(1), asyncio.sleep(0, result="done")) == "done"
+
+    async def test_within_without_deadline(self):
+        """Test awaitables run unbounded without a deadline."""
+        assert await within(None, asyncio.sleep(0, result="done")) == "done"
+
+    async def test_within_raises_when_exceeded(self):
+        """Test DeadlineExceeded is raised once the budget runs out."""
+        with pytest.raises(DeadlineExceeded):
+            await within(Deadline(0.01), asyncio.sleep(1))
+
+    async def test_within_keeps_own_timeouts(self):
+        """Test a TimeoutError raised by the awaitable is not a deadline miss."""
+
+        async def timeout():
+            raise TimeoutError()
+
+        with pytest.raises(TimeoutError) as exc_info:
+            await within(Deadline(1), timeout())
+
+        assert not isinstance(exc_info.value, DeadlineExceeded)
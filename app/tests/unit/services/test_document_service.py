@@ -1,7 +1,9 @@
 """Unit tests for DocumentService."""
 
 
-from app.services import DocumentService
+from llama_index.core.llms import MockLLM
+
+from app.services import CircuitBreaker, DocumentService, ResilientLLM
 
 
 class TestDocumentService:
@@ -85,6 +87,20 @@ class TestDocumentService:
             assert hasattr(docs[0], "metadata")
             assert hasattr(docs[0], "text")
 
+    def test_create_documents_records_source_version(
+        self, mock_pdf_reader, temp_pdf_file
+    ):
+        """Test the source version is a hash of the PDF bytes."""
+        service = DocumentService(temp_pdf_file)
+        mock_pdf_reader.pages[0].extract_text.return_value = ""
+
+        service.create_documents()
+        other = DocumentService(temp_pdf_file)
+        other.create_documents()
+
+        assert service.source_version
+        assert service.source_version == other.source_version
+
     def test_create_documents_empty_sections(self, mock_pdf_reader, temp_pdf_file):
         """Test create_documents filters empty sections."""
         service = DocumentService(temp_pdf_file)
@@ -121,3 +137,24 @@ class TestDocumentService:
             assert "Section" in doc.metadata
             assert "MainSection" in doc.metadata
             assert "SubsectionNumber" in doc.metadata
+
+    def test_improve_text_with_llm(self):
+        """Test text is corrected through the resilient LLM."""
+        service = DocumentService("test.pdf")
+        service.text_llm = ResilientLLM(llm=MockLLM(max_tokens=2))
+
+        result = service._improve_text_with_llm("Some long enough text")
+
+        assert result == "text text"
+        assert service.text_llm.stats()["requests"] == 1
+
+    def test_improve_text_with_llm_falls_back_on_error(self):
+        """Test the original text is kept when the LLM call fails."""
+        service = DocumentService("test.pdf")
+        breaker = CircuitBreaker(min_calls=1)
+        breaker.record_failure()
+        service.text_llm = ResilientLLM(llm=MockLLM(), breaker=breaker)
+
+        result = service._improve_text_with_llm("Some long enough text")
+
+        assert result == "Some long enough text"
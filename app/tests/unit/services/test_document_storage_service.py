@@ -155,6 +155,59 @@ class TestDocumentStorageService:
         assert document.text == "First document"
         assert document.id == "0"
 
+    def test_get_document_id_by_section(self, sample_documents):
+        """Test get_document_id_by_section maps a section to its document ID."""
+        service = DocumentStorageService()
+        service.store_documents(sample_documents)
+
+        assert service.get_document_id_by_section("1.2") == "1"
+        assert service.get_document_id_by_section("99.99") is None
+
+    def test_get_document_id_by_source(self, sample_documents):
+        """Test get_document_id_by_source maps a citation source to its document."""
+        service = DocumentStorageService()
+        service.store_documents(sample_documents)
+
+        assert service.get_document_id_by_source("Thievery 1.2") == "1"
+        assert service.get_document_id_by_source("Unknown Section") is None
+
+    def test_get_document_text(self, sample_documents):
+        """Test get_document_text returns the full text or None."""
+        service = DocumentStorageService()
+        service.store_documents(sample_documents)
+
+        assert service.get_document_text("0") == sample_documents[0].text
+        assert service.get_document_text("5") is None
+        assert service.get_document_text("abc") is None
+
+    def test_corpus_version_follows_texts(self, sample_documents):
+        """Test the corpus version changes only when the texts change."""
+        first = DocumentStorageService()
+        first.store_documents(sample_documents)
+        second = DocumentStorageService()
+        second.store_documents(sample_documents)
+        version = first.corpus_version
+        first.store_documents(sample_documents[1:])
+
+        assert version and version == second.corpus_version
+        assert first.corpus_version != version
+
+    def test_corpus_version_given(self, sample_documents):
+        """Test a corpus version given with the documents is kept."""
+        service = DocumentStorageService()
+        service.store_documents(sample_documents, corpus_version="pdf-hash")
+
+        assert service.corpus_version == "pdf-hash"
+
+    def test_store_documents_rebuilds_section_index(self, sample_documents):
+        """Test storing a new document set replaces the section index."""
+        service = DocumentStorageService()
+        service.store_documents(sample_documents)
+        service.store_documents(sample_documents[1:])
+
+        assert service.get_document_id_by_section("1.1") is None
+        assert service.get_document_id_by_section("1.2") == "0"
+
     def test_get_document_with_missing_metadata(self):
         """Test get_document with documents that have missing metadata fields."""
         doc = Document(
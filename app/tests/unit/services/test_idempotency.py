@@ -0,0 +1,100 @@
+"""Unit tests for IdempotencyStore."""
+
+import asyncio
+
+import pytest
+
+from app.services import IdempotencyKeyReused, IdempotencyStore
+
+
+class TestIdempotencyStore:
+    """Tests for IdempotencyStore."""
+
+    async def test_in_flight_and_later_retries_share_one_run(self):
+        """Test retries await the running request, then replay its result."""
+        store = IdempotencyStore()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return object()
+
+        results = await asyncio.gather(
+            *(store.run("key", "body", work) for _ in range(3))
+        )
+        replayed = await store.run("key", "body", work)
+
+        assert calls == 1
+        assert all(result is results[0] for result in [*results, replayed])
+        assert store.stats() == {
+            "entries": 1,
+            "in_flight": 0,
+            "executions": 1,
+            "replays": 3,
+        }
+
+    async def test_key_reused_for_other_request(self):
+        """Test a key sent with a different fingerprint is rejected."""
+        store = IdempotencyStore()
+
+        async def work():
+            return "result"
+
+        await store.run("key", "body", work)
+
+        with pytest.raises(IdempotencyKeyReused):
+            await store.run("key", "other body", work)
+
+    async def test_failure_not_recorded(self):
+        """Test a failed request runs again when retried."""
+        store = IdempotencyStore()
+        attempts = 0
+
+        async def flaky():
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                raise RuntimeError("boom")
+            return "result"
+
+        with pytest.raises(RuntimeError):
+            await store.run("key", "body", flaky)
+        result = await store.run("key", "body", flaky)
+
+        assert result == "result"
+        assert attempts == 2
+
+    async def test_caller_cancellation_does_not_cancel_work(self):
+        """Test the request keeps running for its retry if the caller goes away."""
+        store = IdempotencyStore()
+        done = asyncio.Event()
+
+        async def work():
+            await done.wait()
+            return "result"
+
+        caller = asyncio.create_task(store.run("key", "body", work))
+        await asyncio.sleep(0)
+        caller.cancel()
+        done.set()
+
+        assert await store.run("key", "body", work) == "result"
+        assert store.stats()["executions"] == 1
+
+    async def test_bounded_and_expiring(self):
+        """Test the oldest outcomes are dropped past the size bound and TTL."""
+        store = IdempotencyStore(max_entries=2, ttl_seconds=0.01)
+
+        async def work():
+            return "result"
+
+        for key in ("a", "b", "c"):
+            await store.run(key, "body", work)
+        assert store.stats()["entries"] == 2
+
+        await asyncio.sleep(0.02)
+        await store.run("d", "body", work)
+
+        assert store.stats()["entries"] == 1
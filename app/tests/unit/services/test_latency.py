@@ -0,0 +1,57 @@
+"""Unit tests for LatencyRecorder."""
+
+from app.services import LatencyRecorder
+
+
+class TestLatencyRecorder:
+    """Tests for LatencyRecorder."""
+
+    def test_percentile_without_samples(self):
+        """Test percentile is None for an unknown stage."""
+        recorder = LatencyRecorder()
+
+        assert recorder.percentile("synthesis", 95) is None
+
+    def test_percentile(self):
+        """Test percentiles over recorded samples."""
+        recorder = LatencyRecorder()
+        for seconds in range(1, 101):
+            recorder.record("synthesis", seconds / 100)
+
+        assert recorder.percentile("synthesis", 0) == 0.01
+        assert recorder.percentile("synthesis", 50) == 0.51
+        assert recorder.percentile("synthesis", 100) == 1.0
+
+    def test_window_keeps_recent_samples(self):
+        """Test only the most recent samples are kept."""
+        recorder = LatencyRecorder(window=2)
+        recorder.record("embed", 10.0)
+        recorder.record("embed", 0.1)
+        recorder.record("embed", 0.2)
+
+        assert recorder.percentile("embed", 100) == 0.2
+        assert recorder.stats()["embed"]["count"] == 3
+
+    def test_time_records_block_duration(self):
+        """Test the time context manager records a sample, even on error."""
+        recorder = LatencyRecorder()
+
+        with recorder.time("condense"):
+            pass
+        try:
+            with recorder.time("condense"):
+                raise RuntimeError
+        except RuntimeError:
+            pass
+
+        assert recorder.stats()["condense"]["count"] == 2
+
+    def test_stats_in_milliseconds(self):
+        """Test stats are reported in milliseconds."""
+        recorder = LatencyRecorder()
+        recorder.record("retrieve", 0.5)
+
+        stats = recorder.stats()["retrieve"]
+
+        assert stats["mean_ms"] == 500.0
+        assert stats["p95_ms"] == 500.0
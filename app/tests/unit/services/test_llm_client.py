@@ -0,0 +1,215 @@
+"""Unit tests for the resilient LLM wrapper."""
+
+import asyncio
+import time
+from typing import Any
+
+import pytest
+from llama_index.core.llms import (
+    CompletionResponse,
+    CompletionResponseGen,
+    CustomLLM,
+    LLMMetadata,
+)
+
+from app.services import CircuitBreaker, CircuitBreakerOpen, ResilientLLM
+
+
+class ScriptedLLM(CustomLLM):
+    """LLM whose successive calls take the scripted delays (or raise)."""
+
+    delays: list[Any] = []
+    calls: int = 0
+    cancelled: int = 0
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(model_name="scripted")
+
+    def _next(self) -> tuple[int, Any]:
+        index = self.calls
+        self.calls += 1
+        return index, self.delays[min(index, len(self.delays) - 1)]
+
+    def complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponse:
+        index, delay = self._next()
+        if isinstance(delay, Exception):
+            raise delay
+        time.sleep(delay)
+        return CompletionResponse(text=f"attempt {index}")
+
+    async def acomplete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponse:
+        index, delay = self._next()
+        if isinstance(delay, Exception):
+            raise delay
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return CompletionResponse(text=f"attempt {index}")
+
+    def stream_complete(
+        self, prompt: str, formatted: bool = False, **kwargs: Any
+    ) -> CompletionResponseGen:
+        yield CompletionResponse(text="stream", delta="stream")
+
+
+def primed(llm: ResilientLLM, seconds: float = 0.01) -> ResilientLLM:
+    """Record enough fast calls for hedging to kick in."""
+    for _ in range(llm.hedge_min_samples):
+        llm._latency.record("call", seconds)
+    return llm
+
+
+class TestResilientLLM:
+    """Tests for ResilientLLM."""
+
+    def test_passes_calls_through(self):
+        """Test calls are delegated to the wrapped LLM."""
+        llm = ResilientLLM(llm=ScriptedLLM(delays=[0]))
+
+        assert llm.complete("hi").text == "attempt 0"
+        assert llm.metadata.model_name == "scripted"
+        stats = llm.stats()
+        assert stats["requests"] == 1
+        assert stats["attempts"] == 1
+        assert stats["hedges"] == 0
+        assert stats["hedge_delay_ms"] is None
+
+    async def test_no_hedge_before_min_samples(self):
+        """Test calls are not hedged until enough latencies are recorded."""
+        llm = ResilientLLM(llm=ScriptedLLM(delays=[0.05]), hedge_min_delay_seconds=0)
+
+        await llm.acomplete("hi")
+
+        assert llm.stats()["hedges"] == 0
+
+    async def test_async_hedge_wins_and_cancels_primary(self):
+        """Test a slow async call is hedged and the slow attempt cancelled."""
+        inner = ScriptedLLM(delays=[5, 0])
+        llm = primed(ResilientLLM(llm=inner, hedge_min_delay_seconds=0.01))
+
+        result = await llm.acomplete("hi")
+        await asyncio.sleep(0)
+
+        assert result.text == "attempt 1"
+        assert inner.cancelled == 1
+        stats = llm.stats()
+        assert stats["attempts"] == 2
+        assert stats["hedges"] == 1
+        assert stats["hedge_wins"] == 1
+
+    async def test_async_fast_call_is_not_hedged(self):
+        """Test calls finishing before the hedge delay make a single attempt."""
+        llm = primed(
+            ResilientLLM(llm=ScriptedLLM(delays=[0]), hedge_min_delay_seconds=1)
+        )
+
+        assert (await llm.acomplete("hi")).text == "attempt 0"
+        assert llm.stats()["attempts"] == 1
+
+    async def test_async_hedge_after_primary_failure(self):
+        """Test the hedge still answers when the primary attempt fails."""
+        inner = ScriptedLLM(delays=[0])
+        llm = primed(ResilientLLM(llm=inner, hedge_min_delay_seconds=0.01))
+
+        async def failing_primary():
+            await asyncio.sleep(0.05)
+            raise TimeoutError()
+
+        calls = iter([failing_primary, lambda: inner.acomplete("hi")])
+        result = await llm._acall(lambda: next(calls)())
+
+        assert result.text == "attempt 0"
+        assert llm.stats()["hedge_wins"] == 1
+        assert llm.stats()["failures"] == 0
+
+    def test_sync_hedge_wins(self):
+        """Test a slow sync call is hedged on a thread."""
+        llm = primed(
+            ResilientLLM(llm=ScriptedLLM(delays=[0.5, 0]), hedge_min_delay_seconds=0.01)
+        )
+
+        result = llm.complete("hi")
+
+        assert result.text == "attempt 1"
+        assert llm.stats()["hedge_wins"] == 1
+
+    async def test_all_attempts_failing_raises(self):
+        """Test the error is raised and counted when every attempt fails."""
+        llm = ResilientLLM(llm=ScriptedLLM(delays=[ValueError("boom")]))
+
+        with pytest.raises(ValueError):
+            await llm.acomplete("hi")
+
+        assert llm.stats()["failures"] == 1
+
+    def test_breaker_opens_and_fails_fast(self):
+        """Test the breaker refuses calls once the failure rate is too high."""
+        inner = ScriptedLLM(delays=[ValueError("boom")])
+        llm = ResilientLLM(llm=inner, breaker=CircuitBreaker(min_calls=2, window=4))
+
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                llm.complete("hi")
+        with pytest.raises(CircuitBreakerOpen):
+            llm.complete("hi")
+
+        assert inner.calls == 2
+        assert llm.stats()["breaker"]["state"] == "open"
+        assert llm.stats()["breaker"]["rejected"] == 1
+
+    def test_stream_goes_through_breaker(self):
+        """Test streaming calls are delegated and refused when open."""
+        breaker = CircuitBreaker(min_calls=1)
+        llm = ResilientLLM(llm=ScriptedLLM(), breaker=breaker)
+
+        assert [r.text for r in llm.stream_complete("hi")] == ["stream"]
+        breaker.record_failure()
+        with pytest.raises(CircuitBreakerOpen):
+            llm.stream_complete("hi")
+
+
+class TestCircuitBreaker:
+    """Tests for CircuitBreaker."""
+
+    def test_stays_closed_below_threshold(self):
+        """Test the breaker stays closed when the failure rate is low."""
+        breaker = CircuitBreaker(failure_rate_threshold=0.5, min_calls=4)
+        for outcome in [True, True, True, False]:
+            breaker.before_call()
+            breaker.record_success() if outcome else breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.failure_rate == 0.25
+
+    def test_half_open_trial_success_closes(self):
+        """Test a successful trial call after the timeout closes the breaker."""
+        breaker = CircuitBreaker(min_calls=1, reset_timeout_seconds=0)
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+        breaker.before_call()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        with pytest.raises(CircuitBreakerOpen):
+            breaker.before_call()
+
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.failure_rate == 0.0
+
+    def test_half_open_trial_failure_reopens(self):
+        """Test a failed trial call opens the breaker again."""
+        breaker = CircuitBreaker(min_calls=1, reset_timeout_seconds=0)
+        breaker.record_failure()
+        breaker.before_call()
+
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.stats()["opened"] == 2
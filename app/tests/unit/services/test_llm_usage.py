@@ -0,0 +1,132 @@
+"""Unit tests for LLM usage accounting."""
+
+import pytest
+from llama_index.core.callbacks import CallbackManager
+from llama_index.core.llms import MockLLM
+
+from app.services import (
+    LLMCallBudgetExceeded,
+    LLMUsageHandler,
+    LLMUsageStats,
+    track_llm_usage,
+)
+from app.services.llm_usage import remaining_llm_calls
+
+
+@pytest.fixture
+def llm():
+    """Mock LLM reporting its calls to an LLMUsageHandler."""
+    return MockLLM(max_tokens=5, callback_manager=CallbackManager([LLMUsageHandler()]))
+
+
+class TestTrackLLMUsage:
+    """Tests for track_llm_usage and LLMUsageHandler."""
+
+    def test_counts_calls_and_tokens(self, llm):
+        """Test LLM calls and tokens inside the block are counted."""
+        with track_llm_usage() as usage:
+            llm.complete("one two three")
+            llm.complete("four five")
+
+        assert usage.calls == 2
+        assert usage.prompt_tokens > 0
+        assert usage.completion_tokens > 0
+
+    async def test_counts_async_calls(self, llm):
+        """Test async LLM calls are counted."""
+        with track_llm_usage() as usage:
+            await llm.acomplete("one two three")
+
+        assert usage.calls == 1
+
+    def test_calls_outside_block_are_not_counted(self, llm):
+        """Test calls made outside of a tracking block are ignored."""
+        llm.complete("untracked")
+
+        with track_llm_usage() as usage:
+            pass
+
+        assert usage.calls == 0
+
+    def test_budget_exceeded(self, llm):
+        """Test a call beyond max_calls is refused."""
+        with track_llm_usage(max_calls=1) as usage:
+            llm.complete("first")
+            with pytest.raises(LLMCallBudgetExceeded):
+                llm.complete("second")
+
+        assert usage.calls == 1
+
+    def test_nested_blocks_merge_into_parent(self, llm):
+        """Test the usage of a nested block is added to the enclosing one."""
+        with track_llm_usage() as outer:
+            llm.complete("condense")
+            with track_llm_usage(max_calls=1) as inner:
+                llm.complete("synthesize")
+
+        assert inner.calls == 1
+        assert outer.calls == 2
+
+    def test_enclosing_budget_applies_to_nested_blocks(self, llm):
+        """Test calls in nested blocks count against the enclosing budget."""
+        with track_llm_usage(max_calls=2) as outer:
+            llm.complete("condense")
+            with track_llm_usage() as first:
+                assert remaining_llm_calls() == 1
+                llm.complete("synthesize")
+            with track_llm_usage() as second, pytest.raises(LLMCallBudgetExceeded):
+                llm.complete("fallback")
+            assert remaining_llm_calls() == 0
+
+        assert (outer.calls, first.calls, second.calls) == (2, 1, 0)
+        assert remaining_llm_calls() is None
+
+
+class TestLLMUsageStats:
+    """Tests for LLMUsageStats."""
+
+    def test_empty_stats(self):
+        """Test stats before any request is recorded."""
+        stats = LLMUsageStats().stats()
+        assert stats["requests"] == 0
+        assert stats["llm_calls_per_request"] == 0.0
+
+    def test_record(self, llm):
+        """Test per-request usage is aggregated."""
+        usage_stats = LLMUsageStats()
+        with track_llm_usage() as single:
+            llm.complete("one")
+        with track_llm_usage() as double:
+            llm.complete("one")
+            llm.complete("two")
+
+        usage_stats.record(single)
+        usage_stats.record(double)
+        stats = usage_stats.stats()
+
+        assert stats["requests"] == 2
+        assert stats["llm_calls"] == 3
+        assert stats["llm_calls_per_request"] == 1.5
+        assert stats["max_llm_calls_in_request"] == 2
+        assert stats["multi_call_requests"] == 1
+        assert stats["prompt_tokens"] > 0
+
+    def test_record_cancelled(self, llm):
+        """Test cancelled requests count the tokens they saved on average."""
+        usage_stats = LLMUsageStats()
+        with track_llm_usage() as answered:
+            llm.complete("one")
+            llm.complete("two")
+        usage_stats.record(answered)
+        with track_llm_usage() as cancelled:
+            llm.complete("one")
+
+        usage_stats.record_cancelled(cancelled)
+        stats = usage_stats.stats()
+
+        spent = cancelled.prompt_tokens + cancelled.completion_tokens
+        total = answered.prompt_tokens + answered.completion_tokens
+        assert stats["requests"] == 1
+        assert stats["cancelled_requests"] == 1
+        assert stats["cancelled_tokens_spent"] == spent
+        assert stats["estimated_tokens_saved"] == total - spent
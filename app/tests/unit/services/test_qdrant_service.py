@@ -1,14 +1,50 @@
 """Unit tests for QdrantService."""
 
-from unittest.mock import Mock, patch
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
 
-from app.models import Output
-from app.services import QdrantService
+import pytest
+from llama_index.core.callbacks import CallbackManager
+from llama_index.core.llms import ChatMessage, MessageRole, MockLLM
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.query_engine.citation_query_engine import (
+    DEFAULT_CITATION_CHUNK_OVERLAP,
+)
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from app.models import Message, Output
+from app.services import (
+    AdaptiveTopKPostprocessor,
+    DocumentStorageService,
+    LLMCallBudgetExceeded,
+    LLMUsageHandler,
+    QdrantService,
+    ResilientLLM,
+)
+from app.services.qdrant_service import (
+    CITATION_CHUNK_SIZE,
+    NO_RELEVANT_LAW_RESPONSE,
+)
 
 
 class TestQdrantService:
     """Tests for QdrantService."""
 
+    @staticmethod
+    def _service_with_answer_cache():
+        """QdrantService with the answer cache, which is off by default."""
+        with patch(
+            "app.services.qdrant_service.app_settings.answer_cache_enabled", True
+        ):
+            return QdrantService()
+
+    def test_answer_cache_disabled_by_default(self):
+        """Test answers are not served from the semantic cache by default."""
+        service = QdrantService()
+
+        assert service.answer_cache is None
+        assert service.get_stats()["answer_cache"] is None
+
     def test_init_default_k(self):
         """Test QdrantService initialization with default k."""
         service = QdrantService()
@@ -37,6 +73,7 @@ class TestQdrantService:
         mock_openai_key,
     ):
         """Test connect method initializes all components."""
+        mock_openai.return_value = MockLLM()
         service = QdrantService(k=3)
         service.connect()
 
@@ -63,7 +100,7 @@ class TestQdrantService:
         service.index.insert_nodes.assert_called_once_with(sample_documents)
 
     @patch("app.services.qdrant_service.CitationQueryEngine")
-    def test_query_returns_output(self, mock_query_engine, sample_documents):
+    async def test_query_returns_output(self, mock_query_engine, sample_documents):
         """Test query method returns Output object."""
         service = QdrantService(k=3)
         service.index = Mock()
@@ -87,10 +124,11 @@ class TestQdrantService:
         ]
 
         mock_engine_instance = Mock()
-        mock_engine_instance.query.return_value = mock_response
+        mock_engine_instance.aretrieve = AsyncMock(return_value=[])
+        mock_engine_instance.asynthesize = AsyncMock(return_value=mock_response)
         mock_query_engine.from_args.return_value = mock_engine_instance
 
-        result = service.query("test query")
+        result = await service.query("test query")
 
         assert isinstance(result, Output)
         assert result.query == "test query"
@@ -98,7 +136,7 @@ class TestQdrantService:
         assert len(result.citations) == 2
 
     @patch("app.services.qdrant_service.CitationQueryEngine")
-    def test_query_uses_k_parameter(self, mock_query_engine):
+    async def test_query_uses_k_parameter(self, mock_query_engine):
         """Test query method uses self.k parameter."""
         service = QdrantService(k=5)
         service.index = Mock()
@@ -108,10 +146,11 @@ class TestQdrantService:
         mock_response.source_nodes = []
 
         mock_engine = Mock()
-        mock_engine.query.return_value = mock_response
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
         mock_query_engine.from_args.return_value = mock_engine
 
-        service.query("test")
+        await service.query("test")
 
         # Verify k was used in query engine initialization
         mock_query_engine.from_args.assert_called_once()
@@ -119,7 +158,7 @@ class TestQdrantService:
         assert call_kwargs["similarity_top_k"] == 5
 
     @patch("app.services.qdrant_service.CitationQueryEngine")
-    def test_query_extracts_citations(self, mock_query_engine):
+    async def test_query_extracts_citations(self, mock_query_engine):
         """Test query correctly extracts citations from response."""
         service = QdrantService()
         service.index = Mock()
@@ -138,10 +177,11 @@ class TestQdrantService:
         mock_response.source_nodes = [mock_node1, mock_node2]
 
         mock_engine = Mock()
-        mock_engine.query.return_value = mock_response
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
         mock_query_engine.from_args.return_value = mock_engine
 
-        result = service.query("test query")
+        result = await service.query("test query")
 
         assert len(result.citations) == 2
         assert result.citations[0].source == "Thievery 1.1"
@@ -149,7 +189,7 @@ class TestQdrantService:
         assert result.citations[1].source == "Thievery 1.2"
 
     @patch("app.services.qdrant_service.CitationQueryEngine")
-    def test_query_handles_missing_section_metadata(self, mock_query_engine):
+    async def test_query_handles_missing_section_metadata(self, mock_query_engine):
         """Test query handles nodes without Section metadata."""
         service = QdrantService()
         service.index = Mock()
@@ -163,16 +203,17 @@ class TestQdrantService:
         mock_response.source_nodes = [mock_node]
 
         mock_engine = Mock()
-        mock_engine.query.return_value = mock_response
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
         mock_query_engine.from_args.return_value = mock_engine
 
-        result = service.query("test")
+        result = await service.query("test")
 
         # Should use default "Unknown Section"
         assert result.citations[0].source == "Unknown Section"
 
     @patch("app.services.qdrant_service.CitationQueryEngine")
-    def test_query_no_source_nodes(self, mock_query_engine):
+    async def test_query_no_source_nodes(self, mock_query_engine):
         """Test query when response has no source_nodes."""
         service = QdrantService()
         service.index = Mock()
@@ -183,9 +224,1221 @@ class TestQdrantService:
         del mock_response.source_nodes
 
         mock_engine = Mock()
-        mock_engine.query.return_value = mock_response
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
         mock_query_engine.from_args.return_value = mock_engine
 
-        result = service.query("test")
+        result = await service.query("test")
 
         assert len(result.citations) == 0
+
+    def test_load_bumps_corpus_version(self, sample_documents):
+        """Test load increments the corpus version."""
+        service = QdrantService()
+        service.index = Mock()
+
+        service.load(sample_documents)
+        service.load(sample_documents)
+
+        assert service.corpus_version == 2
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_serves_repeat_from_answer_cache(self, mock_query_engine):
+        """Test a semantically equivalent query is answered from the cache."""
+        service = self._service_with_answer_cache()
+        service.index = Mock()
+        service.embed_model = Mock()
+        service.embed_model.aget_query_embedding = AsyncMock(return_value=[1.0, 0.0])
+
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Response")
+        mock_response.source_nodes = []
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        first = await service.query("what happens if I steal?")
+        second = await service.query("what is the punishment for stealing?")
+
+        assert mock_engine.asynthesize.await_count == 1
+        assert second.response == first.response
+        assert second.query == "what is the punishment for stealing?"
+        assert service.get_stats()["answer_cache"]["hits"] == 1
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_reuses_embedding_for_retrieval(self, mock_query_engine):
+        """Test the query embedding is computed once and passed to retrieval."""
+        service = QdrantService()
+        service.index = Mock()
+        service.embed_model = Mock()
+        service.embed_model.aget_query_embedding = AsyncMock(return_value=[1.0, 0.0])
+
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Response")
+        mock_response.source_nodes = []
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        await service.query("test")
+
+        query_bundle = mock_engine.aretrieve.call_args[0][0]
+        assert query_bundle.embedding == [1.0, 0.0]
+        service.embed_model.aget_query_embedding.assert_awaited_once_with("test")
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_cache_invalidated_by_load(
+        self, mock_query_engine, sample_documents
+    ):
+        """Test cached answers are not served after the corpus changes."""
+        service = QdrantService()
+        service.index = Mock()
+        service.embed_model = Mock()
+        service.embed_model.aget_query_embedding = AsyncMock(return_value=[1.0, 0.0])
+
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Response")
+        mock_response.source_nodes = []
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        await service.query("test")
+        service.load(sample_documents)
+        await service.query("test")
+
+        assert mock_engine.asynthesize.await_count == 2
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_coalesces_concurrent_duplicates(self, mock_query_engine):
+        """Test concurrent identical queries share one computation."""
+        service = QdrantService()
+        service.index = Mock()
+
+        async def slow_synthesize(_query_bundle, _nodes):
+            await asyncio.sleep(0.01)
+            mock_response = Mock()
+            mock_response.__str__ = Mock(return_value="Response")
+            mock_response.source_nodes = []
+            return mock_response
+
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(side_effect=slow_synthesize)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        results = await asyncio.gather(
+            service.query("What happens if I steal?"),
+            service.query("what happens  if i steal?"),
+            service.query("What happens if I steal?"),
+        )
+
+        assert mock_engine.asynthesize.await_count == 1
+        assert results[1].query == "what happens  if i steal?"
+        assert service.get_stats()["coalescing"]["coalesced"] == 2
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_does_not_coalesce_different_filters(self, mock_query_engine):
+        """Test queries with different filters run separately."""
+        service = QdrantService()
+        service.index = Mock()
+
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Response")
+        mock_response.source_nodes = []
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        await asyncio.gather(
+            service.query("test", filters={"MainSection": "Thievery"}),
+            service.query("test", filters={"MainSection": "Religion"}),
+        )
+
+        assert mock_engine.asynthesize.await_count == 2
+        filters = mock_query_engine.from_args.call_args[1]["filters"]
+        assert filters.filters[0].key == "MainSection"
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_adaptive_top_k(self, mock_query_engine, monkeypatch):
+        """Test adaptive mode retrieves max_k nodes and adds the cut-off step."""
+        monkeypatch.setattr(
+            "app.services.qdrant_service.app_settings.qdrant_adaptive_top_k", True
+        )
+        monkeypatch.setattr(
+            "app.services.qdrant_service.app_settings.qdrant_adaptive_max_k", 8
+        )
+        service = QdrantService(k=3)
+        service.index = Mock()
+
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Response")
+        mock_response.source_nodes = []
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        await service.query("test")
+
+        call_kwargs = mock_query_engine.from_args.call_args[1]
+        assert call_kwargs["similarity_top_k"] == 8
+        assert isinstance(
+            call_kwargs["node_postprocessors"][0], AdaptiveTopKPostprocessor
+        )
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_batch_embeds_in_one_call(self, mock_query_engine):
+        """Test query_batch embeds all questions with a single batched call."""
+        service = QdrantService()
+        service.index = Mock()
+        service.embed_model = Mock()
+        service.embed_model.aget_text_embedding_batch = AsyncMock(
+            return_value=[[1.0, 0.0], [0.0, 1.0]]
+        )
+
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Response")
+        mock_response.source_nodes = []
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        results = [item async for item in service.query_batch(["first?", "second?"])]
+
+        service.embed_model.aget_text_embedding_batch.assert_awaited_once_with(
+            ["first?", "second?"]
+        )
+        assert sorted(index for index, _ in results) == [0, 1]
+        assert {output.query for _, output in results} == {"first?", "second?"}
+        assert mock_engine.aretrieve.call_args_list[0][0][0].embedding == [1.0, 0.0]
+
+    async def test_query_embeddings_batch_larger_than_cache(self):
+        """Test a batch larger than the embedding cache is not re-embedded."""
+        service = QdrantService()
+        service.embed_model = Mock()
+        service.embed_model.aget_text_embedding_batch = AsyncMock(
+            return_value=[[1.0], [2.0], [3.0]]
+        )
+        service.embed_model.aget_query_embedding = AsyncMock()
+
+        with patch(
+            "app.services.qdrant_service.app_settings.query_embedding_cache_size", 1
+        ):
+            embeddings = await service._get_query_embeddings(["a", "b", "c", "a"])
+
+        assert embeddings == [[1.0], [2.0], [3.0], [1.0]]
+        service.embed_model.aget_text_embedding_batch.assert_awaited_once_with(
+            ["a", "b", "c"]
+        )
+        service.embed_model.aget_query_embedding.assert_not_called()
+        assert list(service._embedding_cache) == ["c"]
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_batch_yields_in_completion_order(self, mock_query_engine):
+        """Test results stream back as soon as each synthesis finishes."""
+        service = QdrantService()
+        service.index = Mock()
+
+        async def synthesize(query_bundle, _nodes):
+            await asyncio.sleep(0.02 if query_bundle.query_str == "slow" else 0)
+            mock_response = Mock()
+            mock_response.__str__ = Mock(return_value=query_bundle.query_str)
+            mock_response.source_nodes = []
+            return mock_response
+
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(side_effect=synthesize)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        results = [item async for item in service.query_batch(["slow", "fast"])]
+
+        assert [index for index, _ in results] == [1, 0]
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_batch_bounds_concurrency(self, mock_query_engine):
+        """Test no more than max_concurrency syntheses run at once."""
+        service = QdrantService()
+        service.index = Mock()
+        running = 0
+        peak = 0
+
+        async def synthesize(_query_bundle, _nodes):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            mock_response = Mock()
+            mock_response.__str__ = Mock(return_value="Response")
+            mock_response.source_nodes = []
+            return mock_response
+
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(side_effect=synthesize)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        questions = [f"question {i}" for i in range(6)]
+        results = [
+            item async for item in service.query_batch(questions, max_concurrency=2)
+        ]
+
+        assert len(results) == 6
+        assert peak == 2
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_batch_reports_errors_per_question(self, mock_query_engine):
+        """Test a failing question does not abort the rest of the batch."""
+        service = QdrantService()
+        service.index = Mock()
+
+        async def synthesize(query_bundle, _nodes):
+            if query_bundle.query_str == "bad":
+                raise RuntimeError("LLM failed")
+            mock_response = Mock()
+            mock_response.__str__ = Mock(return_value="Response")
+            mock_response.source_nodes = []
+            return mock_response
+
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(side_effect=synthesize)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        results = dict([item async for item in service.query_batch(["good", "bad"])])
+
+        assert isinstance(results[0], Output)
+        assert isinstance(results[1], RuntimeError)
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_batch_serves_cached_answers(self, mock_query_engine):
+        """Test cached answers are yielded without retrieval or synthesis."""
+        service = self._service_with_answer_cache()
+        service.index = Mock()
+        service.embed_model = Mock()
+        service.embed_model.aget_text_embedding_batch = AsyncMock(
+            return_value=[[1.0, 0.0]]
+        )
+        service.answer_cache.put(
+            [1.0, 0.0],
+            Output(query="cached", response="Cached", citations=[]),
+            service.corpus_version,
+            (service.k, ()),
+        )
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock()
+        mock_query_engine.from_args.return_value = mock_engine
+
+        results = [item async for item in service.query_batch(["question"])]
+
+        assert results[0][1].response == "Cached"
+        assert results[0][1].query == "question"
+        mock_engine.asynthesize.assert_not_awaited()
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_retrieve_skips_synthesis(self, mock_query_engine):
+        """Test retrieve returns ranked scored citations without an LLM call."""
+        service = QdrantService(k=3)
+        service.index = Mock()
+        service.embed_model = Mock()
+        service.embed_model.aget_query_embedding = AsyncMock(return_value=[1.0, 0.0])
+
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(
+            return_value=[
+                NodeWithScore(
+                    node=TextNode(
+                        text="Theft from sept",
+                        metadata={"Section": "Thievery 1.2", "SubsectionNumber": "1.2"},
+                    ),
+                    score=0.7,
+                ),
+                NodeWithScore(
+                    node=TextNode(
+                        text="Punishment text",
+                        metadata={"Section": "Thievery 1.1", "SubsectionNumber": "1.1"},
+                    ),
+                    score=0.9,
+                ),
+            ]
+        )
+        mock_engine.asynthesize = AsyncMock()
+        mock_query_engine.from_args.return_value = mock_engine
+
+        citations = await service.retrieve("test", k=2)
+
+        assert [citation.section_number for citation in citations] == ["1.1", "1.2"]
+        assert citations[0].score == 0.9
+        assert citations[0].source == "Thievery 1.1"
+        assert mock_query_engine.from_args.call_args[1]["similarity_top_k"] == 2
+        mock_engine.asynthesize.assert_not_awaited()
+
+    @patch("app.services.qdrant_service.qdrant_client.QdrantClient")
+    @patch("app.services.qdrant_service.QdrantVectorStore")
+    @patch("app.services.qdrant_service.VectorStoreIndex")
+    @patch("app.services.qdrant_service.OpenAIEmbedding")
+    @patch("app.services.qdrant_service.OpenAI")
+    @patch("app.services.qdrant_service.Settings")
+    def test_connect_configures_stage_models(
+        self,
+        mock_settings,
+        mock_openai,
+        mock_embedding,
+        mock_index,
+        mock_vector_store,
+        mock_client,
+        monkeypatch,
+    ):
+        """Test connect creates separate condense, synthesis and fallback models."""
+        monkeypatch.setattr(
+            "app.services.qdrant_service.app_settings.fallback_llm_model",
+            "gpt-4o",
+        )
+        mock_openai.return_value = MockLLM()
+        service = QdrantService()
+        service.connect()
+
+        models = [call.kwargs["model"] for call in mock_openai.call_args_list]
+        assert models == ["gpt-4o-mini", "gpt-4", "gpt-4o"]
+        assert mock_openai.call_args_list[0].kwargs["timeout"] == 10.0
+        assert mock_settings.llm is service.synthesis_llm
+        assert service.fallback_llm is not None
+        assert isinstance(service.synthesis_llm, ResilientLLM)
+        assert set(service.get_stats()["llm"]) == {"condense", "synthesis", "fallback"}
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_with_history_uses_condense_model(self, mock_query_engine):
+        """Test follow-ups are condensed on the condense model before retrieval."""
+        service = QdrantService()
+        service.index = Mock()
+        service.condense_llm = Mock()
+        service.condense_llm.apredict = AsyncMock(
+            return_value="What is the punishment for theft from a sept?"
+        )
+        service.synthesis_llm = Mock()
+
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Response")
+        mock_response.source_nodes = []
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        history = [
+            Message(role="user", content="What happens if I steal from a sept?"),
+            Message(role="assistant", content="You lose a hand."),
+        ]
+        result = await service.query_with_history("And the punishment?", history)
+
+        assert result.query == "And the punishment?"
+        assert result.response == "Response"
+        service.condense_llm.apredict.assert_awaited_once()
+        assert "You lose a hand." in (
+            service.condense_llm.apredict.call_args.kwargs["chat_history"]
+        )
+        query_bundle = mock_engine.aretrieve.call_args[0][0]
+        assert query_bundle.query_str == "What is the punishment for theft from a sept?"
+        assert mock_query_engine.from_args.call_args[1]["llm"] is service.synthesis_llm
+        stats = service.get_stats()["latency"]
+        assert stats["condense"]["count"] == 1
+        assert stats["synthesis"]["count"] == 1
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_with_history_without_history(self, mock_query_engine):
+        """Test the first turn goes through the single-query path."""
+        service = QdrantService()
+        service.index = Mock()
+        service.condense_llm = Mock()
+        service.condense_llm.apredict = AsyncMock()
+
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Response")
+        mock_response.source_nodes = []
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        result = await service.query_with_history("test", [])
+
+        assert result.response == "Response"
+        service.condense_llm.apredict.assert_not_awaited()
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_synthesis_falls_back_on_failure(self, mock_query_engine):
+        """Test synthesis is retried on the fallback model when it fails."""
+        service = QdrantService()
+        service.index = Mock()
+        service.fallback_llm = Mock()
+
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Fallback response")
+        mock_response.source_nodes = []
+        primary_engine = Mock()
+        primary_engine.aretrieve = AsyncMock(return_value=[])
+        primary_engine.asynthesize = AsyncMock(side_effect=TimeoutError())
+        fallback_engine = Mock()
+        fallback_engine.asynthesize = AsyncMock(return_value=mock_response)
+        mock_query_engine.from_args.side_effect = [primary_engine, fallback_engine]
+
+        result = await service.query("test")
+
+        assert result.response == "Fallback response"
+        fallback_kwargs = mock_query_engine.from_args.call_args_list[1][1]
+        assert fallback_kwargs["llm"] is service.fallback_llm
+        assert fallback_kwargs["retriever"] is primary_engine.retriever
+        assert service.get_stats()["latency"]["synthesis_fallback"]["count"] == 1
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_synthesis_failure_without_fallback_raises(self, mock_query_engine):
+        """Test synthesis errors propagate when no fallback model is configured."""
+        service = QdrantService()
+        service.index = Mock()
+
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(side_effect=TimeoutError())
+        mock_query_engine.from_args.return_value = mock_engine
+
+        with pytest.raises(TimeoutError):
+            await service.query("test")
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_llm_call_cap_covers_the_whole_turn(self, mock_query_engine):
+        """Test condensation, a failed synthesis and its fallback share one cap."""
+        llm = MockLLM(callback_manager=CallbackManager([LLMUsageHandler()]))
+        service = QdrantService()
+        service.index = Mock()
+        service.condense_llm = llm
+        service.fallback_llm = Mock()
+
+        async def failing_synthesis(*args):
+            await llm.acomplete("synthesize")
+            raise TimeoutError()
+
+        async def fallback_synthesis(*args):
+            await llm.acomplete("fall back")
+            return Mock()
+
+        primary_engine = Mock()
+        primary_engine.aretrieve = AsyncMock(
+            return_value=[NodeWithScore(node=TextNode(text="Law text"), score=0.9)]
+        )
+        primary_engine.asynthesize = AsyncMock(side_effect=failing_synthesis)
+        fallback_engine = Mock()
+        fallback_engine.asynthesize = AsyncMock(side_effect=fallback_synthesis)
+        mock_query_engine.from_args.side_effect = [primary_engine, fallback_engine]
+        history = [Message(role="user", content="Hi")]
+
+        with patch("app.services.qdrant_service.app_settings.request_max_llm_calls", 2):
+            result = await service.query_with_history("And for it?", history)
+
+        assert result.degraded is True
+        assert result._llm_calls == 2
+        fallback_engine.asynthesize.assert_awaited_once()
+        assert service.get_stats()["llm_usage"]["max_llm_calls_in_request"] == 2
+
+    async def test_condense_falls_back_on_failure(self):
+        """Test condensation is retried on the fallback model when it fails."""
+        service = QdrantService()
+        service.condense_llm = Mock()
+        service.condense_llm.apredict = AsyncMock(side_effect=TimeoutError())
+        service.fallback_llm = Mock()
+        service.fallback_llm.apredict = AsyncMock(return_value="Standalone?")
+
+        result = await service._condense_question("And then?", [])
+
+        assert result == "Standalone?"
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_uses_configured_response_mode(self, mock_query_engine):
+        """Test the synthesis response mode comes from the settings."""
+        service = QdrantService()
+        service.index = Mock()
+
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Response")
+        mock_response.source_nodes = []
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        with patch(
+            "app.services.qdrant_service.app_settings.synthesis_response_mode",
+            "tree_summarize",
+        ):
+            await service.query("test")
+
+        kwargs = mock_query_engine.from_args.call_args[1]
+        assert kwargs["response_mode"] == "tree_summarize"
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_records_llm_usage(self, mock_query_engine):
+        """Test each answered query is accounted in the LLM usage stats."""
+        service = QdrantService()
+        service.index = Mock()
+
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Response")
+        mock_response.source_nodes = []
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        await service.query("test")
+
+        assert service.get_stats()["llm_usage"]["requests"] == 1
+
+    def test_context_budget_keeps_first_node(self):
+        """Test the top node is kept even if it exceeds the token budget."""
+        nodes = [
+            NodeWithScore(node=TextNode(text="word " * 50), score=0.9),
+            NodeWithScore(node=TextNode(text="word " * 50), score=0.8),
+        ]
+
+        with patch(
+            "app.services.qdrant_service.app_settings.synthesis_max_context_tokens",
+            10,
+        ):
+            kept = QdrantService._apply_context_budget(nodes)
+
+        assert kept == nodes[:1]
+
+    def test_context_budget_within_limit(self):
+        """Test nodes fitting in the token budget are all kept."""
+        nodes = [
+            NodeWithScore(node=TextNode(text="short text"), score=0.9),
+            NodeWithScore(node=TextNode(text="other text"), score=0.8),
+        ]
+
+        assert QdrantService._apply_context_budget(nodes) == nodes
+
+    def test_context_budget_refine_limits_chunks(self):
+        """Test refine mode keeps no more chunks than allowed LLM calls."""
+        nodes = [
+            NodeWithScore(node=TextNode(text="short text"), score=0.9),
+            NodeWithScore(node=TextNode(text="other text"), score=0.8),
+            NodeWithScore(node=TextNode(text="third text"), score=0.7),
+        ]
+
+        with (
+            patch(
+                "app.services.qdrant_service.app_settings.synthesis_response_mode",
+                "refine",
+            ),
+            patch(
+                "app.services.qdrant_service.app_settings.synthesis_max_llm_calls",
+                2,
+            ),
+        ):
+            kept = QdrantService._apply_context_budget(nodes)
+
+        assert kept == nodes[:2]
+
+    def test_context_budget_cuts_first_node_to_call_budget(self):
+        """Test a top node needing too many refine calls is cut to fit them."""
+        text = " ".join(f"Sentence number {i} of the section." for i in range(300))
+        nodes = [
+            NodeWithScore(node=TextNode(text=text), score=0.9),
+            NodeWithScore(node=TextNode(text="other text"), score=0.8),
+        ]
+        splitter = SentenceSplitter(
+            chunk_size=CITATION_CHUNK_SIZE,
+            chunk_overlap=DEFAULT_CITATION_CHUNK_OVERLAP,
+        )
+
+        with patch(
+            "app.services.qdrant_service.app_settings.synthesis_response_mode",
+            "refine",
+        ):
+            kept = QdrantService._apply_context_budget(nodes)
+
+        assert len(kept) == 1
+        assert len(splitter.split_text(text)) > 1
+        assert text.startswith(kept[0].node.text)
+        assert splitter.split_text(kept[0].node.text) == splitter.split_text(text)[:1]
+        assert kept[0].score == 0.9
+        assert nodes[0].node.text == text
+
+    def test_context_budget_tree_summarize_fits_one_window(self):
+        """Test tree_summarize keeps the nodes that fit one context window."""
+        nodes = [
+            NodeWithScore(node=TextNode(text="word " * 300), score=0.9),
+            NodeWithScore(node=TextNode(text="word " * 300), score=0.8),
+        ]
+
+        with patch(
+            "app.services.qdrant_service.app_settings.synthesis_response_mode",
+            "tree_summarize",
+        ):
+            kept = QdrantService._apply_context_budget(nodes, window=512)
+            unknown_window = QdrantService._apply_context_budget(nodes)
+
+        assert kept == nodes[:1]
+        assert unknown_window == nodes
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_degrades_when_llm_call_budget_exceeded(
+        self, mock_query_engine
+    ):
+        """Test an extractive answer instead of an error over the call budget."""
+        service = self._service_with_answer_cache()
+        service.index = Mock()
+        nodes = [
+            NodeWithScore(
+                node=TextNode(text="Text.", metadata={"Section": "Thievery 1.1"}),
+                score=0.9,
+            )
+        ]
+
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=nodes)
+        mock_engine.asynthesize = AsyncMock(
+            side_effect=LLMCallBudgetExceeded("LLM call budget of 1 exceeded")
+        )
+        mock_query_engine.from_args.return_value = mock_engine
+
+        result = await service.query("test")
+
+        assert result.degraded is True
+        assert [c.source for c in result.citations] == ["Thievery 1.1"]
+        assert service.get_stats()["degraded_answers"] == 1
+        assert service.answer_cache.stats()["entries"] == 0
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_degrades_when_synthesis_exceeds_budget(
+        self, mock_query_engine
+    ):
+        """Test an extractive answer is returned when synthesis is too slow."""
+        service = self._service_with_answer_cache()
+        service.index = Mock()
+
+        nodes = [
+            NodeWithScore(
+                node=TextNode(
+                    text="A thief shall lose a finger. Repeat thieves lose a hand.",
+                    metadata={"Section": "Thievery 1.1"},
+                ),
+                score=0.9,
+            ),
+            NodeWithScore(
+                node=TextNode(text="Other text.", metadata={"Section": "Theft 1.2"}),
+                score=0.7,
+            ),
+        ]
+
+        async def slow_synthesis(*args):
+            await asyncio.sleep(1)
+
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=nodes)
+        mock_engine.asynthesize = AsyncMock(side_effect=slow_synthesis)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        result = await service.query("test", budget_ms=20)
+
+        assert result.degraded is True
+        assert "[1] Thievery 1.1: A thief shall lose a finger." in result.response
+        assert "Repeat thieves" not in result.response
+        assert [c.source for c in result.citations] == ["Thievery 1.1", "Theft 1.2"]
+        assert service.get_stats()["degraded_answers"] == 1
+        assert service.answer_cache.stats()["entries"] == 0
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_degrades_when_retrieval_exceeds_budget(
+        self, mock_query_engine
+    ):
+        """Test a degraded answer without citations when retrieval is too slow."""
+        service = QdrantService()
+        service.index = Mock()
+
+        async def slow_retrieval(*args):
+            await asyncio.sleep(1)
+
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(side_effect=slow_retrieval)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        result = await service.query("test", budget_ms=20)
+
+        assert result.degraded is True
+        assert result.citations == []
+        mock_engine.asynthesize.assert_not_called()
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_condensation_timeout_quotes_speculative_nodes(
+        self, mock_query_engine
+    ):
+        """Test a follow-up out of time while condensing cites the raw retrieval."""
+        service = QdrantService()
+        service.index = Mock()
+        nodes = [
+            NodeWithScore(
+                node=TextNode(text="Text.", metadata={"Section": "Thievery 1.1"}),
+                score=0.9,
+            )
+        ]
+
+        async def slow_condense(*args, **kwargs):
+            await asyncio.sleep(1)
+
+        service.condense_llm = Mock()
+        service.condense_llm.apredict = AsyncMock(side_effect=slow_condense)
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=nodes)
+        mock_query_engine.from_args.return_value = mock_engine
+        history = [Message(role="user", content="Hi")]
+
+        result = await service.query_with_history("And for it?", history, budget_ms=20)
+
+        assert result.degraded is True
+        assert [c.source for c in result.citations] == ["Thievery 1.1"]
+        mock_engine.asynthesize.assert_not_called()
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_within_budget_is_not_degraded(self, mock_query_engine):
+        """Test answers synthesized in time are returned normally."""
+        service = QdrantService()
+        service.index = Mock()
+
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Response")
+        mock_response.source_nodes = []
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        result = await service.query("test", budget_ms=5000)
+
+        assert result.response == "Response"
+        assert result.degraded is False
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_shared_query_degrades_only_budgeted_caller(self, mock_query_engine):
+        """Test a caller's budget does not degrade the answer of other callers."""
+        service = QdrantService()
+        service.index = Mock()
+
+        nodes = [
+            NodeWithScore(
+                node=TextNode(text="Text.", metadata={"Section": "Thievery 1.1"}),
+                score=0.9,
+            )
+        ]
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Response")
+        mock_response.source_nodes = []
+
+        async def slow_synthesis(*args):
+            await asyncio.sleep(0.2)
+            return mock_response
+
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=nodes)
+        mock_engine.asynthesize = AsyncMock(side_effect=slow_synthesis)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        for budgets in ((20, None), (None, 20)):
+            mock_engine.asynthesize.reset_mock()
+            results = await asyncio.gather(
+                *(service.query(f"q{budgets}", budget_ms=b) for b in budgets)
+            )
+
+            by_budget = dict(zip(budgets, results, strict=True))
+            assert by_budget[20].degraded is True
+            assert [c.source for c in by_budget[20].citations] == ["Thievery 1.1"]
+            assert by_budget[None].degraded is False
+            assert by_budget[None].response == "Response"
+            mock_engine.asynthesize.assert_called_once()
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_with_history_degrades_on_slow_condense(
+        self, mock_query_engine
+    ):
+        """Test the conversation path returns a degraded answer over budget."""
+        service = QdrantService()
+        service.index = Mock()
+
+        async def slow_condense(*args, **kwargs):
+            await asyncio.sleep(1)
+
+        service.condense_llm = Mock()
+        service.condense_llm.apredict = AsyncMock(side_effect=slow_condense)
+        history = [Message(role="user", content="Hi")]
+
+        result = await service.query_with_history("And then?", history, budget_ms=20)
+
+        assert result.degraded is True
+        assert result.query == "And then?"
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_cancelled_query_stops_llm_work(self, mock_query_engine):
+        """Test cancelling a query cancels its pending LLM call and counts it."""
+        service = QdrantService()
+        service.index = Mock()
+        synthesis_started = asyncio.Event()
+
+        async def slow_synthesis(*args, **kwargs):
+            synthesis_started.set()
+            await asyncio.sleep(10)
+
+        nodes = [NodeWithScore(node=TextNode(text="Law"), score=0.9)]
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=nodes)
+        mock_engine.asynthesize = AsyncMock(side_effect=slow_synthesis)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        task = asyncio.create_task(service.query("test"))
+        await asyncio.wait_for(synthesis_started.wait(), timeout=1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0)
+
+        stats = service.get_stats()
+        assert stats["llm_usage"]["cancelled_requests"] == 1
+        assert stats["coalescing"]["abandoned"] == 1
+        assert stats["coalescing"]["in_flight"] == 0
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_cancelled_follow_up_counted(self, mock_query_engine):
+        """Test a follow-up cancelled while condensing is accounted."""
+        service = QdrantService()
+        service.index = Mock()
+        condense_started = asyncio.Event()
+
+        async def slow_condense(*args, **kwargs):
+            condense_started.set()
+            await asyncio.sleep(10)
+
+        service.condense_llm = Mock()
+        service.condense_llm.apredict = AsyncMock(side_effect=slow_condense)
+        history = [Message(role="user", content="Hi")]
+
+        task = asyncio.create_task(service.query_with_history("And then?", history))
+        await asyncio.wait_for(condense_started.wait(), timeout=1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert service.get_stats()["llm_usage"]["cancelled_requests"] == 1
+
+    def test_excerpt_truncates_long_sentences(self):
+        """Test excerpts of degraded answers are bounded."""
+        excerpt = QdrantService._excerpt("word " * 200)
+
+        assert len(excerpt) <= 303
+        assert excerpt.endswith("...")
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_below_relevance_floor_skips_llm(
+        self, mock_query_engine, monkeypatch
+    ):
+        """Test a canned answer is returned when no node is relevant enough."""
+        monkeypatch.setattr(
+            "app.services.qdrant_service.app_settings.relevance_score_floor", 0.8
+        )
+        service = QdrantService()
+        service.index = Mock()
+
+        nodes = [NodeWithScore(node=TextNode(text="Unrelated"), score=0.5)]
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=nodes)
+        mock_engine.asynthesize = AsyncMock()
+        mock_query_engine.from_args.return_value = mock_engine
+
+        result = await service.query("what is the capital of France?")
+
+        assert result.response == NO_RELEVANT_LAW_RESPONSE
+        assert result.citations == []
+        mock_engine.asynthesize.assert_not_called()
+        relevance = service.get_stats()["relevance"]
+        assert relevance["short_circuits"] == 1
+        assert relevance["short_circuit_rate"] == 1.0
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_above_relevance_floor_synthesizes(
+        self, mock_query_engine, monkeypatch
+    ):
+        """Test questions with a relevant node are answered by the LLM."""
+        monkeypatch.setattr(
+            "app.services.qdrant_service.app_settings.relevance_score_floor", 0.8
+        )
+        service = QdrantService()
+        service.index = Mock()
+
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Response")
+        mock_response.source_nodes = []
+        nodes = [
+            NodeWithScore(node=TextNode(text="Unrelated"), score=0.5),
+            NodeWithScore(node=TextNode(text="Theft"), score=0.85),
+        ]
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=nodes)
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        result = await service.query("what happens if I steal?")
+
+        assert result.response == "Response"
+        relevance = service.get_stats()["relevance"]
+        assert relevance["checks"] == 1
+        assert relevance["short_circuit_rate"] == 0.0
+
+    def test_relevance_floor_disabled_by_default(self):
+        """Test every retrieval is considered relevant without a floor."""
+        service = QdrantService()
+        nodes = [NodeWithScore(node=TextNode(text="Anything"), score=0.01)]
+
+        assert service._has_relevant_node(nodes) is True
+        assert service.get_stats()["relevance"]["checks"] == 0
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_section_reference_answered_from_storage(
+        self, mock_query_engine, sample_documents
+    ):
+        """Test a bare section reference is answered without RAG."""
+        storage = DocumentStorageService()
+        storage.store_documents(sample_documents)
+        service = QdrantService(document_storage=storage)
+
+        result = await service.query("what does section 1.2 say?")
+
+        assert result.response.startswith("Thievery 1.2 reads: Those who steal")
+        assert [c.source for c in result.citations] == ["Thievery 1.2"]
+        assert service.get_stats()["section_reference_answers"] == 1
+        mock_query_engine.from_args.assert_not_called()
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_unknown_section_falls_through(
+        self, mock_query_engine, sample_documents
+    ):
+        """Test a reference to a missing section goes through RAG."""
+        storage = DocumentStorageService()
+        storage.store_documents(sample_documents)
+        service = QdrantService(document_storage=storage)
+        service.index = Mock()
+
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Response")
+        mock_response.source_nodes = []
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        result = await service.query("show me 9.9")
+
+        assert result.response == "Response"
+        assert service.get_stats()["section_reference_answers"] == 0
+
+    async def test_query_with_history_section_reference(self, sample_documents):
+        """Test section references skip condensation in conversations."""
+        storage = DocumentStorageService()
+        storage.store_documents(sample_documents)
+        service = QdrantService(document_storage=storage)
+        service.condense_llm = Mock()
+        service.condense_llm.apredict = AsyncMock()
+        history = [Message(role="user", content="Hi")]
+
+        result = await service.query_with_history("show me 1.1", history)
+
+        assert result.citations[0].source == "Thievery 1.1"
+        service.condense_llm.apredict.assert_not_awaited()
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_with_history_uses_memory_messages(self, mock_query_engine):
+        """Test a maintained memory is used instead of rebuilding the history."""
+        service = QdrantService()
+        service.index = Mock()
+        service.condense_llm = Mock()
+        service.condense_llm.apredict = AsyncMock(return_value="Standalone?")
+
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Response")
+        mock_response.source_nodes = []
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        memory_messages = [ChatMessage(role=MessageRole.USER, content="Earlier")]
+        await service.query_with_history("And then?", memory_messages=memory_messages)
+
+        kwargs = service.condense_llm.apredict.call_args.kwargs
+        assert "Earlier" in kwargs["chat_history"]
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_with_history_skips_condensing_standalone(
+        self, mock_query_engine
+    ):
+        """Test standalone follow-ups go straight to the query path."""
+        service = QdrantService()
+        service.index = Mock()
+        service.condense_llm = Mock()
+        service.condense_llm.apredict = AsyncMock()
+
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Response")
+        mock_response.source_nodes = []
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
+        mock_query_engine.from_args.return_value = mock_engine
+        history = [Message(role="user", content="Hi")]
+
+        result = await service.query_with_history(
+            "How is inheritance divided among sons?", history
+        )
+
+        assert result.response == "Response"
+        service.condense_llm.apredict.assert_not_awaited()
+        condensation = service.get_stats()["condensation"]
+        assert condensation["follow_up_turns"] == 1
+        assert condensation["skip_rate"] == 1.0
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_query_with_history_condenses_when_skip_disabled(
+        self, mock_query_engine, monkeypatch
+    ):
+        """Test every follow-up is condensed when skipping is disabled."""
+        monkeypatch.setattr(
+            "app.services.qdrant_service.app_settings.condense_skip_standalone", False
+        )
+        service = QdrantService()
+        service.index = Mock()
+        service.condense_llm = Mock()
+        service.condense_llm.apredict = AsyncMock(return_value="Standalone?")
+
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Response")
+        mock_response.source_nodes = []
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
+        mock_query_engine.from_args.return_value = mock_engine
+        history = [Message(role="user", content="Hi")]
+
+        await service.query_with_history(
+            "How is inheritance divided among sons?", history
+        )
+
+        service.condense_llm.apredict.assert_awaited_once()
+        assert service.get_stats()["condensation"]["skipped"] == 0
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_speculative_retrieval_reused_for_close_rewrite(
+        self, mock_query_engine
+    ):
+        """Test retrieval overlaps condensation and is reused when close."""
+        service = QdrantService()
+        service.index = Mock()
+
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Response")
+        mock_response.source_nodes = []
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
+        mock_query_engine.from_args.return_value = mock_engine
+
+        async def condense(*args, **kwargs):
+            await asyncio.sleep(0)
+            # Retrieval for the raw message started before condensation ended
+            assert mock_engine.aretrieve.await_count == 1
+            return "What happens to the thief then?"
+
+        service.condense_llm = Mock()
+        service.condense_llm.apredict = AsyncMock(side_effect=condense)
+        history = [Message(role="user", content="Hi")]
+
+        await service.query_with_history("And then what happens to the thief?", history)
+
+        assert mock_engine.aretrieve.await_count == 1
+        synthesized_bundle = mock_engine.asynthesize.call_args[0][0]
+        assert synthesized_bundle.query_str == "What happens to the thief then?"
+        assert service.get_stats()["speculative_retrieval"]["reused"] == 1
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_speculative_retrieval_discarded_for_distant_rewrite(
+        self, mock_query_engine
+    ):
+        """Test retrieval is redone when the condensed question differs."""
+        service = QdrantService()
+        service.index = Mock()
+        service.condense_llm = Mock()
+        service.condense_llm.apredict = AsyncMock(
+            return_value="What is the punishment for stealing from a sept?"
+        )
+
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Response")
+        mock_response.source_nodes = []
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
+        mock_query_engine.from_args.return_value = mock_engine
+        history = [Message(role="user", content="Hi")]
+
+        await service.query_with_history("And for that?", history)
+
+        retrieved = [c[0][0].query_str for c in mock_engine.aretrieve.call_args_list]
+        assert retrieved[-1] == "What is the punishment for stealing from a sept?"
+        speculative = service.get_stats()["speculative_retrieval"]
+        assert speculative["attempts"] == 1
+        assert speculative["reused"] == 0
+
+    @patch("app.services.qdrant_service.CitationQueryEngine")
+    async def test_speculative_retrieval_discarded_for_resolved_referent(
+        self, mock_query_engine
+    ):
+        """Test retrieval is redone when the rewrite only resolves a pronoun."""
+        service = QdrantService()
+        service.index = Mock()
+        service.condense_llm = Mock()
+        service.condense_llm.apredict = AsyncMock(
+            return_value="Is theft punished by death?"
+        )
+
+        mock_response = Mock()
+        mock_response.__str__ = Mock(return_value="Response")
+        mock_response.source_nodes = []
+        mock_engine = Mock()
+        mock_engine.aretrieve = AsyncMock(return_value=[])
+        mock_engine.asynthesize = AsyncMock(return_value=mock_response)
+        mock_query_engine.from_args.return_value = mock_engine
+        history = [Message(role="user", content="Hi")]
+
+        await service.query_with_history("Is it punished by death?", history)
+
+        retrieved = [c[0][0].query_str for c in mock_engine.aretrieve.call_args_list]
+        assert retrieved[-1] == "Is theft punished by death?"
+        assert service.get_stats()["speculative_retrieval"]["reused"] == 0
+
+    async def test_summarize_history(self):
+        """Test history is summarized on the condense model."""
+        service = QdrantService()
+        service.condense_llm = Mock()
+        service.condense_llm.apredict = AsyncMock(return_value=" New summary ")
+
+        result = await service.summarize_history(
+            "Old summary", [ChatMessage(role=MessageRole.USER, content="Theft?")]
+        )
+
+        assert result == "New summary"
+        kwargs = service.condense_llm.apredict.call_args.kwargs
+        assert kwargs["summary"] == "Old summary"
+        assert "Theft?" in kwargs["messages"]
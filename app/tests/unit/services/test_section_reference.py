@@ -0,0 +1,38 @@
+"""Unit tests for section reference detection."""
+
+import pytest
+
+from app.services import parse_section_reference
+
+
+class TestParseSectionReference:
+    """Tests for parse_section_reference."""
+
+    @pytest.mark.parametrize(
+        ("query", "expected"),
+        [
+            ("3.2", "3.2"),
+            ("show me 3.2", "3.2"),
+            ("What does section 6.2.3 say?", "6.2.3"),
+            ("Section 6.2.3.", "6.2.3"),
+            ("what is in sec. 4.1", "4.1"),
+            ("§ 1.1", "1.1"),
+        ],
+    )
+    def test_bare_section_references(self, query, expected):
+        """Test queries that only ask for a section are detected."""
+        assert parse_section_reference(query) == expected
+
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "what happens if I steal from a sept?",
+            "what does 3.2 say about theft?",
+            "compare 3.2 and 3.3",
+            "I stole 3.5 loaves of bread",
+            "show me section 3",
+        ],
+    )
+    def test_other_queries_are_not_matched(self, query):
+        """Test questions needing RAG fall through."""
+        assert parse_section_reference(query) is None
@@ -0,0 +1,102 @@
+"""Unit tests for SingleFlight."""
+
+import asyncio
+
+import pytest
+
+from app.services import SingleFlight
+
+
+class TestSingleFlight:
+    """Tests for SingleFlight."""
+
+    async def test_concurrent_calls_share_one_execution(self):
+        """Test concurrent calls with the same key run the work once."""
+        flight = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+
+        assert results == ["result"] * 5
+        assert calls == 1
+        assert flight.stats() == {
+            "executions": 1,
+            "coalesced": 4,
+            "abandoned": 0,
+            "in_flight": 0,
+        }
+
+    async def test_different_keys_run_separately(self):
+        """Test calls with different keys are not coalesced."""
+        flight = SingleFlight()
+
+        async def work(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(
+            flight.do("a", lambda: work("a")), flight.do("b", lambda: work("b"))
+        )
+
+        assert results == ["a", "b"]
+        assert flight.stats()["coalesced"] == 0
+
+    async def test_sequential_calls_are_not_coalesced(self):
+        """Test a call after completion starts a new execution."""
+        flight = SingleFlight()
+
+        async def work():
+            return "result"
+
+        await flight.do("key", work)
+        await flight.do("key", work)
+
+        assert flight.stats()["executions"] == 2
+
+    async def test_exception_is_shared(self):
+        """Test every waiter receives the exception of the shared execution."""
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            flight.do("key", work), flight.do("key", work), return_exceptions=True
+        )
+
+        assert all(isinstance(result, ValueError) for result in results)
+        with pytest.raises(ValueError):
+            await flight.do("key", work)
+
+    async def test_work_cancelled_when_every_caller_is(self):
+        """Test the shared work is cancelled once its last caller is cancelled."""
+        flight = SingleFlight()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def work():
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.create_task(flight.do("key", work)) for _ in range(2)]
+        await started.wait()
+        callers[0].cancel()
+        await asyncio.sleep(0)
+        assert not cancelled.is_set()
+
+        callers[1].cancel()
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+        assert flight.stats()["abandoned"] == 1
+        assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,46 @@
+"""Unit tests for CompressedSpillStore."""
+
+from app.services import CompressedSpillStore
+
+
+class TestCompressedSpillStore:
+    """Tests for CompressedSpillStore."""
+
+    def test_write_and_read(self, tmp_path):
+        """Test blobs are stored compressed and read back intact."""
+        store = CompressedSpillStore(str(tmp_path))
+        data = b"conversation " * 1000
+
+        store.write("a", data)
+
+        assert store.read("a") == data
+        assert "a" in store
+        assert len(store) == 1
+        assert 0 < store.bytes_on_disk < len(data)
+        assert store.path.parent == tmp_path
+
+    def test_overwrite_and_delete(self, tmp_path):
+        """Test disk usage follows overwritten and deleted blobs."""
+        store = CompressedSpillStore(str(tmp_path))
+        store.write("a", b"x" * 1000)
+        store.write("a", b"short")
+        size = store.bytes_on_disk
+
+        store.delete("a")
+        store.delete("missing")
+
+        assert size < 100
+        assert store.bytes_on_disk == 0
+        assert "a" not in store
+
+    def test_close_removes_directory(self, tmp_path):
+        """Test closing removes the store's directory only."""
+        store = CompressedSpillStore(str(tmp_path))
+        other = CompressedSpillStore(str(tmp_path))
+        store.write("a", b"data")
+
+        store.close()
+
+        assert not store.path.exists()
+        assert other.path.exists()
+        assert store.bytes_on_disk == 0
@@ -0,0 +1,596 @@
+"""Unit tests for SQLiteConversationService."""
+
+import asyncio
+import hashlib
+import threading
+from datetime import UTC, datetime
+from unittest.mock import patch
+
+import pytest
+
+from app.models import Citation, Conversation, Message
+from app.services import (
+    CitationCodec,
+    ConversationBusy,
+    DocumentStorageService,
+    IdempotencyKeyReused,
+    SQLiteConversationService,
+)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Path of a fresh conversation database."""
+    return str(tmp_path / "conversations.db")
+
+
+@pytest.fixture
+def service(db_path):
+    """SQLiteConversationService backed by a temporary database."""
+    service = SQLiteConversationService(db_path)
+    yield service
+    service.close()
+
+
+class TestSQLiteConversationService:
+    """Tests for SQLiteConversationService."""
+
+    def test_wal_mode_enabled(self, service):
+        """Test the database runs in WAL mode."""
+        with service._connection() as conn:
+            mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+
+        assert mode == "wal"
+
+    def test_create_and_get_conversation(self, service):
+        """Test a created conversation can be read back."""
+        created = service.create_conversation("Test")
+        retrieved = service.get_conversation(created.id)
+
+        assert retrieved.id == created.id
+        assert retrieved.title == "Test"
+        assert retrieved.messages == []
+        assert retrieved.created_at == created.created_at
+
+    def test_get_conversation_not_exists(self, service):
+        """Test getting a non-existent conversation."""
+        assert service.get_conversation("non-existent-id") is None
+        assert service.get_conversation_json("non-existent-id") is None
+
+    def test_get_conversation_json(self, service):
+        """Test a conversation is returned as Conversation JSON."""
+        conversation = service.create_conversation("Test")
+        service.add_message(conversation.id, Message(role="user", content="Q"))
+
+        content = service.get_conversation_json(conversation.id)
+
+        assert (
+            content
+            == service.get_conversation(conversation.id).model_dump_json().encode()
+        )
+
+    def test_add_message_round_trip(self, service):
+        """Test messages and their citations are stored and read back in order."""
+        conversation = service.create_conversation()
+        timestamp = datetime(2024, 1, 1, tzinfo=UTC)
+        service.add_message(
+            conversation.id, Message(role="user", content="Q", timestamp=timestamp)
+        )
+        result = service.add_message(
+            conversation.id,
+            Message(
+                role="assistant",
+                content="A",
+                citations=[Citation(source="Law 1.1", text="Text")],
+            ),
+        )
+
+        messages = service.get_conversation(conversation.id).messages
+        assert result.messages == []  # Not read back
+        assert [m.content for m in messages] == ["Q", "A"]
+        assert messages[0].timestamp == timestamp
+        assert messages[1].citations[0].source == "Law 1.1"
+
+    def test_citations_stored_as_references(self, db_path, sample_documents):
+        """Test cited law text is stored once and shared on read."""
+        storage = DocumentStorageService()
+        storage.store_documents(sample_documents)
+        codec = CitationCodec(storage)
+        service = SQLiteConversationService(db_path, citation_codec=codec)
+        conversation = service.create_conversation()
+        citation = Citation(source="Thievery 1.1", text=sample_documents[0].text)
+
+        for _ in range(2):
+            service.add_message(
+                conversation.id,
+                Message(role="assistant", content="A", citations=[citation]),
+            )
+
+        with service._connection() as conn:
+            stored = conn.execute("SELECT citations FROM messages").fetchall()
+            texts = conn.execute("SELECT text FROM citation_texts").fetchall()
+        messages = service.get_conversation(conversation.id).messages
+        service.close()
+        assert all(citation.text not in row[0] for row in stored)
+        assert texts == [(citation.text,)]
+        assert messages[0].citations == [citation]
+        assert messages[1].citations[0] is messages[0].citations[0]
+        assert codec.is_shared(messages[0].citations[0])
+
+    def test_add_message_conversation_not_found(self, service):
+        """Test adding a message to a non-existent conversation."""
+        result = service.add_message("missing", Message(role="user", content="Q"))
+
+        assert result is None
+        with service._connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 0
+
+    def test_add_message_auto_generates_title(self, service):
+        """Test the first user message titles a default conversation."""
+        conversation = service.create_conversation()
+        service.add_message(conversation.id, Message(role="assistant", content="Hi"))
+        result = service.add_message(
+            conversation.id, Message(role="user", content="x" * 60)
+        )
+
+        assert result.title == "x" * 50 + "..."
+
+    def test_add_message_does_not_override_custom_title(self, service):
+        """Test a custom title is kept when messages are added."""
+        conversation = service.create_conversation("Custom")
+        result = service.add_message(
+            conversation.id, Message(role="user", content="Question")
+        )
+
+        assert result.title == "Custom"
+
+    def test_add_message_expected_count(self, service, db_path):
+        """Test an append expecting a count fails after another worker's append."""
+        conversation = service.create_conversation()
+        other = SQLiteConversationService(db_path)
+        try:
+            assert other.get_message_count(conversation.id) == 0
+            other.add_message(
+                conversation.id, Message(role="user", content="Q1"), expected_count=0
+            )
+        finally:
+            other.close()
+
+        with pytest.raises(ConversationBusy):
+            service.add_message(
+                conversation.id, Message(role="user", content="Q2"), expected_count=0
+            )
+        service.add_message(
+            conversation.id, Message(role="assistant", content="A1"), expected_count=1
+        )
+
+        messages = service.get_conversation(conversation.id).messages
+        assert [m.content for m in messages] == ["Q1", "A1"]
+        assert service.get_message_count(conversation.id) == 2
+        assert service.get_message_count("missing") is None
+        assert (
+            service.add_message(
+                "missing", Message(role="user", content="Q"), expected_count=0
+            )
+            is None
+        )
+
+    def test_get_all_conversations_pages(self, service):
+        """Test all conversations are read page by page, latest update first."""
+        conversations = [service.create_conversation(f"C{i}") for i in range(3)]
+        service.add_message(conversations[0].id, Message(role="user", content="Q"))
+
+        with patch(
+            "app.services.sqlite_conversation_service._ALL_CONVERSATIONS_PAGE", 2
+        ):
+            result = service.get_all_conversations()
+
+        assert [c.id for c in result] == [
+            conversations[0].id,
+            conversations[2].id,
+            conversations[1].id,
+        ]
+        assert [m.content for m in result[0].messages] == ["Q"]
+
+    def test_get_all_conversations_empty(self, service):
+        """Test getting all conversations of an empty database."""
+        assert service.get_all_conversations() == []
+
+    def test_get_conversation_summaries_pages(self, service):
+        """Test summaries are paged from the updated_at index with a cursor."""
+        conversations = [service.create_conversation(f"C{i}") for i in range(5)]
+        service.add_message(conversations[1].id, Message(role="user", content="Q"))
+
+        first = service.get_conversation_summaries(limit=2)
+        second = service.get_conversation_summaries(limit=2, cursor=first.next_cursor)
+        last = service.get_conversation_summaries(limit=2, cursor=second.next_cursor)
+
+        assert first.total == 5
+        assert [c.title for c in first.conversations] == ["C1", "C4"]
+        assert first.conversations[0].message_count == 1
+        assert first.conversations[0].last_message_preview == "Q"
+        assert [c.title for c in second.conversations] == ["C3", "C2"]
+        assert [c.title for c in last.conversations] == ["C0"]
+        assert last.next_cursor is None
+
+    def test_conversation_total_kept_without_counting(self, service, db_path):
+        """Test the total follows inserts and deletes, also in older databases."""
+        conversations = [service.create_conversation() for _ in range(3)]
+        service.delete_conversation(conversations[0].id)
+        service.delete_conversation("missing")
+
+        assert service.get_conversation_summaries(limit=1).total == 2
+
+        # As created before the count was kept
+        with service._connection() as conn, conn:
+            conn.execute("DROP TRIGGER conversations_counted_on_insert")
+            conn.execute("DROP TRIGGER conversations_counted_on_delete")
+            conn.execute("DROP TABLE counters")
+        reopened = SQLiteConversationService(db_path)
+        try:
+            reopened.create_conversation()
+            assert reopened.get_conversation_summaries(limit=1).total == 3
+        finally:
+            reopened.close()
+
+    def test_get_conversation_summaries_invalid_cursor(self, service):
+        """Test a malformed cursor raises ValueError."""
+        with pytest.raises(ValueError):
+            service.get_conversation_summaries(limit=10, cursor="not-a-cursor")
+
+    def test_get_messages_pages_backwards(self, service):
+        """Test messages are paged backwards from the latest by row ID."""
+        conversation = service.create_conversation()
+        other = service.create_conversation()
+        for i in range(3):
+            service.add_message(conversation.id, Message(role="user", content=f"M{i}"))
+            service.add_message(other.id, Message(role="user", content="Other"))
+        service.add_message(
+            conversation.id,
+            Message(
+                role="assistant",
+                content="A",
+                citations=[Citation(source="Law 1.1", text="Text")],
+            ),
+        )
+
+        latest = service.get_messages(
+            conversation.id, limit=2, include_citation_text=False
+        )
+        older = service.get_messages(
+            conversation.id, limit=2, before=latest.next_before
+        )
+
+        assert [m.content for m in latest.messages] == ["M2", "A"]
+        assert latest.messages[1].citations[0].text == ""
+        assert [m.content for m in older.messages] == ["M0", "M1"]
+        assert older.next_before is None
+        assert service.get_messages("missing", limit=2) is None
+
+    def test_update_conversation_title(self, service):
+        """Test updating a conversation's title."""
+        conversation = service.create_conversation()
+
+        assert service.update_conversation_title(conversation.id, "New").title == (
+            "New"
+        )
+        assert service.update_conversation_title("missing", "New") is None
+
+    def test_delete_conversation_removes_messages(self, service):
+        """Test deleting a conversation also deletes its messages."""
+        conversation = service.create_conversation()
+        service.add_message(conversation.id, Message(role="user", content="Q"))
+
+        assert service.delete_conversation(conversation.id) is True
+        assert service.delete_conversation(conversation.id) is False
+        assert service.get_conversation(conversation.id) is None
+        assert service.get_memory(conversation.id) is None
+        with service._connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 0
+
+    def test_conversations_survive_restart(self, service, db_path):
+        """Test conversations are readable from a new service instance."""
+        conversation = service.create_conversation()
+        service.add_message(conversation.id, Message(role="user", content="Q"))
+        service.add_message(conversation.id, Message(role="assistant", content="A"))
+        service.close()
+
+        reopened = SQLiteConversationService(db_path)
+        try:
+            retrieved = reopened.get_conversation(conversation.id)
+            memory = reopened.get_memory(conversation.id)
+        finally:
+            reopened.close()
+
+        assert [m.content for m in retrieved.messages] == ["Q", "A"]
+        assert [m.content for m in memory.get()] == ["Q", "A"]
+
+    def test_memory_catches_up_with_other_workers(self, service, db_path):
+        """Test a cached memory picks up messages written by another instance."""
+        conversation = service.create_conversation()
+        service.add_message(conversation.id, Message(role="user", content="Q1"))
+        other = SQLiteConversationService(db_path)
+        try:
+            other.add_message(conversation.id, Message(role="user", content="Q2"))
+        finally:
+            other.close()
+
+        memory = service.get_memory(conversation.id)
+
+        assert [m.content for m in memory.get()] == ["Q1", "Q2"]
+
+    def test_changes_since_cursor(self, service):
+        """Test only conversations and messages changed after the cursor return."""
+        first = service.create_conversation("First")
+        second = service.create_conversation("Second")
+        third = service.create_conversation("Third")
+        service.add_message(first.id, Message(role="user", content="Old"))
+        cursor = service.get_changes().cursor
+
+        service.add_message(first.id, Message(role="user", content="New"))
+        service.update_conversation_title(third.id, "Renamed")
+        service.delete_conversation(second.id)
+        changes = service.get_changes(cursor)
+
+        assert {c.title for c in changes.conversations} == {"First", "Renamed"}
+        assert [m.content for m in changes.messages[first.id]] == ["New"]
+        assert changes.deleted == [second.id]
+        assert service.get_changes(changes.cursor).conversations == []
+
+    def test_changes_invalid_or_unknown_cursor(self, service):
+        """Test malformed cursors raise and cursors from elsewhere reset."""
+        service.create_conversation()
+
+        with pytest.raises(ValueError):
+            service.get_changes("1")
+        assert service.get_changes("100|0").reset is True
+
+    def test_changes_without_cursor(self, service):
+        """Test a poll without a cursor gets the current cursor and no data."""
+        conversation = service.create_conversation()
+        service.add_message(conversation.id, Message(role="user", content="Q"))
+        service.delete_conversation(service.create_conversation().id)
+
+        changes = service.get_changes()
+
+        assert changes.conversations == []
+        assert changes.messages == {}
+        assert changes.deleted == []
+        assert service.get_changes(changes.cursor).conversations == []
+
+    async def test_wait_for_changes_polls_other_workers(self, service, db_path):
+        """Test a waiting poll sees changes written by another instance."""
+        conversation = service.create_conversation()
+        cursor = service.get_changes().cursor
+        service.change_poll_seconds = 0.01
+        other = SQLiteConversationService(db_path)
+
+        poll = asyncio.create_task(service.wait_for_changes(cursor, timeout=5))
+        await asyncio.sleep(0.02)
+        try:
+            other.add_message(conversation.id, Message(role="user", content="Q"))
+        finally:
+            other.close()
+        changes = await asyncio.wait_for(poll, timeout=1)
+
+        assert [m.content for m in changes.messages[conversation.id]] == ["Q"]
+
+    async def test_wait_for_changes_reads_from_worker_threads(self, service):
+        """Test change polls query the database off the event loop."""
+        cursor = service.get_changes().cursor
+        threads = set()
+        get_changes = service.get_changes
+
+        def recording_get_changes(since):
+            threads.add(threading.current_thread())
+            return get_changes(since)
+
+        service.get_changes = recording_get_changes
+        await service.wait_for_changes(cursor, timeout=0.01)
+
+        assert threads and threading.main_thread() not in threads
+
+    async def test_rolling_summary_updated_after_assistant_message(
+        self, db_path, monkeypatch
+    ):
+        """Test turns leaving the window are summarized in the background."""
+        monkeypatch.setattr(
+            "app.services.conversation_service.app_settings.conversation_memory_recent_messages",
+            2,
+        )
+
+        async def summarizer(summary, messages):
+            return f"{summary}+{len(messages)}"
+
+        service = SQLiteConversationService(db_path, summarizer=summarizer)
+        conversation = service.create_conversation()
+        for turn in range(2):
+            service.add_message(
+                conversation.id, Message(role="user", content=f"Q{turn}")
+            )
+            service.add_message(
+                conversation.id, Message(role="assistant", content=f"A{turn}")
+            )
+            await service.wait_for_summaries()
+        service.close()
+
+        assert service.memories[conversation.id].summary == "+2"
+
+    async def test_async_variants_use_worker_threads(self, db_path, monkeypatch):
+        """Test the async variants query from worker threads and keep memory."""
+        monkeypatch.setattr(
+            "app.services.conversation_service.app_settings.conversation_memory_recent_messages",
+            2,
+        )
+
+        async def summarizer(summary, messages):
+            return f"{summary}+{len(messages)}"
+
+        service = SQLiteConversationService(db_path, summarizer=summarizer)
+        threads = set()
+        store_message = service._store_message
+
+        def recording_store_message(*args):
+            threads.add(threading.current_thread())
+            return store_message(*args)
+
+        service._store_message = recording_store_message
+        conversation = service.create_conversation()
+        for turn in range(2):
+            await service.aadd_message(
+                conversation.id, Message(role="user", content=f"Q{turn}")
+            )
+            await service.aadd_message(
+                conversation.id, Message(role="assistant", content=f"A{turn}")
+            )
+            await service.wait_for_summaries()
+        retrieved = await service.aget_conversation(conversation.id)
+        memory = await service.aget_memory(conversation.id)
+        missing = await service.aget_memory("missing")
+        service.close()
+
+        assert threading.main_thread() not in threads
+        assert [m.content for m in retrieved.messages] == ["Q0", "A0", "Q1", "A1"]
+        assert [m.content for m in memory.get()][-2:] == ["Q1", "A1"]
+        assert memory.summary == "+2"
+        assert missing is None
+
+    async def test_async_api_variants(self, service):
+        """Test the variants used by the API routes read and write the database."""
+        conversation = await service.acreate_conversation("Title")
+        await service.aadd_message(conversation.id, Message(role="user", content="Q"))
+
+        summaries = await service.aget_conversation_summaries(10)
+        page = await service.aget_messages(conversation.id, 10)
+        content = await service.aget_conversation_json(conversation.id)
+        renamed = await service.aupdate_conversation_title(conversation.id, "New")
+        missing = await service.aupdate_conversation_title("missing", "New")
+        deleted = await service.adelete_conversation(conversation.id)
+
+        assert [s.id for s in summaries.conversations] == [conversation.id]
+        assert [m.content for m in page.messages] == ["Q"]
+        assert Conversation.model_validate_json(content).id == conversation.id
+        assert renamed.title == "New"
+        assert missing is None
+        assert deleted is True
+        assert conversation.id not in service.memories
+        assert await service.adelete_conversation(conversation.id) is False
+
+
+class TestSQLiteIdempotency:
+    """Tests for idempotency keys shared between SQLite workers."""
+
+    @staticmethod
+    def _answer(service, conversation_id, key, calls):
+        """Return a function answering "Q" like the send_message route."""
+
+        async def answer():
+            calls.append(service)
+            await service.aadd_message(
+                conversation_id, Message(role="user", content="Q")
+            )
+            answer = Message(role="assistant", content="A")
+            await service.aadd_message(conversation_id, answer, idempotency_key=key)
+            return answer
+
+        return answer
+
+    async def test_retry_on_other_worker_replays_answer(self, service, db_path):
+        """Test a retry reaching another worker gets the stored answer."""
+        conversation = service.create_conversation()
+        other = SQLiteConversationService(db_path)
+        calls = []
+        try:
+            first = await service.idempotency.run(
+                (conversation.id, "k"),
+                "Q",
+                self._answer(service, conversation.id, "k", calls),
+            )
+            retry = await other.idempotency.run(
+                (conversation.id, "k"),
+                "Q",
+                self._answer(other, conversation.id, "k", calls),
+            )
+            with pytest.raises(IdempotencyKeyReused):
+                await other.idempotency.run(
+                    (conversation.id, "k"),
+                    "Other",
+                    self._answer(other, conversation.id, "k", calls),
+                )
+        finally:
+            other.close()
+
+        assert calls == [service]
+        assert retry.content == first.content == "A"
+        assert len(service.get_conversation(conversation.id).messages) == 2
+
+    async def test_retry_while_answering_on_other_worker(self, service, db_path):
+        """Test a retry is rejected while another worker answers the message."""
+        conversation = service.create_conversation()
+        other = SQLiteConversationService(db_path)
+        answering, fail = asyncio.Event(), asyncio.Event()
+
+        async def failing_answer():
+            answering.set()
+            await fail.wait()
+            raise RuntimeError("LLM unavailable")
+
+        first = asyncio.create_task(
+            service.idempotency.run((conversation.id, "k"), "Q", failing_answer)
+        )
+        await answering.wait()
+        try:
+            with pytest.raises(ConversationBusy):
+                await other.idempotency.run(
+                    (conversation.id, "k"),
+                    "Q",
+                    self._answer(other, conversation.id, "k", []),
+                )
+            fail.set()
+            with pytest.raises(RuntimeError):
+                await first
+            # The claim of the failed answer was released
+            retry = await other.idempotency.run(
+                (conversation.id, "k"),
+                "Q",
+                self._answer(other, conversation.id, "k", []),
+            )
+        finally:
+            other.close()
+
+        assert retry.content == "A"
+
+    async def test_stale_claim_taken_over(self, service, db_path, monkeypatch):
+        """Test a key claimed by a worker that died is answered by a retry."""
+        conversation = service.create_conversation()
+        fingerprint = hashlib.sha256(b"Q").hexdigest()
+        service._claim_idempotency_key(conversation.id, "k", fingerprint)
+        monkeypatch.setattr(
+            "app.services.sqlite_conversation_service.app_settings"
+            ".conversation_idempotency_claim_seconds",
+            0.0,
+        )
+        calls = []
+
+        retry = await service.idempotency.run(
+            (conversation.id, "k"),
+            "Q",
+            self._answer(service, conversation.id, "k", calls),
+        )
+
+        assert calls == [service]
+        assert retry.content == "A"
+
+    async def test_keys_deleted_with_conversation(self, service):
+        """Test deleting a conversation deletes its idempotency keys."""
+        conversation = service.create_conversation()
+        await service.idempotency.run(
+            (conversation.id, "k"),
+            "Q",
+            self._answer(service, conversation.id, "k", []),
+        )
+
+        service.delete_conversation(conversation.id)
+
+        with service._connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM idempotency").fetchone()[0] == 0
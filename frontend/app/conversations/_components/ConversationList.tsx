@@ -3,7 +3,8 @@
 /**
  * ConversationList Component
  *
- * Displays a list of all conversations with create button.
+ * Displays a list of all conversations with create button. Older
+ * conversations are loaded page by page as the list is scrolled.
  */
 
 import {
@@ -17,6 +18,7 @@ import {
   useToast,
 } from "@chakra-ui/react";
 import { useRouter } from "next/navigation";
+import { useEffect, useRef } from "react";
 import { HiPlus, HiTrash } from "react-icons/hi2";
 import {
   useConversations,
@@ -36,7 +38,28 @@ export default function ConversationList({
 }: ConversationListProps) {
   const router = useRouter();
   const toast = useToast();
-  const { data, isLoading } = useConversations();
+  const { data, isLoading, fetchNextPage, hasNextPage, isFetchingNextPage } =
+    useConversations();
+  const conversations = data?.pages.flatMap((page) => page.conversations) ?? [];
+
+  // Load the next page once the end of the list scrolls into view
+  const listRef = useRef<HTMLDivElement>(null);
+  const sentinelRef = useRef<HTMLDivElement>(null);
+  useEffect(() => {
+    const sentinel = sentinelRef.current;
+    if (!sentinel || !hasNextPage) return;
+
+    const observer = new IntersectionObserver(
+      (entries) => {
+        if (entries[0]?.isIntersecting && !isFetchingNextPage) {
+          fetchNextPage();
+        }
+      },
+      { root: listRef.current, rootMargin: "200px" }
+    );
+    observer.observe(sentinel);
+    return () => observer.disconnect();
+  }, [fetchNextPage, hasNextPage, isFetchingNextPage]);
   const { mutate: createConversation, isPending: isCreating } =
     useCreateConversation();
   const { mutate: deleteConversation } = useDeleteConversation();
@@ -104,12 +127,12 @@ export default function ConversationList({
       </Box>
 
       {/* Conversations List */}
-      <Box flex={1} overflowY="auto">
+      <Box ref={listRef} flex={1} overflowY="auto">
         {isLoading ? (
           <Flex justify="center" align="center" h="200px">
             <Spinner color="purple.500" />
           </Flex>
-        ) : !data || data.conversations.length === 0 ? (
+        ) : conversations.length === 0 ? (
           <Box p={4} textAlign="center">
             <Text color="gray.500" fontSize="sm">
               No conversations yet.
@@ -118,7 +141,7 @@ export default function ConversationList({
             </Text>
           </Box>
         ) : (
-          data.conversations.map((conversation) => (
+          conversations.map((conversation) => (
             <Flex
               key={conversation.id}
               px={4}
@@ -156,8 +179,8 @@ export default function ConversationList({
                   {conversation.title}
                 </Text>
                 <Text fontSize="xs" color="gray.500">
-                  {conversation.messages.length} message
-                  {conversation.messages.length !== 1 ? "s" : ""} •{" "}
+                  {conversation.message_count} message
+                  {conversation.message_count !== 1 ? "s" : ""} •{" "}
                   {formatDistanceToNow(new Date(conversation.updated_at), {
                     addSuffix: true,
                   })}
@@ -174,6 +197,12 @@ export default function ConversationList({
             </Flex>
           ))
         )}
+        <Box ref={sentinelRef} />
+        {isFetchingNextPage && (
+          <Flex justify="center" py={3}>
+            <Spinner size="sm" color="purple.500" />
+          </Flex>
+        )}
       </Box>
     </Flex>
   );
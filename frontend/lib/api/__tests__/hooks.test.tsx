@@ -1,4 +1,4 @@
-import { renderHook, waitFor } from "@testing-library/react";
+import { act, renderHook, waitFor } from "@testing-library/react";
 import { QueryClient, QueryClientProvider } from "@tanstack/react-query";
 import {
   useQueryDocuments,
@@ -271,9 +271,10 @@ describe("API Hooks", () => {
       const mockData = {
         total: 2,
         conversations: [
-          { id: "1", title: "Conv 1", messages: [] },
-          { id: "2", title: "Conv 2", messages: [] },
+          { id: "1", title: "Conv 1", message_count: 0 },
+          { id: "2", title: "Conv 2", message_count: 0 },
         ],
+        next_cursor: null,
       };
 
       (global.fetch as jest.Mock).mockResolvedValue({
@@ -289,7 +290,45 @@ describe("API Hooks", () => {
         expect(result.current.isSuccess).toBe(true);
       });
 
-      expect(result.current.data).toEqual(mockData);
+      expect(result.current.data?.pages).toEqual([mockData]);
+      expect(result.current.hasNextPage).toBe(false);
+      expect(global.fetch).toHaveBeenCalledWith(
+        "http://localhost:8000/conversations"
+      );
+    });
+
+    it("fetches the next page with the cursor", async () => {
+      const firstPage = {
+        total: 2,
+        conversations: [{ id: "1", title: "Conv 1", message_count: 0 }],
+        next_cursor: "2025-01-01T00:00:00|1",
+      };
+      const secondPage = {
+        total: 2,
+        conversations: [{ id: "2", title: "Conv 2", message_count: 0 }],
+        next_cursor: null,
+      };
+
+      (global.fetch as jest.Mock)
+        .mockResolvedValueOnce({ ok: true, json: async () => firstPage })
+        .mockResolvedValueOnce({ ok: true, json: async () => secondPage });
+
+      const { result } = renderHook(() => useConversations(), {
+        wrapper: createWrapper(),
+      });
+
+      await waitFor(() => {
+        expect(result.current.hasNextPage).toBe(true);
+      });
+      await act(async () => {
+        await result.current.fetchNextPage();
+      });
+
+      expect(result.current.data?.pages).toEqual([firstPage, secondPage]);
+      expect(result.current.hasNextPage).toBe(false);
+      expect(global.fetch).toHaveBeenLastCalledWith(
+        "http://localhost:8000/conversations?cursor=2025-01-01T00%3A00%3A00%7C1"
+      );
     });
 
     it("handles fetch errors", async () => {
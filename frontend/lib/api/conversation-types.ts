@@ -21,9 +21,31 @@ export interface Conversation {
   updated_at: string;
 }
 
+export interface ConversationSummary {
+  id: string;
+  title: string;
+  updated_at: string;
+  message_count: number;
+  last_message_preview: string | null;
+}
+
 export interface ConversationListResponse {
   total: number;
-  conversations: Conversation[];
+  conversations: ConversationSummary[];
+  next_cursor: string | null;
+}
+
+export interface MessageListResponse {
+  messages: Message[];
+  next_before: number | null;
+}
+
+export interface ConversationChanges {
+  cursor: string;
+  conversations: ConversationSummary[];
+  messages: Record<string, Message[]>;
+  deleted: string[];
+  reset: boolean;
 }
 
 export interface CreateConversationRequest {
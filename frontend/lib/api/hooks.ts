@@ -5,6 +5,7 @@
  */
 
 import {
+  useInfiniteQuery,
   useQuery,
   useMutation,
   useQueryClient,
@@ -214,22 +215,21 @@ export function useDocumentBySection(
 /**
  * useConversations Hook
  *
- * Fetches all conversations sorted by most recently updated.
+ * Fetches conversation summaries page by page, most recently updated first.
+ * Each page is requested with the `next_cursor` of the previous one; call
+ * `fetchNextPage` while `hasNextPage` is true to load more.
  *
- * @param options - Additional React Query options
- * @returns Query result with all conversations
+ * @returns Infinite query result with the pages of conversations
  */
-export function useConversations(
-  options?: Omit<
-    UseQueryOptions<ConversationListResponse>,
-    "queryKey" | "queryFn"
-  >
-) {
-  return useQuery<ConversationListResponse>({
+export function useConversations() {
+  return useInfiniteQuery({
     queryKey: queryKeys.conversations,
-    queryFn: async () => {
+    queryFn: async ({ pageParam }): Promise<ConversationListResponse> => {
+      const params = pageParam
+        ? `?${new URLSearchParams({ cursor: pageParam })}`
+        : "";
       const response = await fetch(
-        `${process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000"}/conversations`
+        `${process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000"}/conversations${params}`
       );
 
       if (!response.ok) {
@@ -238,7 +238,8 @@ export function useConversations(
 
       return response.json();
     },
-    ...options,
+    initialPageParam: null as string | null,
+    getNextPageParam: (lastPage) => lastPage.next_cursor,
   });
 }
 
@@ -230,6 +230,11 @@ export interface components {
       response: string;
       /** Citations */
       citations: components["schemas"]["Citation"][];
+      /**
+       * Degraded
+       * @default false
+       */
+      degraded?: boolean;
     };
     /** ValidationError */
     ValidationError: {